@@ -0,0 +1,4 @@
+"""
+Package: benchmarks
+Performance benchmarks for the Supplier service
+"""
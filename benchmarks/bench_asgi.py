@@ -0,0 +1,75 @@
+"""
+Load benchmark: gunicorn sync workers vs the ASGI app on uvicorn
+
+Usage:
+  python -m benchmarks.bench_asgi --suppliers 1000 --workers 2 --concurrency 64 128 256
+
+Seeds the database, then starts each server in turn with the same number
+of worker processes and drives GET /suppliers/<id> for random ids from
+an asyncio client at each concurrency level. Reports requests/sec and
+p50/p99 latency. The cache is turned off in the servers so that every
+request reads from the database. See benchmarks/loadgen.py for how the
+load is generated.
+"""
+import os
+import sys
+import random
+import asyncio
+import argparse
+from benchmarks.common import report, seed
+from benchmarks.loadgen import run_load, start_server, stop_server
+
+SERVERS = {
+    "gunicorn_sync": ["gunicorn", "--workers", "{workers}", "--bind", "127.0.0.1:{port}", "service:app"],
+    "uvicorn_asgi": [
+        "uvicorn", "--workers", "{workers}", "--port", "{port}", "--log-level", "warning",
+        "service.asgi:application",
+    ],
+}
+
+
+def run_server(name, args, paths):
+    """Starts a server, loads it at every concurrency level and stops it"""
+    command = [part.format(workers=args.workers, port=args.port) for part in SERVERS[name]]
+    server = start_server(command, args.port, env=dict(os.environ, CACHE_ENABLED="false"))
+    try:
+        return [
+            {"concurrency": level, **asyncio.run(load(args.port, paths, level, args.duration))}
+            for level in args.concurrency
+        ]
+    finally:
+        stop_server(server)
+
+
+def load(port, paths, concurrency, duration):
+    """Reads random Suppliers at a concurrency level"""
+    return run_load(port, lambda: ("GET", random.choice(paths), None), concurrency, duration)
+
+
+def main():
+    """Seeds the database and loads each server"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--suppliers", type=int, default=1000)
+    parser.add_argument("--items", type=int, default=5, help="items per supplier")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[64, 128, 256])
+    parser.add_argument("--duration", type=float, default=10, help="seconds per level")
+    parser.add_argument("--port", type=int, default=8089)
+    args = parser.parse_args()
+
+    seed(args.suppliers, args.items)
+    paths = [f"/suppliers/{supplier_id}" for supplier_id in range(1, args.suppliers + 1)]
+    results = {name: run_server(name, args, paths) for name in SERVERS}
+    report(
+        {
+            "benchmark": "asgi",
+            "python": sys.version.split()[0],
+            "suppliers": args.suppliers,
+            "workers": args.workers,
+            "results": results,
+        }
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Benchmark: POST /suppliers/batch vs one POST /suppliers per Supplier
+
+Usage:
+  python -m benchmarks.bench_batch_create --suppliers 2000 --batch-size 500
+
+Reports Suppliers created per second for each approach.
+"""
+import argparse
+import time
+from benchmarks.common import app, report, reset_database
+from tests.factories import SupplierFactory, ItemFactory
+
+
+def build_payloads(count, items_per_supplier):
+    """Builds Supplier payloads with nested items"""
+    payloads = []
+    for supplier in SupplierFactory.build_batch(count):
+        payload = supplier.serialize()
+        payload["items"] = [
+            ItemFactory.build(supplier=None).serialize() for _ in range(items_per_supplier)
+        ]
+        payloads.append(payload)
+    return payloads
+
+
+def single_posts(client, payloads):
+    """Creates every Supplier with its own request"""
+    for payload in payloads:
+        client.post("/suppliers", json=payload)
+
+
+def batch_posts(client, payloads, batch_size):
+    """Creates the Suppliers batch_size at a time"""
+    for start in range(0, len(payloads), batch_size):
+        client.post("/suppliers/batch", json=payloads[start:start + batch_size])
+
+
+def throughput(function, count):
+    """Returns records per second for one run on an empty database"""
+    reset_database()
+    start = time.perf_counter()
+    function()
+    return round(count / (time.perf_counter() - start), 1)
+
+
+def main():
+    """Times both approaches over the same payloads"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--suppliers", type=int, default=2000)
+    parser.add_argument("--items", type=int, default=2, help="items per supplier")
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    client = app.test_client()
+    payloads = build_payloads(args.suppliers, args.items)
+    single = throughput(lambda: single_posts(client, payloads), args.suppliers)
+    batch = throughput(lambda: batch_posts(client, payloads, args.batch_size), args.suppliers)
+    report(
+        {
+            "benchmark": "batch_create",
+            "suppliers": args.suppliers,
+            "items_per_supplier": args.items,
+            "batch_size": args.batch_size,
+            "single_per_second": single,
+            "batch_per_second": batch,
+            "speedup": round(batch / single, 1),
+        }
+    )
+
+
+if __name__ == "__main__":
+    main()
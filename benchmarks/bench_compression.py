@@ -0,0 +1,71 @@
+"""
+Benchmark: CPU cost vs bytes saved of response compression
+
+Usage:
+  python -m benchmarks.bench_compression --items 10 100 1000 5000
+
+Builds GET /suppliers/<id> bodies for Suppliers with different numbers
+of factory Items, encoded like the service encodes them, and compresses
+each one with every installed encoding at a few levels. Reports the
+compression time, the compressed size and the CPU time spent per
+kilobyte saved, next to the time the service takes to encode the JSON.
+"""
+import argparse
+from benchmarks.common import app, report, time_call
+from service.common.compression import ENCODINGS
+from tests.factories import ItemFactory, SupplierFactory
+
+LEVELS = {"gzip": (1, 6, 9), "br": (1, 4, 9), "zstd": (1, 3, 9)}
+
+
+def build_supplier(items):
+    """Returns a Supplier with a number of Items"""
+    supplier = SupplierFactory.build(id=1, items=[])
+    supplier.items = [ItemFactory.build(id=n, supplier_id=1, supplier=None) for n in range(1, items + 1)]
+    return supplier
+
+
+def supplier_body(supplier):
+    """Returns the JSON body of a Supplier"""
+    return app.json.dumps(supplier.serialize()).encode("utf-8")
+
+
+def compress(encoding, level, body):
+    """Compresses a whole body the way compress_response() does"""
+    compressor = ENCODINGS[encoding][0](level)
+    return compressor.compress(body) + compressor.finish()
+
+
+def main():
+    """Times every encoding and level on bodies of every size"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, nargs="+", default=[10, 100, 1000, 5000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    results = {}
+    for items in args.items:
+        supplier = build_supplier(items)
+        body = supplier_body(supplier)
+        result = {
+            "bytes": len(body),
+            "serialize_us": round(time_call(lambda s=supplier: supplier_body(s), args.repeat) * 1000),
+        }
+        for encoding in ENCODINGS:
+            for level in LEVELS[encoding]:
+                size = len(compress(encoding, level, body))
+                milliseconds = time_call(lambda e=encoding, lv=level: compress(e, lv, body), args.repeat)
+                saved_kb = (len(body) - size) / 1024
+                result[f"{encoding}-{level}"] = {
+                    "bytes": size,
+                    "ratio": round(len(body) / size, 1),
+                    "compress_us": round(milliseconds * 1000),
+                    "us_per_kb_saved": round(milliseconds * 1000 / saved_kb, 1) if saved_kb > 0 else None,
+                }
+        results[f"{items}_items"] = result
+
+    report({"benchmark": "compression", "results": results})
+
+
+if __name__ == "__main__":
+    main()
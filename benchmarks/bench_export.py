@@ -0,0 +1,68 @@
+"""
+Benchmark: catalog export throughput
+
+Usage:
+  python -m benchmarks.bench_export --suppliers 20000 --items 10
+
+Seeds the database and writes the supplier and item tables with the
+exporter behind flask export-catalog in every available format,
+reporting rows per second and the peak Python memory of each export.
+For comparison it also times serializing the same rows from ORM objects
+the way GET /suppliers/export does.
+"""
+import time
+import argparse
+import tempfile
+import tracemalloc
+from benchmarks.common import app, report, seed
+from service.common.catalog import ARROW_FORMATS, EXPORT_FORMATS, export_catalog, has_pyarrow
+from service.models import Supplier
+
+
+def time_export(directory, file_format, batch_size):
+    """Exports the catalog and returns the rows, seconds and peak memory in MB"""
+    start = time.perf_counter()
+    exported = export_catalog(directory, file_format, batch_size=batch_size)
+    seconds = time.perf_counter() - start
+    tracemalloc.start()
+    export_catalog(directory, file_format, batch_size=batch_size)
+    peak = tracemalloc.get_traced_memory()[1] / 2**20
+    tracemalloc.stop()
+    rows = sum(table["rows"] for table in exported.values())
+    return {
+        "rows": rows,
+        "seconds": round(seconds, 2),
+        "rows_per_sec": round(rows / seconds),
+        "peak_memory_mb": round(peak, 1),
+    }
+
+
+def time_orm_export(batch_size, rows):
+    """Serializes every Supplier with its Items from ORM objects"""
+    start = time.perf_counter()
+    for supplier in Supplier.stream(batch_size, loader="selectin"):
+        app.json.dumps(supplier.serialize())
+    seconds = time.perf_counter() - start
+    return {"rows": rows, "seconds": round(seconds, 2), "rows_per_sec": round(rows / seconds)}
+
+
+def main():
+    """Times the export of every format"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--suppliers", type=int, default=20000)
+    parser.add_argument("--items", type=int, default=10, help="items per supplier")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    seed(args.suppliers, args.items)
+    formats = [name for name in EXPORT_FORMATS if name not in ARROW_FORMATS or has_pyarrow()]
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for file_format in formats:
+            results[file_format] = time_export(directory, file_format, args.batch_size)
+    results["orm_ndjson"] = time_orm_export(args.batch_size, results["csv"]["rows"])
+    report({"benchmark": "export", "batch_size": args.batch_size, "results": results})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Benchmark: catalog import throughput
+
+Usage:
+  python -m benchmarks.bench_import --items 200000 --suppliers 10
+
+Writes a catalog of factory Items to a CSV and an NDJSON file and loads
+each one with the importer behind flask import-catalog, reporting rows
+per second and the peak Python memory of the import. For comparison it
+also creates a sample of Items one at a time with one commit each, the
+way POST /suppliers/<id>/items does.
+"""
+import os
+import csv
+import json
+import argparse
+import tempfile
+import tracemalloc
+from benchmarks.common import item_rows, report, seed, time_call
+from service.common.catalog import CatalogImporter, read_rows
+from service.models import db, Item
+
+COLUMNS = Item.FIELDS
+
+
+def write_catalog(path, file_format, suppliers, items_per_supplier):
+    """Writes the factory Items of the Suppliers to a catalog file"""
+    rows = item_rows(range(1, suppliers + 1), items_per_supplier)
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        if file_format == "csv":
+            writer = csv.writer(file)
+            writer.writerow(COLUMNS)
+            for row in rows:
+                writer.writerow([row[name] for name in COLUMNS])
+        else:
+            for row in rows:
+                file.write(json.dumps({name: str(row[name]) for name in COLUMNS}) + "\n")
+
+
+def import_file(path, file_format, batch_size, trace=False):
+    """Imports a catalog file and returns its report and peak memory in MB"""
+    db.session.query(Item).delete()
+    db.session.commit()
+    if trace:
+        tracemalloc.start()
+    with open(path, newline="", encoding="utf-8") as file:
+        result = CatalogImporter(batch_size=batch_size).run(read_rows(file, file_format))
+    peak = None
+    if trace:
+        peak = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+    return result, peak
+
+
+def create_one_at_a_time(count):
+    """Creates Items with one commit each, like the REST API"""
+    for number in range(count):
+        item = Item(supplier_id=1, sku=f"ONE{number}", name="One", quantity=1, price=1)
+        item.create()
+
+
+def main():
+    """Times the import of each catalog format"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=200000)
+    parser.add_argument("--suppliers", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--sample", type=int, default=500, help="Items created one at a time")
+    args = parser.parse_args()
+
+    seed(args.suppliers)
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for file_format in ("csv", "ndjson"):
+            path = os.path.join(directory, f"catalog.{file_format}")
+            write_catalog(path, file_format, args.suppliers, args.items // args.suppliers)
+            imported, _ = import_file(path, file_format, args.batch_size)
+            _, peak = import_file(path, file_format, args.batch_size, trace=True)
+            results[file_format] = {
+                "rows": imported.imported,
+                "seconds": round(imported.seconds, 2),
+                "rows_per_sec": round(imported.rows_per_sec),
+                "peak_memory_mb": round(peak, 1),
+            }
+
+    milliseconds = time_call(lambda: create_one_at_a_time(args.sample), 1)
+    results["one_commit_per_item"] = {
+        "rows": args.sample,
+        "rows_per_sec": round(args.sample / milliseconds * 1000),
+    }
+    report({"benchmark": "import", "batch_size": args.batch_size, "results": results})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Benchmark: POST /suppliers/<id>/items/batch vs one POST per Item
+
+Usage:
+  python -m benchmarks.bench_item_batch --items 2000 --batch-size 500
+
+Adds the same factory Items to a Supplier with one request and one
+commit per Item, then batch_size at a time through the batch endpoint
+in both modes, and reports Items created per second for each.
+"""
+import argparse
+import time
+from benchmarks.common import app, report, seed
+from tests.factories import ItemFactory
+
+
+def build_payloads(count):
+    """Builds Item payloads"""
+    return [item.serialize() for item in ItemFactory.build_batch(count, supplier_id=1, supplier=None)]
+
+
+def single_posts(client, payloads):
+    """Adds every Item with its own request"""
+    for payload in payloads:
+        client.post("/suppliers/1/items", json=payload)
+
+
+def batch_posts(client, payloads, batch_size, mode):
+    """Adds the Items batch_size at a time"""
+    for start in range(0, len(payloads), batch_size):
+        client.post(
+            "/suppliers/1/items/batch",
+            query_string={"mode": mode},
+            json=payloads[start:start + batch_size],
+        )
+
+
+def throughput(function, count):
+    """Returns Items per second for one run on a database with one Supplier"""
+    seed(1)
+    start = time.perf_counter()
+    function()
+    return round(count / (time.perf_counter() - start), 1)
+
+
+def main():
+    """Times each approach over the same payloads"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    client = app.test_client()
+    payloads = build_payloads(args.items)
+    single = throughput(lambda: single_posts(client, payloads), args.items)
+    results = {"single_per_second": single}
+    for mode in ("atomic", "best-effort"):
+        batch = throughput(lambda m=mode: batch_posts(client, payloads, args.batch_size, m), args.items)
+        results[f"{mode}_per_second"] = batch
+        results[f"{mode}_speedup"] = round(batch / single, 1)
+    report(
+        {
+            "benchmark": "item_batch",
+            "items": args.items,
+            "batch_size": args.batch_size,
+            **results,
+        }
+    )
+
+
+if __name__ == "__main__":
+    main()
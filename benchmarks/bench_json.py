@@ -0,0 +1,49 @@
+"""
+Microbenchmark: Supplier.serialize() plus JSON encoding
+
+Usage:
+  python -m benchmarks.bench_json --items 1000
+
+Builds one Supplier with the given number of Items in memory (no database)
+and reports the median time to serialize it and to encode the result with
+Flask's default provider and with each encoder of FastJSONProvider.
+"""
+import argparse
+from flask.json.provider import DefaultJSONProvider
+from benchmarks.common import app, report, time_call
+from service.common import json_provider
+from service.common.json_provider import FastJSONProvider
+from tests.factories import SupplierFactory, ItemFactory
+
+
+def main():
+    """Times serialize and each encoder on the same Supplier"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    supplier = SupplierFactory.build(id=1)
+    supplier.items = [
+        ItemFactory.build(id=n, supplier_id=1, supplier=None) for n in range(args.items)
+    ]
+    payload = supplier.serialize()
+
+    default = DefaultJSONProvider(app)
+    results = {
+        "serialize_ms": time_call(supplier.serialize, args.repeat),
+        "flask_default_ms": time_call(lambda: default.dumps(payload), args.repeat),
+    }
+    for name in json_provider.ENCODERS:
+        app.config["JSON_ENCODER"] = name
+        provider = FastJSONProvider(app)
+        results[f"{name}_ms"] = time_call(lambda p=provider: p.dumps(payload), args.repeat)
+        results[f"serialize_and_{name}_ms"] = time_call(
+            lambda p=provider: p.dumps(supplier.serialize()), args.repeat
+        )
+
+    report({"benchmark": "json", "items": args.items, "results": results})
+
+
+if __name__ == "__main__":
+    main()
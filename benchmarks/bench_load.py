@@ -0,0 +1,150 @@
+"""
+Load benchmark of the Supplier API
+
+Usage:
+  python -m benchmarks.bench_load --suppliers 1000 --items 10 --concurrency 32 --duration 10
+  python -m benchmarks.bench_load --output benchmarks/results/baseline.json
+  python -m benchmarks.bench_load --baseline benchmarks/results/baseline.json
+
+Seeds suppliers x items with the test factories, starts the service under
+gunicorn (or uses one already listening on --port with --no-server) and
+drives every route in turn from the concurrent load generator in
+benchmarks/loadgen.py. Reports the throughput and p50/p95/p99 latency of
+each scenario as JSON, and saves it with --output.
+
+With --baseline the results are compared to a saved run: a scenario
+regresses when its throughput drops or its p95/p99 latency grows by more
+than --tolerance, and the command then exits with status 1. Baselines
+only compare runs on the same machine and database.
+"""
+import os
+import sys
+import json
+import random
+import asyncio
+import argparse
+from benchmarks.common import app, report, seed
+from benchmarks.loadgen import run_load, start_server, stop_server
+from service.models import db, Item
+from tests.factories import SupplierFactory, ItemFactory
+
+# The measures compared with a baseline and whether higher is better
+COMPARED = {"requests_per_sec": True, "p95_ms": False, "p99_ms": False}
+
+
+def encode(payload):
+    """Returns a request body"""
+    return app.json.dumps(payload).encode("utf-8")
+
+
+def scenarios(suppliers, items_per_supplier, skus):
+    """Returns the request maker of every scenario, reads before writes"""
+    item_count = suppliers * items_per_supplier
+
+    def supplier_id():
+        return random.randint(1, suppliers)
+
+    def item_path():
+        item_id = random.randint(1, item_count)
+        return f"/suppliers/{(item_id - 1) // items_per_supplier + 1}/items/{item_id}"
+
+    def new_item():
+        item = ItemFactory.build(supplier=None, supplier_id=supplier_id())
+        return "POST", f"/suppliers/{item.supplier_id}/items", encode(item.serialize())
+
+    makers = {
+        "get_supplier": lambda: ("GET", f"/suppliers/{supplier_id()}", None),
+        "get_item": lambda: ("GET", item_path(), None),
+        "list_suppliers": lambda: ("GET", f"/suppliers?after={supplier_id()}", None),
+        "list_items": lambda: ("GET", f"/suppliers/{supplier_id()}/items", None),
+        "search_items": lambda: ("GET", f"/items?sku={random.choice(skus)}", None),
+        "best_price": lambda: ("GET", f"/items/best-price?sku={random.choice(skus)}&qty=1000", None),
+        "create_supplier": lambda: ("POST", "/suppliers", encode(SupplierFactory.build().serialize())),
+        "create_item": new_item,
+    }
+    if not item_count:
+        for name in ("get_item", "search_items", "best_price"):
+            del makers[name]
+    return makers
+
+
+def compare(results, baseline, tolerance):
+    """Returns the scenarios that regressed against a baseline"""
+    regressions = []
+    for name, current in results.items():
+        saved = baseline.get("scenarios", {}).get(name)
+        if not saved:
+            continue
+        for measure, higher_is_better in COMPARED.items():
+            before, after = saved.get(measure), current.get(measure)
+            if not before or after is None:
+                continue
+            change = (after - before) / before
+            if (-change if higher_is_better else change) > tolerance:
+                regressions.append(
+                    {"scenario": name, "measure": measure, "baseline": before,
+                     "current": after, "change_pct": round(change * 100, 1)}
+                )
+    return regressions
+
+
+def main():
+    """Seeds the database, loads every scenario and reports the results"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--suppliers", type=int, default=1000)
+    parser.add_argument("--items", type=int, default=10, help="items per supplier")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10, help="seconds per scenario")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--no-server", action="store_true", help="use the server on --port")
+    parser.add_argument("--scenarios", nargs="+", help="only run these scenarios")
+    parser.add_argument("--output", help="save the results to this file")
+    parser.add_argument("--baseline", help="compare with the results in this file")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed change, 0.15 is 15%%")
+    args = parser.parse_args()
+
+    seed(args.suppliers, args.items)
+    skus = list(db.session.scalars(db.select(Item.sku).distinct().limit(1000)))
+    db.session.remove()
+    makers = scenarios(args.suppliers, args.items, skus)
+    if args.scenarios:
+        makers = {name: makers[name] for name in args.scenarios}
+
+    server = None
+    if not args.no_server:
+        command = ["gunicorn", "--workers", str(args.workers), "--bind", f"127.0.0.1:{args.port}", "service:app"]
+        server = start_server(command, args.port, env=dict(os.environ))
+    try:
+        results = {
+            # a sku with no offer in the quantity is a valid 404 answer
+            name: asyncio.run(run_load(args.port, make, args.concurrency, args.duration, expect=(200, 201, 404)))
+            for name, make in makers.items()
+        }
+    finally:
+        if server:
+            stop_server(server)
+
+    output = {
+        "benchmark": "load",
+        "suppliers": args.suppliers,
+        "items_per_supplier": args.items,
+        "concurrency": args.concurrency,
+        "duration": args.duration,
+        "workers": None if args.no_server else args.workers,
+        "scenarios": results,
+    }
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump({**output, "database": app.config["SQLALCHEMY_DATABASE_URI"].split(":", 1)[0]}, file, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            output["regressions"] = compare(results, json.load(file), args.tolerance)
+    report(output)
+    if output.get("regressions"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Benchmark: overhead of the request metrics
+
+Usage:
+  python -m benchmarks.bench_metrics --requests 2000
+
+Times the same requests through the Flask test client with the metrics
+hooks and engine listeners in place and with them taken out, and reports
+the cost per request. GET / touches no database and GET /suppliers/<id>
+is answered from the cache after its first read, so the hooks are a
+large share of the time of both.
+"""
+import argparse
+import statistics
+from sqlalchemy import event
+from benchmarks.common import app, report, seed, time_call
+from service.common import db_stats, metrics
+from service.models import db
+
+ENGINE_LISTENERS = [
+    ("before_cursor_execute", db_stats._before_cursor_execute),  # pylint: disable=protected-access
+    ("after_cursor_execute", db_stats._after_cursor_execute),  # pylint: disable=protected-access
+]
+
+
+def set_metrics(enabled):
+    """Adds or takes out the request hooks and statement timers"""
+    before = app.before_request_funcs.setdefault(None, [])
+    after = app.after_request_funcs.setdefault(None, [])
+    if enabled == (metrics.start_timer in before):
+        return
+    if enabled:
+        before.append(metrics.start_timer)
+        after.append(metrics.record_request)
+        db_stats.instrument(db.engine)
+    else:
+        before.remove(metrics.start_timer)
+        after.remove(metrics.record_request)
+        for name, listener in ENGINE_LISTENERS:
+            event.remove(db.engine, name, listener)
+
+
+def main():
+    """Times requests with and without the metrics"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    seed(100, 5)
+    client = app.test_client()
+    paths = {"index": "/", "get_supplier": "/suppliers/1", "list_suppliers": "/suppliers"}
+    results = {}
+    for name, path in paths.items():
+
+        def run(p=path):
+            for _ in range(args.requests):
+                client.get(p)
+
+        run()  # warm up the cache and the connection
+        # alternate the two so that drift on the machine hits both alike
+        timings = {True: [], False: []}
+        for _ in range(args.repeat):
+            for enabled in (True, False):
+                set_metrics(enabled)
+                timings[enabled].append(time_call(run, 1) * 1000 / args.requests)
+        set_metrics(True)
+        with_metrics = statistics.median(timings[True])
+        without = statistics.median(timings[False])
+        results[name] = {
+            "with_metrics_us": round(with_metrics, 1),
+            "without_metrics_us": round(without, 1),
+            "overhead_us": round(with_metrics - without, 1),
+            "overhead_pct": round((with_metrics - without) / without * 100, 1),
+        }
+
+    report({"benchmark": "metrics", "requests": args.requests, "results": results})
+
+
+if __name__ == "__main__":
+    main()
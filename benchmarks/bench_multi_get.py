@@ -0,0 +1,64 @@
+"""
+Benchmark: GET /suppliers?ids=... vs one GET /suppliers/<id> per Supplier
+
+Usage:
+  python -m benchmarks.bench_multi_get --suppliers 10000 --items 5
+
+Reports the median time to resolve 50, 100 and 200 random ids with
+sequential single reads and with one multi-get. The cache is turned off
+so both approaches read from the database every time.
+"""
+import argparse
+import random
+from benchmarks.common import app, report, seed, time_call
+from service.common.cache import cache
+
+
+def sequential_gets(client, ids):
+    """Reads the Suppliers one request at a time"""
+    for supplier_id in ids:
+        client.get(f"/suppliers/{supplier_id}")
+
+
+def multi_get(client, ids):
+    """Reads the Suppliers with one request"""
+    client.get("/suppliers", query_string={"ids": ",".join(map(str, ids))})
+
+
+def main():
+    """Seeds the database and times both approaches"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--suppliers", type=int, default=10000)
+    parser.add_argument("--items", type=int, default=5, help="items per supplier")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    seed(args.suppliers, args.items)
+    cache.enabled = False
+    client = app.test_client()
+    results = []
+    for count in (50, 100, 200):
+        ids = random.sample(range(1, args.suppliers + 1), count)
+        sequential = time_call(lambda i=ids: sequential_gets(client, i), args.repeat)
+        batch = time_call(lambda i=ids: multi_get(client, i), args.repeat)
+        results.append(
+            {
+                "ids": count,
+                "sequential_ms": sequential,
+                "multi_get_ms": batch,
+                "speedup": round(sequential / batch, 1),
+            }
+        )
+
+    report(
+        {
+            "benchmark": "multi_get",
+            "suppliers": args.suppliers,
+            "items_per_supplier": args.items,
+            "results": results,
+        }
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Benchmark: keyset vs OFFSET pagination of Suppliers
+
+Usage:
+  python -m benchmarks.bench_pagination --suppliers 100000
+
+Reports the median time to read one page at increasing depths. Keyset
+pages should stay flat while OFFSET pages grow with the page number.
+"""
+import argparse
+from benchmarks.common import app, report, seed, time_call
+from service.models import Supplier
+
+
+def offset_page(page, limit):
+    """Reads a page the old way with OFFSET"""
+    return Supplier.query.order_by(Supplier.id).offset((page - 1) * limit).limit(limit).all()
+
+
+def keyset_page(page, limit):
+    """Reads a page with keyset pagination (ids are dense after seeding)"""
+    return Supplier.find_page(after=(page - 1) * limit, limit=limit)
+
+
+def main():
+    """Seeds the database and times pages at increasing depths"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--suppliers", type=int, default=100000)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    seed(args.suppliers)
+    last_page = args.suppliers // args.limit
+    pages = sorted({1, 10, 100, 1000, 5000, last_page} & set(range(1, last_page + 1)))
+
+    client = app.test_client()
+    results = []
+    for page in pages:
+        after = (page - 1) * args.limit
+        results.append(
+            {
+                "page": page,
+                "keyset_ms": time_call(lambda p=page: keyset_page(p, args.limit), args.repeat),
+                "offset_ms": time_call(lambda p=page: offset_page(p, args.limit), args.repeat),
+                "route_ms": time_call(
+                    lambda a=after: client.get(f"/suppliers?after={a}&limit={args.limit}"),
+                    args.repeat,
+                ),
+            }
+        )
+
+    report(
+        {
+            "benchmark": "pagination",
+            "suppliers": args.suppliers,
+            "limit": args.limit,
+            "results": results,
+        }
+    )
+
+
+if __name__ == "__main__":
+    main()
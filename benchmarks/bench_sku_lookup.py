@@ -0,0 +1,88 @@
+"""
+Benchmark: GET /items?sku= and GET /items/best-price with and without ix_item_sku_price
+
+Usage:
+  python -m benchmarks.bench_sku_lookup --suppliers 20000 --items 100 --skus 10000
+
+Loads suppliers * items rows (two million by default) whose skus are drawn
+from a shared pool, so every sku is sold by many Suppliers. Reports the
+median time of both endpoints for random skus, then drops the (sku, price)
+index and times them again.
+"""
+import argparse
+import random
+from sqlalchemy import text
+from benchmarks.common import ITEM_COLUMNS, app, bulk_insert, report, reset_database, supplier_rows, time_call
+from service.models import db, Supplier, Item
+from tests.factories import ItemFactory
+
+
+def sku_item_rows(suppliers, items_per_supplier, skus):
+    """Generates Item rows from the ItemFactory with skus from a shared pool"""
+    item_id = 1
+    for supplier_id in range(1, suppliers + 1):
+        for _ in range(items_per_supplier):
+            item = ItemFactory.build(
+                id=item_id, supplier_id=supplier_id, supplier=None, sku=f"SKU{random.randrange(skus):07d}"
+            )
+            yield {column: getattr(item, column) for column in ITEM_COLUMNS}
+            item_id += 1
+
+
+def time_lookups(client, skus, repeat):
+    """Returns the median time of both endpoints over a sample of skus"""
+
+    def search():
+        for sku in skus:
+            client.get("/items", query_string={"sku": sku})
+
+    def best_price():
+        for sku in skus:
+            client.get("/items/best-price", query_string={"sku": sku, "qty": 500})
+
+    return {
+        "search_ms": round(time_call(search, repeat) / len(skus), 3),
+        "best_price_ms": round(time_call(best_price, repeat) / len(skus), 3),
+    }
+
+
+def main():
+    """Seeds the database and times the lookups with and without the index"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--suppliers", type=int, default=20000)
+    parser.add_argument("--items", type=int, default=100, help="items per supplier")
+    parser.add_argument("--skus", type=int, default=10000, help="distinct skus")
+    parser.add_argument("--sample", type=int, default=50, help="skus looked up per run")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    reset_database()
+    bulk_insert(Supplier, supplier_rows(args.suppliers))
+    rows = bulk_insert(Item, sku_item_rows(args.suppliers, args.items, args.skus))
+    db.session.execute(text("ANALYZE"))
+    db.session.commit()
+
+    client = app.test_client()
+    skus = [f"SKU{random.randrange(args.skus):07d}" for _ in range(args.sample)]
+    indexed = time_lookups(client, skus, args.repeat)
+
+    db.session.execute(text("DROP INDEX ix_item_sku_price"))
+    db.session.commit()
+    unindexed = time_lookups(client, skus, args.repeat)
+
+    report(
+        {
+            "benchmark": "sku_lookup",
+            "items": rows,
+            "skus": args.skus,
+            "indexed": indexed,
+            "unindexed": unindexed,
+            "speedup": {
+                key: round(unindexed[key] / indexed[key], 1) for key in indexed
+            },
+        }
+    )
+
+
+if __name__ == "__main__":
+    main()
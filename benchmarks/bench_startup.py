@@ -0,0 +1,90 @@
+"""
+Benchmark: import and startup time of the service
+
+Usage:
+  python -m benchmarks.bench_startup --runs 10
+
+Starts a fresh interpreter for every run, like a new gunicorn worker or
+flask command, and times:
+
+  import          import service, which no longer touches the database
+  eager_schema    import plus the context push and create_all() that the
+                  import used to do, for comparison
+  first_request   import plus the first GET /suppliers/<id>, which opens
+                  the first connection
+
+The medians are reported in milliseconds next to the interpreter time.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from benchmarks.common import report, seed
+
+SCENARIOS = {
+    "import": """
+start = time.perf_counter()
+import service
+elapsed = time.perf_counter() - start
+""",
+    "eager_schema": """
+start = time.perf_counter()
+import service
+from service.models import db
+service.app.app_context().push()
+db.create_all()
+elapsed = time.perf_counter() - start
+""",
+    "first_request": """
+start = time.perf_counter()
+import service
+response = service.app.test_client().get("/suppliers/1")
+assert response.status_code == 200, response.status_code
+elapsed = time.perf_counter() - start
+""",
+}
+
+
+def time_scenario(code):
+    """Runs code in a new interpreter and returns (code time, process time) in ms"""
+    script = "import json, time\n" + code + "print(json.dumps(elapsed))\n"
+    start = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, "-c", script],
+        env=os.environ.copy(),
+        capture_output=True,
+        check=True,
+        text=True,
+    ).stdout
+    process = time.perf_counter() - start
+    return json.loads(output.strip().splitlines()[-1]) * 1000, process * 1000
+
+
+def main():
+    """Times the startup scenarios in fresh interpreters"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    seed(10)
+    baseline = statistics.median(time_scenario("elapsed = 0\n")[1] for _ in range(args.runs))
+    # take turns so that drift on the machine hits every scenario alike
+    runs = {name: [] for name in SCENARIOS}
+    for _ in range(args.runs):
+        for name, code in SCENARIOS.items():
+            runs[name].append(time_scenario(code))
+    results = {"interpreter_ms": round(baseline, 1)}
+    for name, timings in runs.items():
+        results[name] = {
+            "code_ms": round(statistics.median(code_ms for code_ms, _ in timings), 1),
+            "process_ms": round(statistics.median(process for _, process in timings), 1),
+        }
+
+    report({"benchmark": "startup", "runs": args.runs, "results": results})
+
+
+if __name__ == "__main__":
+    main()
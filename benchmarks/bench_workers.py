@@ -0,0 +1,88 @@
+"""
+Load benchmark: gunicorn worker classes
+
+Usage:
+  python -m benchmarks.bench_workers --workers 2 --threads 4 --concurrency 16 64
+
+Seeds the database, then starts gunicorn with gunicorn.conf.py once for
+every worker class (sync, gthread and gevent when it is installed) with
+the same number of worker processes, and drives a mix of reads from the
+load generator at each concurrency level. Reports requests/sec and
+p50/p95/p99 latency. The cache is turned off in the servers so that
+every request reads from the database.
+"""
+import os
+import sys
+import random
+import asyncio
+import argparse
+import importlib.util
+from benchmarks.common import report, seed
+from benchmarks.loadgen import run_load, start_server, stop_server
+
+
+def worker_classes():
+    """Returns the worker classes that can run here"""
+    classes = ["sync", "gthread"]
+    if importlib.util.find_spec("gevent"):
+        classes.append("gevent")
+    return classes
+
+
+def run_server(worker_class, args, paths):
+    """Starts gunicorn with a worker class, loads it at every concurrency level and stops it"""
+    env = dict(
+        os.environ,
+        CACHE_ENABLED="false",
+        GUNICORN_WORKERS=str(args.workers),
+        GUNICORN_WORKER_CLASS=worker_class,
+        GUNICORN_THREADS=str(args.threads),
+        GUNICORN_MAX_REQUESTS="0",  # no restarts in the middle of a run
+        LOG_LEVEL="warning",
+    )
+    command = ["gunicorn", "-c", "gunicorn.conf.py", "--bind", f"127.0.0.1:{args.port}", "service:app"]
+    server = start_server(command, args.port, env=env)
+    try:
+        return [
+            {"concurrency": level, **asyncio.run(load(args.port, paths, level, args.duration))}
+            for level in args.concurrency
+        ]
+    finally:
+        stop_server(server)
+
+
+def load(port, paths, concurrency, duration):
+    """Sends random reads at a concurrency level"""
+    return run_load(port, lambda: ("GET", random.choice(paths), None), concurrency, duration)
+
+
+def main():
+    """Seeds the database and loads each worker class"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--suppliers", type=int, default=1000)
+    parser.add_argument("--items", type=int, default=5, help="items per supplier")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=4, help="threads per gthread worker")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[16, 64])
+    parser.add_argument("--duration", type=float, default=10, help="seconds per level")
+    parser.add_argument("--port", type=int, default=8089)
+    args = parser.parse_args()
+
+    seed(args.suppliers, args.items)
+    paths = [f"/suppliers/{supplier_id}" for supplier_id in range(1, args.suppliers + 1)]
+    paths += [f"/suppliers/{supplier_id}/items" for supplier_id in range(1, args.suppliers + 1)]
+    paths += ["/suppliers?limit=20"]
+    results = {name: run_server(name, args, paths) for name in worker_classes()}
+    report(
+        {
+            "benchmark": "workers",
+            "python": sys.version.split()[0],
+            "workers": args.workers,
+            "threads": args.threads,
+            "results": results,
+        }
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Shared helpers for the benchmark scripts
+
+Benchmarks use the database in DATABASE_URI. When it is not set they
+default to a throwaway SQLite file so they can be run without Postgres.
+This module must be imported before the service so the default applies.
+"""
+import os
+import json
+import statistics
+import tempfile
+import time
+
+os.environ.setdefault(
+    "DATABASE_URI",
+    "sqlite:///" + os.path.join(tempfile.gettempdir(), "suppliers-bench.db"),
+)
+
+# pylint: disable=wrong-import-position
+from sqlalchemy import insert  # noqa: E402
+from service import app  # noqa: E402
+from service.models import db, Supplier, Item  # noqa: E402
+from tests.factories import SupplierFactory, ItemFactory  # noqa: E402
+
+# the benchmarks talk to the database outside of requests
+app.app_context().push()
+
+SUPPLIER_COLUMNS = ("id", "name", "email", "phone_number", "date_joined")
+ITEM_COLUMNS = ("id", "supplier_id", "sku", "name", "quantity", "price")
+
+
+def reset_database():
+    """Drops and recreates all of the tables"""
+    db.session.remove()
+    db.drop_all()
+    db.create_all()
+
+
+def supplier_rows(count, start=1):
+    """Generates Supplier rows from the SupplierFactory"""
+    for supplier_id in range(start, start + count):
+        supplier = SupplierFactory.build(id=supplier_id)
+        yield {column: getattr(supplier, column) for column in SUPPLIER_COLUMNS}
+
+
+def item_rows(supplier_ids, items_per_supplier, start=1):
+    """Generates Item rows from the ItemFactory for every supplier id"""
+    item_id = start
+    for supplier_id in supplier_ids:
+        for _ in range(items_per_supplier):
+            item = ItemFactory.build(id=item_id, supplier_id=supplier_id, supplier=None)
+            yield {column: getattr(item, column) for column in ITEM_COLUMNS}
+            item_id += 1
+
+
+def bulk_insert(model, rows, batch_size=5000):
+    """Inserts rows in batches using executemany and returns the row count"""
+    total = 0
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == batch_size:
+            db.session.execute(insert(model), batch)
+            total += len(batch)
+            batch = []
+    if batch:
+        db.session.execute(insert(model), batch)
+        total += len(batch)
+    db.session.commit()
+    return total
+
+
+def seed(suppliers, items_per_supplier=0):
+    """Resets the database and loads suppliers with their items"""
+    reset_database()
+    bulk_insert(Supplier, supplier_rows(suppliers))
+    if items_per_supplier:
+        bulk_insert(Item, item_rows(range(1, suppliers + 1), items_per_supplier))
+
+
+def time_call(function, repeat=5):
+    """Returns the median wall time of a call in milliseconds"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - start) * 1000)
+    return round(statistics.median(timings), 3)
+
+
+def percentile(samples, pct):
+    """Returns the pct percentile of a list of timings (nearest rank)"""
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return round(ordered[rank], 3)
+
+
+def report(results):
+    """Prints benchmark results as JSON"""
+    results["database"] = app.config["SQLALCHEMY_DATABASE_URI"].split(":", 1)[0]
+    print(json.dumps(results, indent=2))
@@ -0,0 +1,102 @@
+"""
+A small concurrent HTTP load generator
+
+Keeps a number of requests in flight from asyncio tasks and reports the
+throughput and latency percentiles of the ones that succeeded. It opens
+a connection per request, which every server supports (sync gunicorn
+workers close each connection anyway), and needs nothing outside the
+standard library. It runs in one process, so on a small machine it can
+become the bottleneck before the server does.
+"""
+import time
+import asyncio
+import subprocess
+from benchmarks.common import percentile
+
+
+async def send(port, method, path, body=None, host="127.0.0.1"):
+    """Sends one request and returns the status code"""
+    reader, writer = await asyncio.open_connection(host, port)
+    head = f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n"
+    if body is not None:
+        head += f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+    writer.write(head.encode("latin-1") + b"\r\n" + (body or b""))
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    return int(response.split(b" ", 2)[1])
+
+
+async def run_load(port, make_request, concurrency, duration, expect=(200, 201)):
+    """
+    Sends requests from make_request() for duration seconds
+
+    Args:
+        make_request: returns the (method, path, body) of the next request
+        concurrency (int): the number of requests kept in flight
+        expect: the status codes that count as a success
+    """
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def client():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            method, path, body = make_request()
+            start = time.perf_counter()
+            try:
+                code = await send(port, method, path, body)
+            except OSError:
+                code = 0
+            if code in expect:
+                latencies.append((time.perf_counter() - start) * 1000)
+            else:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - start)
+
+
+def summarize(latencies, errors, elapsed):
+    """Returns the throughput and latency percentiles of a run"""
+    summary = {
+        "requests": len(latencies),
+        "errors": errors,
+        "requests_per_sec": round(len(latencies) / elapsed, 1),
+    }
+    for pct in (50, 95, 99):
+        summary[f"p{pct}_ms"] = percentile(latencies, pct) if latencies else None
+    return summary
+
+
+def wait_until_ready(port, timeout=30):
+    """Waits for a server to answer GET /"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if asyncio.run(send(port, "GET", "/")) == 200:
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server on port {port} did not start")
+
+
+def start_server(command, port, env=None):
+    """Starts a server process and waits until it answers"""
+    server = subprocess.Popen(  # pylint: disable=consider-using-with
+        command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        wait_until_ready(port)
+    except RuntimeError:
+        stop_server(server)
+        raise
+    return server
+
+
+def stop_server(server):
+    """Stops a server process"""
+    server.terminate()
+    server.wait()
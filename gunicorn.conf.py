@@ -0,0 +1,101 @@
+"""
+Gunicorn Configuration for Production
+
+Usage:
+  gunicorn -c gunicorn.conf.py service:app
+
+Every setting can be changed with an environment variable:
+
+  GUNICORN_WORKERS        worker processes (WEB_CONCURRENCY, else 2 * CPUs + 1)
+  GUNICORN_WORKER_CLASS   sync, gthread or gevent (default sync)
+  GUNICORN_THREADS        threads per gthread worker (default 4)
+  GUNICORN_PRELOAD        import the app once in the master before forking
+                          (default true, false for gevent)
+  GUNICORN_KEEPALIVE      seconds to keep an idle connection open (default 5)
+  GUNICORN_MAX_REQUESTS   requests before a worker is replaced (default 1000, 0 never)
+  GUNICORN_MAX_REQUESTS_JITTER  random extra requests so workers restart apart (default 100)
+  GUNICORN_TIMEOUT        seconds a request may take before its worker is killed (default 30)
+
+A gthread worker runs GUNICORN_THREADS requests at once against one
+connection pool, so keep DB_POOL_SIZE + DB_MAX_OVERFLOW at least as large.
+"""
+import glob
+import multiprocessing
+import os
+import sys
+
+WORKER_CLASSES = ("sync", "gthread", "gevent")
+
+
+def _flag(name, default):
+    return os.getenv(name, default).lower() in ("true", "yes", "1")
+
+
+######################################################################
+# Workers
+######################################################################
+bind = f"0.0.0.0:{os.getenv('PORT', '8080')}"
+workers = int(os.getenv("GUNICORN_WORKERS", os.getenv("WEB_CONCURRENCY", str(multiprocessing.cpu_count() * 2 + 1))))
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "sync")
+if worker_class not in WORKER_CLASSES:
+    raise ValueError(f"GUNICORN_WORKER_CLASS must be one of {', '.join(WORKER_CLASSES)}, not '{worker_class}'")
+threads = int(os.getenv("GUNICORN_THREADS", "4")) if worker_class == "gthread" else 1
+
+# gevent patches the standard library when the worker starts, which is
+# too late for locks and sockets made by an app imported in the master
+preload_app = _flag("GUNICORN_PRELOAD", "false" if worker_class == "gevent" else "true")
+
+######################################################################
+# Connections and worker recycling
+######################################################################
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))  # sync workers always close
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "1000"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "100"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "30"))
+graceful_timeout = timeout
+
+######################################################################
+# Logging
+######################################################################
+loglevel = os.getenv("LOG_LEVEL", "info")
+
+
+######################################################################
+# Server hooks
+######################################################################
+def on_starting(server):
+    """Removes the metrics files of the workers of the last run"""
+    directory = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+    if directory:
+        for path in glob.glob(os.path.join(directory, "*.db")):
+            os.remove(path)
+        server.log.info("Cleared Prometheus metrics in %s", directory)
+
+
+def post_fork(server, worker):  # pylint: disable=unused-argument
+    """
+    Gives the new worker connection pools of its own
+
+    With preload_app the engines were created in the master, and a pooled
+    connection the master opened would be shared by every worker. The
+    pools are replaced without closing those connections, which belong to
+    the master.
+    """
+    if "service" not in sys.modules:
+        return  # the app is loaded after the fork, nothing to share
+    # pylint: disable=import-outside-toplevel
+    from service import app
+    from service.models import db
+
+    with app.app_context():
+        db.engine.dispose(close=False)
+    if "replicas" in app.extensions:
+        app.extensions["replicas"].dispose(close=False)
+
+
+def child_exit(server, worker):  # pylint: disable=unused-argument
+    """Drops the live gauges of a worker that stopped"""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess  # pylint: disable=import-outside-toplevel
+
+        multiprocess.mark_process_dead(worker.pid)
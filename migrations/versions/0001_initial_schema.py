@@ -0,0 +1,48 @@
+"""initial schema
+
+The supplier and item tables as db.create_all() made them before
+migrations were introduced. Databases created that way should be
+stamped with this revision (flask db stamp 0001) and then upgraded.
+
+Revision ID: 0001
+Revises:
+Create Date: 2023-11-20 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'supplier',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=64), nullable=True),
+        sa.Column('email', sa.String(length=64), nullable=True),
+        sa.Column('phone_number', sa.String(length=32), nullable=True),
+        sa.Column('date_joined', sa.Date(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table(
+        'item',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('supplier_id', sa.Integer(), nullable=False),
+        sa.Column('sku', sa.String(length=12), nullable=False),
+        sa.Column('name', sa.String(length=64), nullable=False),
+        sa.Column('quantity', sa.Integer(), nullable=False),
+        sa.Column('price', sa.Numeric(precision=10, scale=2), nullable=False),
+        sa.ForeignKeyConstraint(['supplier_id'], ['supplier.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('item')
+    op.drop_table('supplier')
@@ -0,0 +1,45 @@
+"""supplier version and lookup indexes
+
+Adds the supplier.version column used for ETags and indexes the columns
+the service looks records up by. On Postgres the indexes are built
+CONCURRENTLY so the tables stay writable while they are created.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2023-11-20 10:05:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_supplier_name', 'supplier', ['name']),
+    ('ix_supplier_email', 'supplier', ['email']),
+    ('ix_item_sku', 'item', ['sku']),
+    ('ix_item_supplier_id_sku', 'item', ['supplier_id', 'sku']),
+]
+
+
+def upgrade():
+    op.add_column(
+        'supplier',
+        sa.Column('version', sa.Integer(), nullable=False, server_default='1')
+    )
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
+    with op.batch_alter_table('supplier') as batch_op:
+        batch_op.drop_column('version')
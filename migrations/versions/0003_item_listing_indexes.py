@@ -0,0 +1,49 @@
+"""item listing indexes
+
+Composite indexes for paging and filtering the items of one supplier.
+ix_item_supplier_id_sku is rebuilt with varchar_pattern_ops on Postgres
+so that sku prefix searches (LIKE 'ABC%') can use it in any locale.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2023-11-27 09:30:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_item_supplier_id_id', ['supplier_id', 'id']),
+    ('ix_item_supplier_id_name', ['supplier_id', 'name']),
+    ('ix_item_supplier_id_price', ['supplier_id', 'price']),
+    ('ix_item_supplier_id_quantity', ['supplier_id', 'quantity']),
+]
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        for name, columns in INDEXES:
+            op.create_index(name, 'item', columns, postgresql_concurrently=True)
+        op.drop_index('ix_item_supplier_id_sku', table_name='item', postgresql_concurrently=True)
+        op.create_index(
+            'ix_item_supplier_id_sku', 'item', ['supplier_id', 'sku'],
+            postgresql_ops={'sku': 'varchar_pattern_ops'},
+            postgresql_concurrently=True
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_item_supplier_id_sku', table_name='item', postgresql_concurrently=True)
+        op.create_index(
+            'ix_item_supplier_id_sku', 'item', ['supplier_id', 'sku'],
+            postgresql_concurrently=True
+        )
+        for name, _ in reversed(INDEXES):
+            op.drop_index(name, table_name='item', postgresql_concurrently=True)
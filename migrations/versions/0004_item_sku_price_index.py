@@ -0,0 +1,30 @@
+"""item sku price index
+
+Replaces the single column sku index with (sku, price) so that the
+cheapest offers for a sku are read straight from the index in order.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2023-12-04 14:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        op.create_index('ix_item_sku_price', 'item', ['sku', 'price'], postgresql_concurrently=True)
+        op.drop_index('ix_item_sku', table_name='item', postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.create_index('ix_item_sku', 'item', ['sku'], postgresql_concurrently=True)
+        op.drop_index('ix_item_sku_price', table_name='item', postgresql_concurrently=True)
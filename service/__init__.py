@@ -2,16 +2,17 @@
 Package: service
 Package for the application models and service routes
 This module creates and configures the Flask app and sets up the logging
-and SQL database
+and SQL database. The database is not contacted until the first request.
 """
 import sys
 from flask import Flask
 from service import config
-from service.common import log_handlers
+from service.common import compression, db_stats, log_handlers, metrics
+from service.common.cache import cache
+from service.common.json_provider import FastJSONProvider
 
 # Create Flask application
 app = Flask(__name__)
-app.config.from_object(config)
 
 # Dependencies require we import the routes AFTER the Flask app is created
 # pylint: disable=wrong-import-position, wrong-import-order, cyclic-import
@@ -19,18 +20,43 @@ from service import routes, models  # noqa: E402, E261
 # pylint: disable=wrong-import-position
 from service.common import error_handlers, cli_commands  # noqa: F401, E402
 
-# Set up logging for production
-log_handlers.init_logging(app, "gunicorn.error")
 
-app.logger.info(70 * "*")
-app.logger.info("  S U P P L I E R   S E R V I C E   R U N N I N G  ".center(70, "*"))
-app.logger.info(70 * "*")
+def create_app():
+    """
+    Configures the Flask app and returns it
 
-try:
-    models.init_db(app)  # make our SQLAlchemy tables
-except Exception as error:  # pylint: disable=broad-except
-    app.logger.critical("%s: Cannot continue", error)
-    # gunicorn requires exit code 4 to stop spawning workers when they die
-    sys.exit(4)
+    This is the app factory for WSGI servers, e.g. gunicorn "service:create_app()".
+    It does not touch the database: connections are opened by the first
+    request and the tables are created or upgraded with flask db-init.
+    """
+    if "sqlalchemy" in app.extensions:
+        return app
+    app.config.from_object(config)
+    app.json = FastJSONProvider(app)
+    cache.init_app(app)
 
-app.logger.info("Service initialized!")
+    # Set up logging for production
+    log_handlers.init_logging(app, "gunicorn.error")
+
+    app.logger.info(70 * "*")
+    app.logger.info("  S U P P L I E R   S E R V I C E   R U N N I N G  ".center(70, "*"))
+    app.logger.info(70 * "*")
+
+    try:
+        models.init_db(app)  # set up SQLAlchemy without connecting
+    except Exception as error:  # pylint: disable=broad-except
+        app.logger.critical("%s: Cannot continue", error)
+        # gunicorn requires exit code 4 to stop spawning workers when they die
+        sys.exit(4)
+
+    db_stats.init_app(app)
+    metrics.init_app(app)
+    # registered last so it runs first and the metrics time the compression too
+    compression.init_app(app)
+
+    app.logger.info("Service initialized!")
+    return app
+
+
+# service:app is configured on import as well
+create_app()
@@ -0,0 +1,462 @@
+"""
+Module: asgi
+
+An optional ASGI entry point for the Supplier API
+
+The Flask app runs on workers that block on every database round trip,
+so serving more requests at once means running more processes, each with
+its own connection pool. This module serves the Supplier and Item
+endpoints from async handlers on an AsyncEngine instead, so one process
+can wait on many queries at the same time. Requests are validated and
+serialized by the same models as the Flask routes.
+
+It needs an ASGI server and an async driver for the database: aiosqlite
+for SQLite, while psycopg is async already. Run it with:
+
+  uvicorn service.asgi:application --workers 2
+
+The sparse fieldset parameters, the export stream and the batch endpoints
+are only served by the Flask app.
+"""
+import re
+import logging
+from http import HTTPStatus
+from urllib.parse import parse_qsl, urlencode
+from sqlalchemy import select
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from werkzeug.exceptions import InternalServerError
+from werkzeug.http import parse_etags, quote_etag
+from service import app
+from service.common import status
+from service.common.cache import cache
+from service.common.query_args import QueryArgs, trim_page
+from service.models import Supplier, Item, DataValidationError, listen_session_events
+
+logger = logging.getLogger("flask.app")
+
+# Async drivers by database backend
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+psycopg",
+}
+
+# Query parameters that only the Flask app understands
+FIELDSET_ARGS = ("fields", "include", "exclude")
+
+# The message of a 500, the same one the Flask app sends
+INTERNAL_ERROR_MESSAGE = str(InternalServerError())
+
+
+def async_database_uri(uri):
+    """Returns a database URI with the async driver of its backend"""
+    url = make_url(uri)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver for database '{backend}'")
+    return url.set(drivername=ASYNC_DRIVERS[backend])
+
+
+class AsyncBackedSession(Session):  # pylint: disable=too-few-public-methods
+    """The Session that runs the queries of every AsyncSession of the app"""
+
+
+# versions and cached payloads are kept in step just like with db.session
+listen_session_events(AsyncBackedSession)
+
+
+######################################################################
+#  R E Q U E S T S   A N D   E R R O R S
+######################################################################
+class HTTPError(Exception):
+    """Ends a request with an error status and message"""
+
+    def __init__(self, status_code, message):
+        super().__init__(message)
+        self.status_code = status_code
+
+    def body(self):
+        """Returns the error in the same format as the Flask error handlers"""
+        return {
+            "status": self.status_code,
+            "error": HTTPStatus(self.status_code).phrase,
+            "message": str(self),
+        }
+
+
+class Request:
+    """The parts of an ASGI HTTP request that the handlers need"""
+
+    def __init__(self, scope, body=b""):
+        self.method = scope["method"]
+        self.path = scope["path"]
+        args = dict(parse_qsl(scope["query_string"].decode("latin-1")))
+        self.query = QueryArgs(args, app.config, bad_request)
+        self.headers = {
+            name.decode("latin-1"): value.decode("latin-1") for name, value in scope["headers"]
+        }
+        self.body = body
+        self.scheme = scope.get("scheme", "http")
+        server = scope.get("server") or ("localhost", 80)
+        self.host = self.headers.get("host", f"{server[0]}:{server[1]}")
+
+    @property
+    def args(self):
+        """The query parameters as a dict"""
+        return self.query.args
+
+    def url(self, path, **args):
+        """Returns the absolute URL of a path with query parameters"""
+        query = f"?{urlencode(args)}" if args else ""
+        return f"{self.scheme}://{self.host}{path}{query}"
+
+    def check_content_type(self, media_type):
+        """Checks that the media type is correct"""
+        content_type = self.headers.get("content-type")
+        if content_type != media_type:
+            logger.error("Invalid Content-Type: %s", content_type)
+            raise HTTPError(
+                status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, f"Content-Type must be {media_type}"
+            )
+
+    def json(self):
+        """Returns the decoded JSON body"""
+        try:
+            return app.json.loads(self.body)
+        except ValueError as error:
+            raise HTTPError(status.HTTP_400_BAD_REQUEST, "Request body is not valid JSON.") from error
+
+
+def bad_request(message):
+    """Ends a request with a 400 Bad Request"""
+    raise HTTPError(status.HTTP_400_BAD_REQUEST, message)
+
+
+def paginate(request, results, limit):
+    """Trims a page read with one extra row and adds the next page Link"""
+    headers = {}
+    results, after = trim_page(results, limit)
+    if after is not None:
+        args = dict(request.args, after=after, limit=limit)
+        headers["Link"] = f'<{request.url(request.path, **args)}>; rel="next"'
+    return status.HTTP_200_OK, results, headers
+
+
+def not_found(name, by_id):
+    """Returns the error for a resource that does not exist"""
+    return HTTPError(status.HTTP_404_NOT_FOUND, f"{name} with id '{by_id}' could not be found.")
+
+
+######################################################################
+#  R O U T I N G
+######################################################################
+ROUTES = []
+
+
+def route(pattern, method="GET"):
+    """Registers a handler for a method and a path like /suppliers/<int:supplier_id>"""
+    regex = re.compile("^" + re.sub(r"<int:(\w+)>", r"(?P<\1>[0-9]+)", pattern) + "$")
+
+    def decorator(handler):
+        ROUTES.append((regex, method, handler))
+        return handler
+
+    return decorator
+
+
+def match(request):
+    """Returns the handler and path parameters of a request"""
+    methods = []
+    for regex, method, handler in ROUTES:
+        found = regex.match(request.path)
+        if not found:
+            continue
+        if method == request.method:
+            return handler, {name: int(value) for name, value in found.groupdict().items()}
+        methods.append(method)
+    if methods:
+        raise HTTPError(
+            status.HTTP_405_METHOD_NOT_ALLOWED,
+            f"The method {request.method} is not allowed for the requested URL.",
+        )
+    raise HTTPError(status.HTTP_404_NOT_FOUND, f"The URL {request.path} was not found on the server.")
+
+
+######################################################################
+#  R E S T   A P I   E N D P O I N T S
+######################################################################
+# Every handler is called with an AsyncSession and the Request and
+# returns the status code, the body and the extra headers.
+
+@route("/")
+async def index(session, request):  # pylint: disable=unused-argument
+    """Root URL response"""
+    body = {
+        "name": "Supplier REST API Service",
+        "version": "1.0",
+        "paths": request.url("/suppliers"),
+    }
+    return status.HTTP_200_OK, body, {}
+
+
+@route("/suppliers")
+async def list_suppliers(session, request):
+    """Returns a page of Suppliers, or the Suppliers with ?ids="""
+    if "ids" in request.args:
+        return await lookup_suppliers(session, request.query.ids("ids"))
+    after = request.query.integer("after")
+    limit = request.query.limit()
+
+    statement = select(Supplier).options(*Supplier.loader_options("selectin"))
+    name = request.args.get("name")
+    if name:
+        statement = statement.where(Supplier.name == name)
+    if after is not None:
+        statement = statement.where(Supplier.id > after)
+    # Read one extra row to find out if there is a next page
+    suppliers = await session.scalars(statement.order_by(Supplier.id).limit(limit + 1))
+    return paginate(request, [supplier.serialize() for supplier in suppliers], limit)
+
+
+async def lookup_suppliers(session, supplier_ids):
+    """Returns many Suppliers by id, with a not found entry for missing ids"""
+    statement = (
+        select(Supplier)
+        .options(*Supplier.loader_options("selectin"))
+        .where(Supplier.id.in_(set(supplier_ids)))
+    )
+    suppliers = {supplier.id: supplier.serialize() for supplier in await session.scalars(statement)}
+    results = [
+        suppliers.get(supplier_id) or {"id": supplier_id, **not_found("Supplier", supplier_id).body()}
+        for supplier_id in supplier_ids
+    ]
+    return status.HTTP_200_OK, results, {}
+
+
+@route("/suppliers", "POST")
+async def create_suppliers(session, request):
+    """Creates a Supplier"""
+    request.check_content_type("application/json")
+    # an empty collection to start with, so serialize() never lazy loads it
+    supplier = Supplier()
+    supplier.items = []
+    supplier.deserialize(request.json())
+    session.add(supplier)
+    await session.commit()
+    location_url = request.url(f"/suppliers/{supplier.id}")
+    return status.HTTP_201_CREATED, supplier.serialize(), {"Location": location_url}
+
+
+@route("/suppliers/<int:supplier_id>")
+async def get_suppliers(session, request, supplier_id):
+    """Returns a Supplier with an ETag, or 304 Not Modified for a matching If-None-Match"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        version = await session.scalar(select(Supplier.version).where(Supplier.id == supplier_id))
+        etag = Supplier.make_etag(supplier_id, version)
+        if version is not None and parse_etags(if_none_match).contains_weak(etag):
+            return status.HTTP_304_NOT_MODIFIED, None, {"ETag": quote_etag(etag)}
+
+    async def load_supplier():
+        supplier = await session.get(Supplier, supplier_id, options=Supplier.loader_options("joined"))
+        return supplier.serialize() if supplier else None
+
+    message = await cache.aget_or_set(Supplier.cache_key(supplier_id), load_supplier)
+    if not message:
+        raise not_found("Supplier", supplier_id)
+    etag = Supplier.make_etag(supplier_id, message["version"])
+    return status.HTTP_200_OK, message, {"ETag": quote_etag(etag)}
+
+
+@route("/suppliers/<int:supplier_id>/items", "POST")
+async def create_items(session, request, supplier_id):
+    """Adds an Item to a Supplier"""
+    request.check_content_type("application/json")
+    supplier = await session.get(Supplier, supplier_id, options=Supplier.loader_options("noload"))
+    if not supplier:
+        raise not_found("Supplier", supplier_id)
+    item = Item().deserialize(request.json())
+    supplier.items.append(item)
+    await session.commit()
+    return status.HTTP_201_CREATED, item.serialize(), {}
+
+
+@route("/suppliers/<int:supplier_id>/items")
+async def list_items(session, request, supplier_id):
+    """Returns a page of a Supplier's Items that match the filters"""
+    after = request.query.integer("after")
+    limit = request.query.limit()
+    criteria = Item.supplier_criteria(
+        supplier_id,
+        sku=request.args.get("sku"),
+        name=request.args.get("name"),
+        min_price=request.query.decimal("min_price"),
+        max_price=request.query.decimal("max_price"),
+        min_quantity=request.query.integer("min_quantity"),
+        max_quantity=request.query.integer("max_quantity"),
+    )
+    if await session.scalar(select(Supplier.version).where(Supplier.id == supplier_id)) is None:
+        raise not_found("Supplier", supplier_id)
+
+    statement = select(Item).where(*criteria)
+    if after is not None:
+        statement = statement.where(Item.id > after)
+    items = await session.scalars(statement.order_by(Item.id).limit(limit + 1))
+    return paginate(request, [item.serialize() for item in items], limit)
+
+
+@route("/suppliers/<int:supplier_id>/items/<int:item_id>")
+async def get_items(session, request, supplier_id, item_id):  # pylint: disable=unused-argument
+    """Returns an Item"""
+
+    async def load_item():
+        item = await session.get(Item, item_id)
+        return item.serialize() if item else None
+
+    message = await cache.aget_or_set(Item.cache_key(item_id), load_item)
+    if not message:
+        raise not_found("Item", item_id)
+    return status.HTTP_200_OK, message, {}
+
+
+@route("/items")
+async def search_items(session, request):
+    """Returns the Items with a sku from every Supplier, cheapest first"""
+    statement = (
+        select(Item)
+        .where(Item.sku == request.query.required("sku"))
+        .order_by(Item.price, Item.id)
+        .limit(request.query.limit())
+    )
+    items = await session.scalars(statement)
+    return status.HTTP_200_OK, [item.serialize() for item in items], {}
+
+
+@route("/items/best-price")
+async def get_best_price(session, request):
+    """Returns the cheapest Item with a sku for an order quantity"""
+    sku = request.query.required("sku")
+    quantity = request.query.integer("qty")
+    if quantity is None:
+        raise HTTPError(status.HTTP_400_BAD_REQUEST, "Query parameter 'qty' is required.")
+    statement = (
+        select(Item)
+        .where(Item.sku == sku, Item.quantity <= quantity)
+        .order_by(Item.price, Item.id)
+        .limit(1)
+    )
+    item = await session.scalar(statement)
+    if not item:
+        raise HTTPError(
+            status.HTTP_404_NOT_FOUND,
+            f"No Supplier sells sku '{sku}' in a quantity of {quantity}.",
+        )
+    return status.HTTP_200_OK, item.serialize(), {}
+
+
+######################################################################
+#  A S G I   A P P L I C A T I O N
+######################################################################
+class SupplierASGI:
+    """
+    ASGI application that serves the Supplier API from async handlers
+
+    The engine is created when the server starts (or on the first request
+    for servers without lifespan events) and every request gets its own
+    AsyncSession from it.
+    """
+
+    def __init__(self, database_uri=None):
+        self.database_uri = database_uri
+        self.engine = None
+        self.sessions = None
+
+    async def startup(self):
+        """Creates the async engine and session factory"""
+        uri = (
+            self.database_uri
+            or app.config.get("ASYNC_DATABASE_URI")
+            or async_database_uri(app.config["SQLALCHEMY_DATABASE_URI"])
+        )
+        options = {}
+        if make_url(uri).get_backend_name() == "sqlite":
+            # aiosqlite opens a connection (and a thread) per checkout by default
+            options["poolclass"] = AsyncAdaptedQueuePool
+        self.engine = create_async_engine(uri, **options)
+        # serialize() must not lazy load after a commit, so nothing is expired
+        self.sessions = async_sessionmaker(
+            self.engine, sync_session_class=AsyncBackedSession, expire_on_commit=False
+        )
+        logger.info("ASGI app connected to %s", self.engine.url.render_as_string())
+
+    async def shutdown(self):
+        """Closes every pooled connection"""
+        if self.engine is not None:
+            await self.engine.dispose()
+            self.engine = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self.lifespan(receive, send)
+            return
+        if self.engine is None:
+            await self.startup()
+
+        body = b""
+        more_body = True
+        while more_body:
+            message = await receive()
+            body += message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+        request = Request(scope, body)
+        try:
+            handler, params = match(request)
+            if any(name in request.args for name in FIELDSET_ARGS):
+                raise HTTPError(status.HTTP_400_BAD_REQUEST, "Sparse fieldsets are not supported here.")
+            async with self.sessions() as session:
+                status_code, payload, headers = await handler(session, request, **params)
+        except HTTPError as error:
+            logger.warning(str(error))
+            status_code, payload, headers = error.status_code, error.body(), {}
+        except DataValidationError as error:
+            error = HTTPError(status.HTTP_400_BAD_REQUEST, str(error))
+            logger.warning(str(error))
+            status_code, payload, headers = error.status_code, error.body(), {}
+        except Exception as error:  # pylint: disable=broad-except
+            logger.exception("Internal Server Error: %s", error)
+            # the error itself can hold SQL and its parameters, so it is only logged
+            error = HTTPError(status.HTTP_500_INTERNAL_SERVER_ERROR, INTERNAL_ERROR_MESSAGE)
+            status_code, payload, headers = error.status_code, error.body(), {}
+        await self.respond(send, status_code, payload, headers)
+
+    async def lifespan(self, receive, send):
+        """Opens and closes the engine with the server"""
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await self.startup()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await self.shutdown()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    @staticmethod
+    async def respond(send, status_code, payload, headers):
+        """Sends a JSON response"""
+        body = b"" if payload is None else app.json.encode(payload) + b"\n"
+        raw_headers = [(b"content-length", str(len(body)).encode("latin-1"))]
+        if payload is not None:
+            raw_headers.append((b"content-type", b"application/json"))
+        raw_headers.extend(
+            (name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers.items()
+        )
+        await send({"type": "http.response.start", "status": status_code, "headers": raw_headers})
+        await send({"type": "http.response.body", "body": body})
+
+
+# The application served by uvicorn service.asgi:application
+application = SupplierASGI()
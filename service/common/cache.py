@@ -0,0 +1,204 @@
+"""
+Read-Through Cache
+
+This module caches serialized payloads for the read routes. Storage is
+pluggable: CacheBackend is the interface a backend has to implement and
+LRUCache keeps entries in process memory with a time to live. A shared
+backend can be swapped in later with Cache.init_app(app, backend).
+
+Loaders run through a SingleFlight, so concurrent misses for one key in
+a worker share a single load, even when the cache is turned off.
+
+Three lists of hooks let the read replicas (service.common.replicas) keep
+stale rows out: Cache.share_checks can make a miss load on its own
+instead of joining the load in flight, Cache.fill_checks can keep a
+loaded value out of the cache, and Cache.invalidation_listeners hear of
+every invalidated key.
+"""
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from service.common.singleflight import SingleFlight
+
+
+class CacheBackend(ABC):
+    """Interface for cache storage backends"""
+
+    @abstractmethod
+    def get(self, key):
+        """Returns the value stored for key or None if it is not there"""
+
+    @abstractmethod
+    def set(self, key, value):
+        """Stores a value for key"""
+
+    @abstractmethod
+    def delete(self, *keys):
+        """Removes the keys"""
+
+    @abstractmethod
+    def clear(self):
+        """Removes every key"""
+
+    @abstractmethod
+    def __len__(self):
+        """Returns the number of keys stored"""
+
+
+class LRUCache(CacheBackend):
+    """In-process cache that evicts the least recently used key when full"""
+
+    def __init__(self, max_size=1024, ttl=30, clock=time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires <= self.clock():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, self.clock() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class Cache:
+    """Read-through cache with hit and miss counters"""
+
+    def __init__(self, backend=None):
+        self.backend = backend or LRUCache()
+        self.enabled = True
+        self.hits = 0
+        self.misses = 0
+        self.flights = SingleFlight()
+        # called as check(key) in the context of a miss; a False loads the
+        # value without sharing the load of another caller
+        self.share_checks = []
+        # called as check(key) in the context of the load; a False keeps
+        # the loaded value out of the cache
+        self.fill_checks = []
+        # called as listener(keys) after the keys are invalidated
+        self.invalidation_listeners = []
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def init_app(self, app, backend=None):
+        """Configures the cache from the Flask app config"""
+        self.enabled = app.config["CACHE_ENABLED"]
+        self.backend = backend or LRUCache(app.config["CACHE_MAX_SIZE"], app.config["CACHE_TTL"])
+
+    def get_or_set(self, key, loader):
+        """
+        Returns the cached value for key, calling loader() on a miss
+
+        A None from the loader (not found) is returned but never cached.
+        Concurrent calls for a key share one call of the loader, unless a
+        share check turns it down.
+        """
+        if not self.enabled:
+            return self._load(key, loader)
+        value = self.backend.get(key)
+        with self._lock:
+            if value is not None:
+                self.hits += 1
+                return value
+            self.misses += 1
+            generation = self._generation
+        value, storable = self._load(key, lambda: (loader(), self._may_fill(key)))
+        with self._lock:
+            # an invalidation while we were loading means value may be stale
+            if value is not None and storable and generation == self._generation:
+                self.backend.set(key, value)
+        return value
+
+    async def aget_or_set(self, key, loader):
+        """Same as get_or_set() for a loader that is a coroutine function"""
+        if not self.enabled:
+            return await self._aload(key, loader)
+        value = self.backend.get(key)
+        with self._lock:
+            if value is not None:
+                self.hits += 1
+                return value
+            self.misses += 1
+            generation = self._generation
+
+        async def load():
+            return await loader(), self._may_fill(key)
+
+        value, storable = await self._aload(key, load)
+        with self._lock:
+            if value is not None and storable and generation == self._generation:
+                self.backend.set(key, value)
+        return value
+
+    def _load(self, key, loader):
+        if all(check(key) for check in self.share_checks):
+            return self.flights.do(key, loader)
+        return loader()
+
+    async def _aload(self, key, loader):
+        if all(check(key) for check in self.share_checks):
+            return await self.flights.ado(key, loader)
+        return await loader()
+
+    def _may_fill(self, key):
+        return all(check(key) for check in self.fill_checks)
+
+    def invalidate(self, *keys):
+        """Removes the keys so the next read goes to the database"""
+        with self._lock:
+            self._generation += 1
+            self.backend.delete(*keys)
+        self.flights.forget(*keys)
+        for listener in self.invalidation_listeners:
+            listener(keys)
+
+    def clear(self):
+        """Removes every key and resets the counters"""
+        with self._lock:
+            self._generation += 1
+            self.backend.clear()
+            self.hits = 0
+            self.misses = 0
+        self.flights.clear()
+
+    def stats(self):
+        """Returns the cache counters"""
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.flights.coalesced,
+            "size": len(self.backend),
+        }
+
+
+# The cache used by the service
+cache = Cache()
@@ -0,0 +1,372 @@
+"""
+Catalog Import and Export
+
+Loads the Items of Supplier catalogs from CSV or NDJSON files for the
+flask import-catalog command. The file is read one chunk of rows at a
+time and every chunk is validated and written with one batched INSERT
+(COPY on Postgres), so memory use does not grow with the file.
+
+Rows are checked with the rules of Item.deserialize() plus the types and
+sizes of the item table, since values in a file are only text. Invalid
+rows and rows of unknown Suppliers are rejected and counted, the rest
+are loaded in a single transaction.
+
+Writes the supplier and item tables to CSV, NDJSON, Parquet or Arrow
+files for the flask export-catalog command. Rows are read through a
+server-side cursor and handed to the writer one batch at a time as plain
+Core rows, without building ORM objects. Parquet and Arrow need pyarrow,
+which is only imported when one of them is asked for.
+"""
+import os
+import csv
+import json
+import logging
+import time
+import importlib.util
+from decimal import Decimal, InvalidOperation
+from sqlalchemy import Date, Integer, Numeric, insert
+from service.common.json_provider import ENCODERS
+from service.models import db, DataValidationError, Item, Supplier, MAX_INTEGER, invalidate_on_commit
+
+logger = logging.getLogger("flask.app")
+
+FORMATS = ("csv", "ndjson")
+EXTENSIONS = {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson"}
+
+CENT = Decimal("0.01")
+MAX_PRICE = Decimal("99999999.99")  # Numeric(10, 2)
+
+
+def detect_format(path):
+    """Returns the format of a catalog file from its extension"""
+    for extension, file_format in EXTENSIONS.items():
+        if path.lower().endswith(extension):
+            return file_format
+    raise DataValidationError(f"Unknown catalog format for '{path}', use one of {', '.join(FORMATS)}")
+
+
+def read_rows(file, file_format):
+    """
+    Yields the (line number, raw row) pairs of a catalog file
+
+    CSV rows are dictionaries keyed by the header, NDJSON rows are the
+    text of each non-empty line and are decoded by clean_row().
+    """
+    if file_format == "csv":
+        reader = csv.DictReader(file)
+        for row in reader:
+            yield reader.line_num, row
+    else:
+        for number, line in enumerate(file, 1):
+            if line.strip():
+                yield number, line
+
+
+def clean_row(raw, supplier_id=None) -> dict:
+    """
+    Returns the column values of an Item from a row of a catalog file
+
+    Args:
+        raw: a CSV row (dict) or an NDJSON line (string)
+        supplier_id (int): the Supplier of rows that do not name one
+    """
+    if isinstance(raw, str):
+        try:
+            raw = json.loads(raw, parse_float=Decimal)
+        except ValueError as error:
+            raise DataValidationError(f"Invalid Item: bad JSON - {error}") from error
+    if isinstance(raw, dict):
+        # an empty CSV cell is a missing value
+        raw = {name: value for name, value in raw.items() if value not in ("", None)}
+        if supplier_id is not None:
+            raw.setdefault("supplier_id", supplier_id)
+    values = Item.validate(raw)
+    values["supplier_id"] = _integer(values["supplier_id"], "supplier_id")
+    values["quantity"] = _integer(values["quantity"], "quantity")
+    values["sku"] = _text(values["sku"], "sku")
+    values["name"] = _text(values["name"], "name")
+    values["price"] = _price(values["price"])
+    return values
+
+
+def _integer(value, name):
+    number = value
+    if isinstance(value, str):
+        text = value.strip()
+        # isdigit() is also true for digits int() does not take, such as "²"
+        number = int(text) if text.isascii() and text.isdigit() and len(text) <= 10 else None
+    if isinstance(number, bool) or not isinstance(number, int) or not 0 <= number <= MAX_INTEGER:
+        raise DataValidationError(f"Invalid Item: {name} must be a whole number from 0 to {MAX_INTEGER}, not {value!r}")
+    return number
+
+
+def _text(value, name):
+    length = Item.__table__.c[name].type.length
+    if not isinstance(value, str) or not value.strip() or len(value.strip()) > length:
+        raise DataValidationError(f"Invalid Item: {name} must be 1 to {length} characters, not {value!r}")
+    return value.strip()
+
+
+def _price(value):
+    if isinstance(value, float):
+        value = repr(value)  # the digits of a JSON number, not its binary value
+    try:
+        price = Decimal(value.strip() if isinstance(value, str) else value)
+    except (InvalidOperation, TypeError, ValueError):
+        price = None
+    if isinstance(value, bool) or price is None or not price.is_finite() or not 0 <= price <= MAX_PRICE:
+        raise DataValidationError(f"Invalid Item: price must be a number from 0 to {MAX_PRICE}, not {value!r}")
+    if price != price.quantize(CENT):
+        raise DataValidationError(f"Invalid Item: price has more than 2 decimal places: {value!r}")
+    return price.quantize(CENT)
+
+
+class ImportReport:
+    """Counts of a catalog import"""
+
+    def __init__(self):
+        self.imported = 0
+        self.rejected = 0
+        self.supplier_ids = set()
+        self.seconds = 0.0
+
+    @property
+    def rows_per_sec(self):
+        """Rows read per second, imported or rejected"""
+        return (self.imported + self.rejected) / self.seconds if self.seconds else 0.0
+
+
+class CatalogImporter:
+    """
+    Writes the valid rows of a catalog to the item table in batches
+
+    Args:
+        supplier_id (int): the Supplier of rows that do not name one
+        batch_size (int): the number of rows written per statement
+        on_reject: called as on_reject(line number, message) for every
+            rejected row
+    """
+
+    def __init__(self, supplier_id=None, batch_size=5000, on_reject=None):
+        self.supplier_id = supplier_id
+        self.batch_size = batch_size
+        self.on_reject = on_reject
+        self.report = ImportReport()
+        self._known = set()
+        self._unknown = set()
+
+    def run(self, rows):
+        """Imports the (line number, raw row) pairs and returns an ImportReport"""
+        start = time.perf_counter()
+        batch = []
+        try:
+            for number, raw in rows:
+                try:
+                    batch.append((number, clean_row(raw, self.supplier_id)))
+                except DataValidationError as error:
+                    self._reject(number, str(error))
+                if len(batch) == self.batch_size:
+                    self._write(batch)
+                    batch = []
+            if batch:
+                self._write(batch)
+            # the rows were inserted without the ORM, so nothing else marks the Suppliers changed
+            supplier_ids = sorted(self.report.supplier_ids)
+            Supplier.bump_versions(supplier_ids)
+            invalidate_on_commit(*(Supplier.cache_key(supplier_id) for supplier_id in supplier_ids))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        self.report.seconds = time.perf_counter() - start
+        logger.info(
+            "Imported %d items and rejected %d rows in %.1f s",
+            self.report.imported, self.report.rejected, self.report.seconds,
+        )
+        return self.report
+
+    def _reject(self, number, message):
+        self.report.rejected += 1
+        if self.on_reject:
+            self.on_reject(number, message)
+
+    def _write(self, batch):
+        """Inserts the rows of a batch whose Supplier exists"""
+        self._lookup_suppliers({values["supplier_id"] for _, values in batch})
+        rows = []
+        for number, values in batch:
+            if values["supplier_id"] in self._known:
+                rows.append(values)
+            else:
+                self._reject(number, f"Supplier with id '{values['supplier_id']}' was not found.")
+        if rows:
+            insert_items(rows)
+            self.report.imported += len(rows)
+            self.report.supplier_ids.update(values["supplier_id"] for values in rows)
+
+    def _lookup_suppliers(self, supplier_ids):
+        """Finds which of the Suppliers not seen before exist"""
+        new_ids = supplier_ids - self._known - self._unknown
+        if new_ids:
+            found = set(db.session.scalars(db.select(Supplier.id).where(Supplier.id.in_(new_ids))))
+            self._known |= found
+            self._unknown |= new_ids - found
+
+
+def insert_items(rows):
+    """Inserts Item rows in the current transaction with COPY or a batched INSERT"""
+    connection = db.session.connection()
+    if connection.dialect.name == "postgresql" and connection.dialect.driver == "psycopg":
+        columns = list(Item.FIELDS)
+        with connection.connection.driver_connection.cursor() as cursor:
+            with cursor.copy(f"COPY item ({', '.join(columns)}) FROM STDIN") as copy:
+                for values in rows:
+                    copy.write_row([values[name] for name in columns])
+    else:
+        connection.execute(insert(Item.__table__), rows)
+
+
+######################################################################
+#  E X P O R T
+######################################################################
+class CsvWriter:
+    """Writes rows to a CSV file with a header"""
+
+    binary = False
+
+    def __init__(self, file, columns):
+        self.writer = csv.writer(file)
+        self.writer.writerow([column.name for column in columns])
+
+    def write(self, rows):
+        """Writes a batch of rows"""
+        self.writer.writerows(rows)
+
+    def close(self):
+        """Nothing is buffered"""
+
+
+class NdjsonWriter:
+    """Writes rows to a file as one JSON object per line"""
+
+    binary = True
+
+    def __init__(self, file, columns):
+        self.file = file
+        self.names = [column.name for column in columns]
+        self.encode = next(iter(ENCODERS.values()))
+
+    def write(self, rows):
+        """Writes a batch of rows"""
+        self.file.write(b"".join(self.encode(dict(zip(self.names, row))) + b"\n" for row in rows))
+
+    def close(self):
+        """Nothing is buffered"""
+
+
+class ArrowWriter:
+    """Writes rows to an Arrow IPC file, one record batch at a time"""
+
+    binary = True
+    parquet = False
+
+    def __init__(self, file, columns):
+        # pylint: disable=import-outside-toplevel
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+
+        self.pyarrow = pyarrow
+        self.schema = pyarrow.schema(
+            [pyarrow.field(column.name, self.arrow_type(column), column.nullable) for column in columns]
+        )
+        if self.parquet:
+            self.writer = pyarrow.parquet.ParquetWriter(file, self.schema)
+        else:
+            self.writer = pyarrow.ipc.new_file(file, self.schema)
+
+    def arrow_type(self, column):
+        """Returns the Arrow type of a table column"""
+        if isinstance(column.type, Numeric):
+            return self.pyarrow.decimal128(column.type.precision, column.type.scale)
+        if isinstance(column.type, Integer):
+            return self.pyarrow.int64()
+        if isinstance(column.type, Date):
+            return self.pyarrow.date32()
+        return self.pyarrow.string()
+
+    def write(self, rows):
+        """Writes a batch of rows"""
+        values = zip(*rows)
+        arrays = [self.pyarrow.array(column, type=field.type) for column, field in zip(values, self.schema)]
+        self.writer.write_table(self.pyarrow.Table.from_arrays(arrays, schema=self.schema))
+
+    def close(self):
+        """Writes the footer of the file"""
+        self.writer.close()
+
+
+class ParquetWriter(ArrowWriter):
+    """Writes rows to a Parquet file, one row group per batch"""
+
+    parquet = True
+
+
+# File extension and writer of every export format
+EXPORT_FORMATS = {
+    "csv": (".csv", CsvWriter),
+    "ndjson": (".ndjson", NdjsonWriter),
+    "parquet": (".parquet", ParquetWriter),
+    "arrow": (".arrow", ArrowWriter),
+}
+ARROW_FORMATS = ("parquet", "arrow")
+
+
+def has_pyarrow():
+    """Returns True when pyarrow is installed for the Parquet and Arrow formats"""
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def export_catalog(directory, file_format, models=None, batch_size=1000):
+    """
+    Writes the rows of each model's table to a file in directory
+
+    Every table is read in id order through one connection. On Postgres
+    the reads share a REPEATABLE READ transaction, so Items always match
+    the Suppliers of the same export.
+
+    Returns:
+        dict: the path and row count of every table by table name
+    """
+    models = models or (Supplier, Item)
+    extension, writer_class = EXPORT_FORMATS[file_format]
+    os.makedirs(directory, exist_ok=True)
+    exported = {}
+    with db.engine.connect() as connection:
+        if connection.dialect.name == "postgresql":
+            connection = connection.execution_options(isolation_level="REPEATABLE READ")
+        with connection.begin():
+            for model in models:
+                table = model.__table__
+                path = os.path.join(directory, table.name + extension)
+                statement = db.select(table).order_by(table.c.id)
+                result = connection.execution_options(yield_per=batch_size).execute(statement)
+                exported[table.name] = {"path": path, "rows": _write_table(result, path, table, writer_class)}
+                logger.info("Exported %d rows of %s to %s", exported[table.name]["rows"], table.name, path)
+    return exported
+
+
+def _write_table(result, path, table, writer_class):
+    """Writes the batches of a result to a file and returns the row count"""
+    rows = 0
+    if writer_class.binary:
+        file = open(path, "wb")  # pylint: disable=consider-using-with
+    else:
+        file = open(path, "w", newline="", encoding="utf-8")  # pylint: disable=consider-using-with
+    with file:
+        writer = writer_class(file, list(table.columns))
+        for batch in result.partitions():
+            writer.write(batch)
+            rows += len(batch)
+        writer.close()
+    return rows
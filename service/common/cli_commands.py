@@ -1,8 +1,15 @@
 """
 Flask CLI Command Extensions
 """
+import time
+import click
+from flask_migrate import stamp, upgrade
+from sqlalchemy import inspect
 from service import app
-from service.models import db
+from service.common.catalog import (
+    ARROW_FORMATS, EXPORT_FORMATS, FORMATS, CatalogImporter, detect_format, export_catalog, has_pyarrow, read_rows
+)
+from service.models import db, DataValidationError, Item, Supplier
 
 
 ######################################################################
@@ -19,3 +26,100 @@ def db_create():
     db.drop_all()
     db.create_all()
     db.session.commit()
+    # The new tables already match the latest migration
+    stamp()
+
+
+######################################################################
+# Command to create or upgrade the tables before the service starts
+# Usage:
+#   flask db-init
+######################################################################
+@app.cli.command("db-init")
+def db_init():
+    """
+    Brings the database to the latest schema. Run it once per deploy,
+    before the workers start: they no longer create tables themselves.
+    """
+    tables = inspect(db.engine).get_table_names()
+    if "alembic_version" in tables:
+        upgrade()
+    elif not tables:
+        db.create_all()
+        db.session.commit()
+        # The new tables already match the latest migration
+        stamp()
+    else:
+        raise click.ClickException(
+            "The tables are not versioned. Run 'flask db stamp 0001' and then 'flask db upgrade'."
+        )
+
+
+######################################################################
+# Command to load the Items of a catalog file
+# Usage:
+#   flask import-catalog items.csv [--supplier-id 42]
+######################################################################
+@app.cli.command("import-catalog")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--format", "file_format", type=click.Choice(FORMATS), help="Defaults to the file extension.")
+@click.option("--supplier-id", type=int, help="Supplier of the rows that have no supplier_id.")
+@click.option("--batch-size", type=click.IntRange(min=1), help="Rows per INSERT, IMPORT_BATCH_SIZE by default.")
+@click.option("--max-errors", type=int, default=20, show_default=True, help="Rejected rows to print.")
+def import_catalog(path, file_format, supplier_id, batch_size, max_errors):
+    """
+    Loads the Items of a CSV or NDJSON catalog. Every row needs a sku,
+    name, quantity, price and supplier_id (or --supplier-id).
+    """
+    try:
+        file_format = file_format or detect_format(path)
+    except DataValidationError as error:
+        raise click.UsageError(str(error)) from error
+
+    def print_reject(number, message):
+        if importer.report.rejected <= max_errors:
+            click.echo(f"Line {number}: {message}", err=True)
+
+    importer = CatalogImporter(
+        supplier_id=supplier_id,
+        batch_size=batch_size or app.config["IMPORT_BATCH_SIZE"],
+        on_reject=print_reject,
+    )
+    with open(path, newline="", encoding="utf-8-sig") as file:
+        report = importer.run(read_rows(file, file_format))
+    click.echo(
+        f"Imported {report.imported} items for {len(report.supplier_ids)} suppliers "
+        f"in {report.seconds:.2f} s ({report.rows_per_sec:.0f} rows/sec), "
+        f"rejected {report.rejected} rows"
+    )
+
+
+######################################################################
+# Command to write the Suppliers and Items to files for analytics
+# Usage:
+#   flask export-catalog exports/ [--format parquet]
+######################################################################
+@app.cli.command("export-catalog")
+@click.argument("directory", type=click.Path(file_okay=False))
+@click.option("--format", "file_format", type=click.Choice(list(EXPORT_FORMATS)), default="csv", show_default=True)
+@click.option("--table", "tables", type=click.Choice(["supplier", "item"]), multiple=True,
+              help="Only export this table (can be repeated).")
+@click.option("--batch-size", type=click.IntRange(min=1), help="Rows per batch, EXPORT_BATCH_SIZE by default.")
+def export_catalog_command(directory, file_format, tables, batch_size):
+    """
+    Writes the supplier and item tables to one file each in DIRECTORY.
+    Parquet and Arrow need pyarrow installed.
+    """
+    if file_format in ARROW_FORMATS and not has_pyarrow():
+        raise click.UsageError(f"The {file_format} format needs pyarrow: pip install pyarrow")
+    models = [model for model in (Supplier, Item) if not tables or model.__tablename__ in tables]
+    start = time.perf_counter()
+    exported = export_catalog(
+        directory, file_format, models, batch_size or app.config["EXPORT_BATCH_SIZE"]
+    )
+    seconds = time.perf_counter() - start
+    rows = 0
+    for name, table in exported.items():
+        click.echo(f"Exported {table['rows']} rows of {name} to {table['path']}")
+        rows += table["rows"]
+    click.echo(f"Exported {rows} rows in {seconds:.2f} s ({rows / seconds:.0f} rows/sec)")
@@ -0,0 +1,159 @@
+"""
+Response Compression
+
+An after_request hook that compresses JSON, NDJSON, CSV and text bodies
+with the best encoding the client accepts: zstd and br when the
+zstandard and brotli packages are installed, gzip always. Bodies
+smaller than COMPRESS_MIN_SIZE bytes (most error messages) are sent as
+they are, since compressing them costs more than it saves.
+
+Streamed responses, such as GET /suppliers/export, are compressed chunk
+by chunk as they are sent, so they never have to be held in memory.
+
+Every compressible response gets Vary: Accept-Encoding. Its ETag is made
+weak when the client accepts an encoding, since its bytes depend on the
+encoding, and so is the ETag of a 304 to the same client, which cannot
+tell whether the body would have been big enough to compress.
+If-None-Match is compared weakly, so a 304 still works.
+"""
+import zlib
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+
+
+class GzipCompressor:
+    """gzip through zlib"""
+
+    def __init__(self, level):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        """Returns the compressed output that is ready for some data"""
+        return self._compressor.compress(data)
+
+    def finish(self):
+        """Returns the rest of the compressed output"""
+        return self._compressor.flush()
+
+
+class BrotliCompressor:
+    """br through the brotli package"""
+
+    def __init__(self, level):
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data):
+        """Returns the compressed output that is ready for some data"""
+        return self._compressor.process(data)
+
+    def finish(self):
+        """Returns the rest of the compressed output"""
+        return self._compressor.finish()
+
+
+class ZstdCompressor:
+    """zstd through the zstandard package"""
+
+    def __init__(self, level):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data):
+        """Returns the compressed output that is ready for some data"""
+        return self._compressor.compress(data)
+
+    def finish(self):
+        """Returns the rest of the compressed output"""
+        return self._compressor.flush()
+
+
+# Compressors by Content-Encoding, preferred first when the client
+# accepts several with the same quality, with the config key of the level
+ENCODINGS = {"gzip": (GzipCompressor, "COMPRESS_GZIP_LEVEL")}
+if brotli is not None:
+    ENCODINGS = {"br": (BrotliCompressor, "COMPRESS_BR_LEVEL"), **ENCODINGS}
+if zstandard is not None:
+    ENCODINGS = {"zstd": (ZstdCompressor, "COMPRESS_ZSTD_LEVEL"), **ENCODINGS}
+
+
+def init_app(app):
+    """Compresses the responses of the app"""
+    app.after_request(compress_response)
+
+
+def choose_encoding(accept_encodings):
+    """Returns the accepted encoding with the highest quality, or None"""
+    best, best_quality = None, 0
+    for encoding in ENCODINGS:
+        quality = accept_encodings[encoding]
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress_response(response):
+    """Compresses a response when the client accepts it and it is worth it"""
+    config = current_app.config
+    if not config["COMPRESS_ENABLED"] or not _may_compress(response):
+        return response
+    response.vary.add("Accept-Encoding")
+    encoding = choose_encoding(request.accept_encodings)
+    if encoding is None:
+        return response
+    # weak even when the body is too small to compress, so that a 304,
+    # which has no body to go by, carries the same ETag as its 200
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    if response.status_code == 304 or (
+        not response.is_streamed and len(response.get_data()) < config["COMPRESS_MIN_SIZE"]
+    ):
+        return response
+
+    compressor_class, level_key = ENCODINGS[encoding]
+    compressor = compressor_class(config[level_key])
+    if response.is_streamed:
+        response.response = _compress_stream(response.response, compressor)
+        response.headers.pop("Content-Length", None)
+    else:
+        response.set_data(compressor.compress(response.get_data()) + compressor.finish())
+    response.headers["Content-Encoding"] = encoding
+    return response
+
+
+def _may_compress(response):
+    """Returns whether the body of a response could be compressed if it is big enough"""
+    if response.status_code == 304:
+        return True  # stands for a 200 whose body could be
+    mimetype = response.mimetype or ""
+    return (
+        mimetype.startswith(COMPRESSIBLE_TYPES)
+        and response.status_code >= 200
+        and response.status_code != 204
+        and not response.direct_passthrough
+        and "Content-Encoding" not in response.headers
+        and not response.cache_control.no_transform
+    )
+
+
+def _compress_stream(chunks, compressor):
+    """Yields the compressed chunks of a streamed body"""
+    try:
+        for chunk in chunks:
+            data = compressor.compress(chunk.encode("utf-8") if isinstance(chunk, str) else chunk)
+            if data:
+                yield data
+        yield compressor.finish()
+    finally:
+        if hasattr(chunks, "close"):
+            chunks.close()
@@ -0,0 +1,147 @@
+"""
+Database Connection Pool
+
+Builds SQLALCHEMY_ENGINE_OPTIONS from the DB_POOL_* settings and provides
+MeteredQueuePool, a QueuePool that also counts checkouts, the time spent
+getting a connection and the checkouts that failed, so every worker can
+report how its own pool is doing.
+"""
+import os
+import time
+import threading
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+
+
+# Functions called as listener(pool, event, seconds) for every "checkout"
+# (seconds is the wait), "failure" and "checkin" of a MeteredQueuePool
+POOL_LISTENERS = []
+
+
+class PoolMetrics:
+    """Counters for the checkouts of one pool"""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.failures = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self._lock = threading.Lock()
+
+    def record_checkout(self, seconds):
+        """Counts a checkout that took seconds to get a connection"""
+        with self._lock:
+            self.checkouts += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+
+    def record_failure(self):
+        """Counts a checkout that timed out or could not connect"""
+        with self._lock:
+            self.failures += 1
+
+    def snapshot(self):
+        """Returns the counters with times in milliseconds"""
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "checkout_failures": self.failures,
+                "wait_ms_total": round(self.wait_total * 1000, 3),
+                "wait_ms_max": round(self.wait_max * 1000, 3),
+            }
+
+
+class MeteredQueuePool(QueuePool):
+    """
+    QueuePool that measures every checkout
+
+    The wait covers the time in the queue for a free connection and the
+    time to open a new one when the pool is allowed to grow.
+    """
+
+    def __init__(self, *args, metrics=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = metrics or PoolMetrics()
+        self._metering = threading.local()
+
+    def _do_get(self):
+        # QueuePool._do_get() calls itself to retry, only time the outer call
+        if getattr(self._metering, "active", False):
+            return super()._do_get()
+        self._metering.active = True
+        start = time.perf_counter()
+        try:
+            record = super()._do_get()
+        except Exception:
+            self.metrics.record_failure()
+            self._notify("failure")
+            raise
+        finally:
+            self._metering.active = False
+        wait = time.perf_counter() - start
+        self.metrics.record_checkout(wait)
+        self._notify("checkout", wait)
+        return record
+
+    def _do_return_conn(self, record):
+        super()._do_return_conn(record)
+        self._notify("checkin")
+
+    def _notify(self, name, seconds=0.0):
+        for listener in POOL_LISTENERS:
+            listener(self, name, seconds)
+
+    def recreate(self):
+        """Keeps the counters when the engine replaces the pool"""
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+    def stats(self):
+        """Returns the state of the pool and its checkout counters"""
+        return {
+            "size": self.size(),
+            "checked_out": self.checkedout(),
+            "checked_in": self.checkedin(),
+            "overflow": max(self.overflow(), 0),
+            **self.metrics.snapshot(),
+        }
+
+
+def engine_options(config, uri=None):
+    """
+    Returns the engine options for the database in a Flask config
+
+    Every worker gets a MeteredQueuePool sized by DB_POOL_SIZE and
+    DB_MAX_OVERFLOW. An in-memory SQLite database shares one connection,
+    so it only gets the pre-ping setting, and DB_STATEMENT_TIMEOUT only
+    applies to Postgres.
+
+    Args:
+        uri (string): the database to connect to, the primary
+            SQLALCHEMY_DATABASE_URI by default
+    """
+    url = make_url(uri or config["SQLALCHEMY_DATABASE_URI"])
+    backend = url.get_backend_name()
+    options = {"pool_pre_ping": config["DB_POOL_PRE_PING"]}
+    if backend == "sqlite" and url.database in (None, "", ":memory:"):
+        return options
+    options.update(
+        poolclass=MeteredQueuePool,
+        pool_size=config["DB_POOL_SIZE"],
+        max_overflow=config["DB_MAX_OVERFLOW"],
+        pool_timeout=config["DB_POOL_TIMEOUT"],
+        pool_recycle=config["DB_POOL_RECYCLE"],
+    )
+    if backend == "postgresql" and config["DB_STATEMENT_TIMEOUT"]:
+        options["connect_args"] = {"options": f"-c statement_timeout={config['DB_STATEMENT_TIMEOUT']}"}
+    return options
+
+
+def pool_stats(engine):
+    """Returns the pool stats of an engine for this worker process"""
+    pool = engine.pool
+    stats = {"pid": os.getpid(), "pool": type(pool).__name__}
+    if isinstance(pool, MeteredQueuePool):
+        stats.update(pool.stats())
+    return stats
@@ -0,0 +1,94 @@
+"""
+Database Statement Stats
+
+Engine event listeners that count and time every statement. The count
+and the time spent in the database by the statements of a Flask request
+add up in flask.g, where request_db_stats() reads them. Statements run
+outside of a request (CLI commands, the ASGI app) are not recorded.
+
+Any statement slower than DB_SLOW_QUERY_MS is logged with its parameters
+and the route that ran it. With DB_STATS_HEADER on, every response
+carries the count and time of its statements in an X-DB-Stats header.
+"""
+import time
+import logging
+from flask import current_app, g, has_app_context, has_request_context, request
+from sqlalchemy import event
+
+logger = logging.getLogger("flask.app")
+
+STATS_HEADER = "X-DB-Stats"
+
+# Longest parameter list written to the slow query log
+MAX_LOGGED_PARAMETERS = 500
+
+
+def init_app(app):
+    """Starts the stats of every request and adds the X-DB-Stats header"""
+    app.before_request(reset_request_stats)
+    app.after_request(add_stats_header)
+
+
+def instrument(engine):
+    """Counts and times the statements run on an engine"""
+    if event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+def request_db_stats():
+    """Returns the statement count and seconds in the database of the current request"""
+    return g.get("db_statements", 0), g.get("db_time", 0.0)
+
+
+def reset_request_stats():
+    """Starts counting from zero (g can outlive a request with a pushed app context)"""
+    g.db_statements = 0
+    g.db_time = 0.0
+
+
+def add_stats_header(response):
+    """Reports the statements of the request in the X-DB-Stats header"""
+    if current_app.config.get("DB_STATS_HEADER"):
+        count, seconds = request_db_stats()
+        response.headers[STATS_HEADER] = f"count={count}; time_ms={seconds * 1000:.3f}"
+    return response
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # pylint: disable=unused-argument,too-many-arguments
+    conn.info.setdefault("statement_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # pylint: disable=unused-argument,too-many-arguments
+    elapsed = time.perf_counter() - conn.info["statement_start"].pop()
+    if has_request_context():
+        g.db_statements = g.get("db_statements", 0) + 1
+        g.db_time = g.get("db_time", 0.0) + elapsed
+    if has_app_context():
+        threshold = current_app.config.get("DB_SLOW_QUERY_MS")
+        if threshold and elapsed * 1000 >= threshold:
+            _log_slow_query(statement, parameters, elapsed)
+
+
+def _log_slow_query(statement, parameters, elapsed):
+    """Logs a slow statement with its parameters and route"""
+    route = f"{request.method} {request.path} ({request.endpoint})" if has_request_context() else "no request"
+    logged = repr(parameters)
+    if len(logged) > MAX_LOGGED_PARAMETERS:
+        logged = logged[:MAX_LOGGED_PARAMETERS] + "..."
+    logger.warning(
+        "Slow query %.1f ms in %s: %s parameters=%s",
+        elapsed * 1000, route, " ".join(statement.split()), logged,
+    )
+
+
+def _handle_error(context):
+    """A failed statement never reaches after_cursor_execute"""
+    if context.connection is not None:
+        starts = context.connection.info.get("statement_start")
+        if starts:
+            starts.pop()
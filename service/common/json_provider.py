@@ -0,0 +1,90 @@
+"""
+JSON Provider
+
+Encodes responses with orjson when it is installed and falls back to
+the standard library json module when it is not. Both encoders write
+Decimal as a string, so prices keep their precision, and date/datetime
+in ISO 8601 format.
+
+The encoder is picked with the JSON_ENCODER setting: "auto" (default)
+uses the fastest one available, or name one of ENCODERS to force it.
+"""
+import json
+import decimal
+from datetime import date
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+def default(obj):
+    """Converts the objects the encoders can't handle on their own"""
+    if isinstance(obj, decimal.Decimal):
+        return str(obj)
+    if isinstance(obj, date):
+        return obj.isoformat()
+    return DefaultJSONProvider.default(obj)
+
+
+def stdlib_dumps(obj, sort_keys=False, indent=None) -> bytes:
+    """Encodes with the standard library json module"""
+    separators = None if indent else (",", ":")
+    return json.dumps(
+        obj, default=default, sort_keys=sort_keys, indent=indent, separators=separators
+    ).encode("utf-8")
+
+
+def orjson_dumps(obj, sort_keys=False, indent=None) -> bytes:
+    """Encodes with orjson"""
+    option = orjson.OPT_NON_STR_KEYS
+    if sort_keys:
+        option |= orjson.OPT_SORT_KEYS
+    if indent:
+        option |= orjson.OPT_INDENT_2
+    return orjson.dumps(obj, default=default, option=option)
+
+
+# Encoders by name, fastest first
+ENCODERS = {"json": stdlib_dumps}
+if orjson is not None:
+    ENCODERS = {"orjson": orjson_dumps, **ENCODERS}
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """JSON provider that encodes with the configured encoder"""
+
+    def __init__(self, app):
+        super().__init__(app)
+        name = app.config.get("JSON_ENCODER", "auto")
+        if name == "auto":
+            name = next(iter(ENCODERS))
+        if name not in ENCODERS:
+            raise ValueError(f"JSON encoder '{name}' is not available")
+        self.encoder = name
+        self.encode = ENCODERS[name]
+
+    def dumps(self, obj, **kwargs) -> str:
+        """Serializes obj to a JSON string"""
+        return self.encode(
+            obj,
+            sort_keys=kwargs.get("sort_keys", self.sort_keys),
+            indent=kwargs.get("indent"),
+        ).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        """Deserializes a JSON string or bytes"""
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        """Returns a JSON response without decoding the encoded bytes"""
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = None
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            indent = 2
+        body = self.encode(obj, sort_keys=self.sort_keys, indent=indent)
+        return self._app.response_class(body + b"\n", mimetype=self.mimetype)
@@ -0,0 +1,121 @@
+"""
+Request Metrics
+
+Prometheus metrics recorded by before/after request hooks: the count of
+requests by endpoint and status, histograms of the latency and of the
+database time and statements of every endpoint, the connection pool
+of the worker and the reads that shared a load already in flight.
+GET /metrics serves them in the Prometheus text format.
+
+Each gunicorn worker has its own metrics, so with more than one worker
+set PROMETHEUS_MULTIPROC_DIR to an empty directory (wiped on every
+restart). Every worker then writes its values to files in it and
+/metrics adds up the files of all workers, whichever one answers.
+"""
+import os
+import time
+from flask import Response, g, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from service.common.cache import cache
+from service.common.db_pool import POOL_LISTENERS
+from service.common.db_stats import request_db_stats
+
+# Endpoint label of requests that did not match a route
+UNMATCHED = "unmatched"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+REQUESTS = Counter(
+    "http_requests_total", "HTTP requests answered", ["method", "endpoint", "status"]
+)
+LATENCY = Histogram(
+    "http_request_duration_seconds", "Time to answer a request",
+    ["method", "endpoint"], buckets=LATENCY_BUCKETS,
+)
+DB_TIME = Histogram(
+    "http_request_db_seconds", "Time a request spent running SQL statements",
+    ["method", "endpoint"], buckets=LATENCY_BUCKETS,
+)
+DB_STATEMENTS = Histogram(
+    "http_request_db_statements", "SQL statements run by a request",
+    ["method", "endpoint"], buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100),
+)
+POOL_CHECKOUTS = Counter("db_pool_checkouts_total", "Connections checked out of the pool")
+POOL_FAILURES = Counter("db_pool_checkout_failures_total", "Checkouts that timed out or failed to connect")
+POOL_WAIT = Histogram(
+    "db_pool_wait_seconds", "Time to get a connection from the pool", buckets=LATENCY_BUCKETS
+)
+COALESCED = Counter(
+    "cache_coalesced_reads_total", "Reads that shared the load of an identical read in flight"
+)
+POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out", "Connections in use", multiprocess_mode="livesum"
+)
+POOL_OVERFLOW = Gauge(
+    "db_pool_overflow", "Connections open beyond the pool size", multiprocess_mode="livesum"
+)
+
+
+def init_app(app):
+    """Records the metrics of every request and adds the /metrics endpoint"""
+    app.before_request(start_timer)
+    app.after_request(record_request)
+    app.add_url_rule("/metrics", "metrics", metrics)
+    if record_pool_event not in POOL_LISTENERS:
+        POOL_LISTENERS.append(record_pool_event)
+    if record_coalesced not in cache.flights.listeners:
+        cache.flights.listeners.append(record_coalesced)
+
+
+def start_timer():
+    """Notes when the request started"""
+    g.request_start = time.perf_counter()
+
+
+def record_request(response):
+    """Counts the request and observes its latency and database time"""
+    start = g.get("request_start")
+    if start is None:  # a before_request hook ended the request early
+        return response
+    endpoint = request.endpoint or UNMATCHED
+    REQUESTS.labels(request.method, endpoint, response.status_code).inc()
+    LATENCY.labels(request.method, endpoint).observe(time.perf_counter() - start)
+    statements, db_time = request_db_stats()
+    DB_TIME.labels(request.method, endpoint).observe(db_time)
+    DB_STATEMENTS.labels(request.method, endpoint).observe(statements)
+    return response
+
+
+def record_pool_event(pool, event, seconds):
+    """Feeds the checkouts of a MeteredQueuePool into the metrics"""
+    if event == "checkout":
+        POOL_CHECKOUTS.inc()
+        POOL_WAIT.observe(seconds)
+    elif event == "failure":
+        POOL_FAILURES.inc()
+    POOL_CHECKED_OUT.set(pool.checkedout())
+    POOL_OVERFLOW.set(max(pool.overflow(), 0))
+
+
+def record_coalesced(key):  # pylint: disable=unused-argument
+    """Counts a read that waited for a load in flight instead of running its own"""
+    COALESCED.inc()
+
+
+def metrics():
+    """Returns the metrics in the Prometheus text format"""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
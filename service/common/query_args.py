@@ -0,0 +1,92 @@
+"""
+Query Parameters
+
+Parses the query parameters of the Flask routes and of the ASGI app, so
+that both accept the same values and answer bad ones with the same 400
+messages. QueryArgs reads any mapping of parameters and calls fail(message)
+for a bad value; fail must end the request, e.g. with abort() or by
+raising an exception.
+"""
+from decimal import Decimal, InvalidOperation
+from service.models import MAX_INTEGER
+
+
+class QueryArgs:
+    """The query parameters of one request"""
+
+    def __init__(self, args, config, fail):
+        """
+        Args:
+            args: a mapping of parameter names to values
+            config: the Flask config with the PAGE_SIZE_* and BATCH_MAX_SIZE limits
+            fail: called with the message of a bad parameter
+        """
+        self.args = args
+        self.config = config
+        self.fail = fail
+
+    def required(self, name):
+        """Returns a query parameter that must be present"""
+        value = self.args.get(name)
+        if not value:
+            self.fail(f"Query parameter '{name}' is required.")
+        return value
+
+    def integer(self, name, default=None):
+        """Returns a non-negative integer query parameter that fits an Integer column"""
+        value = self.args.get(name)
+        if value is None:
+            return default
+        try:
+            number = int(value)
+        except ValueError:
+            number = -1
+        if not 0 <= number <= MAX_INTEGER:
+            self.fail(f"Query parameter '{name}' must be an integer from 0 to {MAX_INTEGER}.")
+        return number
+
+    def decimal(self, name):
+        """Returns a non-negative decimal query parameter"""
+        value = self.args.get(name)
+        if value is None:
+            return None
+        try:
+            number = Decimal(value)
+        except InvalidOperation:
+            number = Decimal(-1)
+        if not number.is_finite() or number < 0:
+            self.fail(f"Query parameter '{name}' must be a non-negative number.")
+        return number
+
+    def limit(self):
+        """Returns the requested page size capped at PAGE_SIZE_MAX"""
+        limit = self.integer("limit", self.config["PAGE_SIZE_DEFAULT"])
+        if limit == 0:
+            self.fail("Query parameter 'limit' must be at least 1.")
+        return min(limit, self.config["PAGE_SIZE_MAX"])
+
+    def ids(self, name):
+        """Returns a comma separated list of ids"""
+        try:
+            ids = [int(value) for value in self.args[name].split(",")]
+        except ValueError:
+            ids = []
+        if not ids or not all(0 <= number <= MAX_INTEGER for number in ids):
+            self.fail(f"Query parameter '{name}' must be a comma separated list of ids.")
+        if len(ids) > self.config["BATCH_MAX_SIZE"]:
+            self.fail(f"Query parameter '{name}' can hold at most {self.config['BATCH_MAX_SIZE']} ids.")
+        return ids
+
+
+def trim_page(results, limit):
+    """
+    Trims a page read with one extra row
+
+    Returns:
+        the page and the id the next page starts after, or None when
+        this is the last page
+    """
+    if len(results) > limit:
+        results = results[:limit]
+        return results, results[-1]["id"]
+    return results, None
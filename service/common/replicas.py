@@ -0,0 +1,260 @@
+"""
+Read Replicas
+
+Routes the reads of GET and HEAD requests to read replicas of the
+database when DATABASE_REPLICA_URIS names any. Each replica gets an
+engine with the same pool settings as the primary, and RoutingSession,
+the class behind db.session, picks the engine for every statement:
+
+- A request picks the next healthy replica in turn the first time it
+  reads, and keeps it, so all of its reads see the same snapshot.
+- Writes, and every read after a write in the same request, go to the
+  primary. So do the other methods and anything outside of a request
+  (CLI commands, the benchmarks).
+- After a request writes, the client gets a cookie that sends its
+  requests to the primary for REPLICA_STICKY_SECONDS, so it reads its
+  own writes on any worker. Other clients keep reading from replicas.
+- A record this worker invalidated in the cache in the last
+  REPLICA_STICKY_SECONDS is not cached again from a replica read, since
+  the replica may not have seen it change yet. Reads of it from the
+  primary are cached as usual.
+- A read that has to go to the primary never shares a cache load in
+  flight, which another request may have started on a replica.
+- A replica is pinged with SELECT 1 at most every REPLICA_CHECK_INTERVAL
+  seconds, and a lost connection marks it down at once. When no replica
+  is up, the reads go to the primary.
+"""
+import time
+import logging
+import threading
+from collections import OrderedDict
+from flask import current_app, g, has_app_context, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import SQLAlchemyError
+from service.common import db_stats
+from service.common.cache import cache
+
+logger = logging.getLogger("flask.app")
+
+# Cookie that sends the requests of a client to the primary after a write
+STICKY_COOKIE = "read_primary"
+
+# The methods whose requests may read from a replica
+READ_METHODS = ("GET", "HEAD")
+
+
+def init_app(app, engine_options):
+    """
+    Routes the reads of the app to the replicas in DATABASE_REPLICA_URIS
+
+    Nothing is sent to the replicas until a request reads from one.
+
+    Args:
+        engine_options: a function that returns the engine options for
+            a database URI, e.g. db_pool.engine_options()
+    """
+    uris = app.config["DATABASE_REPLICA_URIS"]
+    if not uris:
+        return
+    replicas = []
+    for number, uri in enumerate(uris):
+        engine = create_engine(uri, **engine_options(app.config, uri))
+        db_stats.instrument(engine)
+        replicas.append(Replica(f"replica{number}", engine, app.config["REPLICA_CHECK_INTERVAL"]))
+    app.extensions["replicas"] = ReplicaSet(replicas, app.config["REPLICA_STICKY_SECONDS"])
+    app.before_request(reset_request_route)
+    app.after_request(stick_to_primary)
+    # the hooks are shared by every app and do nothing for the ones without replicas
+    if may_share_load not in cache.share_checks:
+        cache.share_checks.append(may_share_load)
+    if fresh_enough_to_cache not in cache.fill_checks:
+        cache.fill_checks.append(fresh_enough_to_cache)
+    if remember_invalidated not in cache.invalidation_listeners:
+        cache.invalidation_listeners.append(remember_invalidated)
+    logger.info("Reading from %d replicas", len(replicas))
+
+
+def reset_request_route():
+    """Starts every request without a replica (g can outlive a request with a pushed app context)"""
+    g.pop("db_replica", None)
+    g.pop("db_wrote", None)
+
+
+def stick_to_primary(response):
+    """Sends the client to the primary for a while after a write"""
+    if g.get("db_wrote"):
+        response.set_cookie(
+            STICKY_COOKIE,
+            "1",
+            max_age=current_app.extensions["replicas"].sticky_seconds,
+            httponly=True,
+            samesite="Lax",
+        )
+    return response
+
+
+def may_read_replica():
+    """Returns whether the reads of the current request may go to a replica"""
+    return (
+        request.method in READ_METHODS
+        and STICKY_COOKIE not in request.cookies
+        and not g.get("db_wrote")
+    )
+
+
+def current_replicas():
+    """Returns the ReplicaSet of the current app, or None when it has no replicas"""
+    return current_app.extensions.get("replicas") if has_app_context() else None
+
+
+def may_share_load(key):  # pylint: disable=unused-argument
+    """Keeps a read that must see the primary out of a load that may be reading a replica"""
+    if current_replicas() is None:
+        return True
+    return has_request_context() and may_read_replica()
+
+
+def fresh_enough_to_cache(key):
+    """Keeps a replica read of a record that was just invalidated out of the cache"""
+    if not has_request_context() or g.get("db_replica") is None:
+        return True  # not read from a replica
+    return not current_replicas().recently_invalidated(key)
+
+
+def remember_invalidated(keys):
+    """Notes when the cache keys were invalidated, see fresh_enough_to_cache()"""
+    replicas = current_replicas()
+    if replicas is not None:
+        replicas.remember_invalidated(keys)
+
+
+######################################################################
+#  R E P L I C A S
+######################################################################
+class Replica:
+    """The engine of one replica and its health"""
+
+    def __init__(self, key, engine, check_interval):
+        self.key = key
+        self.engine = engine
+        self.check_interval = check_interval
+        self.healthy = True
+        self.requests = 0
+        self.check_at = 0.0
+        self._lock = threading.Lock()
+        event.listen(engine, "handle_error", self.handle_error)
+
+    def is_healthy(self, now):
+        """Returns whether the replica is up, pinging it when a check is due"""
+        with self._lock:
+            # only one caller runs a check that is due, the others go on
+            due = now >= self.check_at
+            if due:
+                self.check_at = now + self.check_interval
+        if due:
+            healthy = self.ping()
+            if healthy != self.healthy:
+                logger.warning("Replica %s is %s", self.key, "up" if healthy else "down")
+            self.healthy = healthy
+        return self.healthy
+
+    def ping(self):
+        """Returns whether the replica answers a SELECT 1"""
+        try:
+            with self.engine.connect() as connection:
+                connection.exec_driver_sql("SELECT 1")
+        except SQLAlchemyError as error:
+            logger.error("Replica %s failed its health check: %s", self.key, error)
+            return False
+        return True
+
+    def mark_down(self):
+        """Takes the replica out of rotation until its next check"""
+        self.healthy = False
+        self.check_at = time.monotonic() + self.check_interval
+
+    def handle_error(self, context):
+        """Marks the replica down when its connection is lost"""
+        if context.is_disconnect and self.healthy:
+            logger.warning("Replica %s is down: lost its connection", self.key)
+            self.mark_down()
+
+
+class ReplicaSet:
+    """Chooses a replica for the reads of a request"""
+
+    def __init__(self, replicas, sticky_seconds):
+        self.replicas = replicas
+        self.sticky_seconds = sticky_seconds
+        self.primary_requests = 0
+        # cache key: when this worker invalidated it, oldest first
+        self.invalidated = OrderedDict()
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def choose(self):
+        """Returns the next healthy replica in turn, or None for the primary"""
+        now = time.monotonic()
+        # the pings run outside of the lock, so a slow one does not hold up other requests
+        healthy = [replica.is_healthy(now) for replica in self.replicas]
+        with self._lock:
+            for offset in range(len(self.replicas)):
+                index = (self._next + offset) % len(self.replicas)
+                if healthy[index]:
+                    # the turn passes to the replica after the one chosen,
+                    # so the ones that are down do not skew the rotation
+                    self._next = (index + 1) % len(self.replicas)
+                    self.replicas[index].requests += 1
+                    return self.replicas[index]
+            self.primary_requests += 1
+            return None
+
+    def remember_invalidated(self, keys):
+        """Notes that the cache keys were invalidated now"""
+        now = time.monotonic()
+        with self._lock:
+            for key in keys:
+                self.invalidated[key] = now
+                self.invalidated.move_to_end(key)
+            # the oldest come first, drop the ones out of the window
+            while self.invalidated and next(iter(self.invalidated.values())) < now - self.sticky_seconds:
+                self.invalidated.popitem(last=False)
+
+    def recently_invalidated(self, key):
+        """Returns whether the cache key was invalidated in the last sticky_seconds"""
+        invalidated = self.invalidated.get(key)
+        return invalidated is not None and invalidated >= time.monotonic() - self.sticky_seconds
+
+    def dispose(self, close=True):
+        """Replaces the connection pools of the replicas, see Engine.dispose()"""
+        for replica in self.replicas:
+            replica.engine.dispose(close=close)
+
+    def stats(self):
+        """Returns the health and request counts of the replicas"""
+        return {
+            "primary_requests": self.primary_requests,
+            "replicas": {
+                replica.key: {"healthy": replica.healthy, "requests": replica.requests}
+                for replica in self.replicas
+            },
+        }
+
+
+######################################################################
+#  R O U T I N G   S E S S I O N
+######################################################################
+class RoutingSession(Session):
+    """A Flask-SQLAlchemy Session that sends the reads of GET and HEAD requests to replicas"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_request_context() and "replicas" in current_app.extensions:
+            if self._flushing or getattr(clause, "is_dml", False):
+                g.db_wrote = True
+            elif getattr(clause, "is_select", False) and may_read_replica():
+                if "db_replica" not in g:
+                    g.db_replica = current_app.extensions["replicas"].choose()
+                if g.db_replica is not None:
+                    return g.db_replica.engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
@@ -0,0 +1,120 @@
+"""
+Single-Flight Calls
+
+When many requests in one worker ask for the same record at once, only
+the first one runs the database query and serialization. The rest wait
+for it and share its result (or its exception). SingleFlight.do() does
+this for threads and SingleFlight.ado() for coroutines on an event loop.
+
+forget() detaches the calls in flight for some keys, so that callers
+arriving after a write start a new call instead of sharing a result read
+before the write. The cache calls it for every key it invalidates.
+"""
+import asyncio
+import threading
+
+
+class _Call:
+    """A call in flight and the result its followers wait for"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one"""
+
+    def __init__(self):
+        self.calls = 0
+        self.coalesced = 0
+        # called as listener(key) for every caller that shares a call
+        self.listeners = []
+        self._in_flight = {}
+        self._async_in_flight = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, function):
+        """Returns function(), or the result of the call for key already in flight"""
+        with self._lock:
+            call = self._in_flight.get(key)
+            leader = call is None
+            if leader:
+                call = self._in_flight[key] = _Call()
+                self.calls += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            self._notify(key)
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = function()
+        except BaseException as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                if self._in_flight.get(key) is call:
+                    del self._in_flight[key]
+            call.done.set()
+        return call.result
+
+    async def ado(self, key, function):
+        """Same as do() for a coroutine function, shared by the tasks of one event loop"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            future = self._async_in_flight.get((loop, key))
+            leader = future is None
+            if leader:
+                future = self._async_in_flight[(loop, key)] = loop.create_future()
+                self.calls += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            self._notify(key)
+            # a cancelled follower must not cancel the call the others wait for
+            return await asyncio.shield(future)
+        try:
+            result = await function()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as error:
+            future.set_exception(error)
+            future.exception()  # nobody may be waiting, so mark it retrieved
+            raise
+        else:
+            future.set_result(result)
+        finally:
+            with self._lock:
+                if self._async_in_flight.get((loop, key)) is future:
+                    del self._async_in_flight[(loop, key)]
+        return result
+
+    def forget(self, *keys):
+        """Lets new callers for the keys start a new call"""
+        with self._lock:
+            for key in keys:
+                self._in_flight.pop(key, None)
+            for loop_key in [loop_key for loop_key in self._async_in_flight if loop_key[1] in keys]:
+                del self._async_in_flight[loop_key]
+
+    def clear(self):
+        """Forgets every call in flight and resets the counters"""
+        with self._lock:
+            self._in_flight.clear()
+            self._async_in_flight.clear()
+            self.calls = 0
+            self.coalesced = 0
+
+    def _notify(self, key):
+        for listener in self.listeners:
+            listener(key)
+
+    def stats(self):
+        """Returns the counters"""
+        return {"calls": self.calls, "coalesced": self.coalesced}
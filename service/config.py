@@ -12,5 +12,59 @@ DATABASE_URI = os.getenv(
 SQLALCHEMY_DATABASE_URI = DATABASE_URI
 SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+# Connection pool of each worker, turned into SQLALCHEMY_ENGINE_OPTIONS
+# by service.common.db_pool.engine_options() when the database is set up
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))  # seconds to wait for a connection
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # seconds, -1 never replaces connections
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("true", "yes", "1")
+DB_STATEMENT_TIMEOUT = int(os.getenv("DB_STATEMENT_TIMEOUT", "0"))  # milliseconds, 0 is no limit
+
+# Statements slower than this are logged with their parameters (0 is off)
+DB_SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", "500"))
+# Adds an X-DB-Stats header with the statement count and time of every request
+DB_STATS_HEADER = os.getenv("DB_STATS_HEADER", "false").lower() in ("true", "yes", "1")
+
+# Read replicas: comma separated database URIs that the reads of GET and
+# HEAD requests are spread over, round-robin (service.common.replicas)
+DATABASE_REPLICA_URIS = [uri.strip() for uri in os.getenv("DATABASE_REPLICA_URIS", "").split(",") if uri.strip()]
+REPLICA_CHECK_INTERVAL = float(os.getenv("REPLICA_CHECK_INTERVAL", "10"))  # seconds between health checks
+# Seconds a client reads from the primary after a write, and a record
+# is not cached from replica reads after it changes; longer than the lag
+REPLICA_STICKY_SECONDS = int(os.getenv("REPLICA_STICKY_SECONDS", "5"))
+
+# Database of the ASGI app (service/asgi.py): derived from DATABASE_URI
+# with an async driver (aiosqlite, async psycopg) when not set
+ASYNC_DATABASE_URI = os.getenv("ASYNC_DATABASE_URI")
+
+# Pagination limits for list endpoints
+PAGE_SIZE_DEFAULT = int(os.getenv("PAGE_SIZE_DEFAULT", "20"))
+PAGE_SIZE_MAX = int(os.getenv("PAGE_SIZE_MAX", "100"))
+
+# Largest number of records accepted by a batch endpoint
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "1000"))
+
+# Number of rows fetched per round trip when streaming exports
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+# Number of rows written per statement by flask import-catalog
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "5000"))
+
+# Read-through cache for serialized Suppliers and Items
+CACHE_ENABLED = os.getenv("CACHE_ENABLED", "true").lower() in ("true", "yes", "1")
+CACHE_MAX_SIZE = int(os.getenv("CACHE_MAX_SIZE", "1024"))
+CACHE_TTL = int(os.getenv("CACHE_TTL", "30"))  # seconds
+
+# Compression of JSON and text responses (gzip, plus br and zstd when installed)
+COMPRESS_ENABLED = os.getenv("COMPRESS_ENABLED", "true").lower() in ("true", "yes", "1")
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))  # bytes, smaller bodies are sent as is
+COMPRESS_GZIP_LEVEL = int(os.getenv("COMPRESS_GZIP_LEVEL", "6"))  # 1 (fast) to 9 (small)
+COMPRESS_BR_LEVEL = int(os.getenv("COMPRESS_BR_LEVEL", "4"))  # 0 to 11
+COMPRESS_ZSTD_LEVEL = int(os.getenv("COMPRESS_ZSTD_LEVEL", "3"))  # 1 to 22
+
+# JSON encoder for responses: "auto" picks the fastest one installed
+JSON_ENCODER = os.getenv("JSON_ENCODER", "auto")
+
 # Secret for session management
 SECRET_KEY = os.getenv("SECRET_KEY", "s3cr3t-key-shhhh")
@@ -3,15 +3,45 @@ Models for Supplier
 
 All of the models are stored in this module
 """
+import os
 import logging
 from datetime import date
 from abc import abstractmethod
+from flask_migrate import Migrate
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, insert, inspect
+from sqlalchemy.orm import joinedload, noload, object_session, selectinload
+from service.common import db_stats, replicas
+from service.common.cache import cache
+from service.common.db_pool import engine_options
+from service.common.replicas import RoutingSession
 
 logger = logging.getLogger("flask.app")
 
 # Create the SQLAlchemy object to be initialized later in init_db()
-db = SQLAlchemy()
+# (its session sends the reads of GET requests to the replicas, if any)
+db = SQLAlchemy(session_options={"class_": RoutingSession})
+
+# Schema migrations live in the migrations/ folder (flask db upgrade)
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "migrations")
+migrate = Migrate(directory=MIGRATIONS_DIR)
+
+# Strategies callers can pick by name for loading relationships:
+#   selectin - one extra SELECT ... IN query for all of the parents
+#   joined   - a LEFT OUTER JOIN in the same query
+#   noload   - never load them (collections appear empty)
+LOADER_STRATEGIES = {
+    "selectin": selectinload,
+    "joined": joinedload,
+    "noload": noload,
+}
+
+# Largest number of Items written by one INSERT in Item.append_many(),
+# 5 bind parameters each
+ITEMS_PER_INSERT = 1000
+
+# Largest value of an Integer column (int4 on Postgres)
+MAX_INTEGER = 2**31 - 1
 
 
 class DataValidationError(Exception):
@@ -23,6 +53,31 @@ def init_db(app):
     Supplier.init_db(app)
 
 
+######################################################################
+#  C A C H E   I N V A L I D A T I O N
+######################################################################
+def invalidate_on_commit(*keys, session=None):
+    """Queues cache keys to be dropped when the current transaction commits
+
+    Args:
+        session: the session of the transaction, db.session by default
+    """
+    session = db.session if session is None else session
+    session.info.setdefault("cache_keys", set()).update(keys)
+
+
+def _invalidate_committed_keys(session):
+    """Drops the cached copies of everything the transaction changed"""
+    keys = session.info.pop("cache_keys", None)
+    if keys:
+        cache.invalidate(*keys)
+
+
+def _discard_rolled_back_keys(session):
+    """Nothing changed, so nothing needs to be dropped"""
+    session.info.pop("cache_keys", None)
+
+
 ######################################################################
 #  P E R S I S T E N T   B A S E   M O D E L
 ######################################################################
@@ -40,6 +95,24 @@ class PersistentBase:
     def deserialize(self, data: dict) -> None:
         """Convert a dictionary into an object"""
 
+    @classmethod
+    def cache_key(cls, by_id):
+        """Returns the key a serialized record is cached under"""
+        return f"{cls.__tablename__}:{by_id}"
+
+    def cache_keys(self) -> list:
+        """Returns the keys of every cached payload that contains this record"""
+        return [self.cache_key(self.id)]
+
+    def deleted_cache_keys(self) -> list:
+        """Returns the keys of every cached payload that deleting this record changes"""
+        return self.cache_keys()
+
+    def invalidate_cache(self, deleting=False):
+        """Drops the cached payloads of this record when the session commits"""
+        if cache.enabled:
+            invalidate_on_commit(*(self.deleted_cache_keys() if deleting else self.cache_keys()))
+
     def create(self):
         """
         Creates a Supplier to the database
@@ -47,42 +120,206 @@ class PersistentBase:
         logger.info("Creating %s", self.name)
         self.id = None  # id must be none to generate next primary key
         db.session.add(self)
+        self.invalidate_cache()
         db.session.commit()
 
+    @classmethod
+    def bulk_create(cls, records):
+        """
+        Creates many records in a single transaction
+
+        The session flush groups the INSERTs for each table into batched
+        multi-row statements, so this costs a few round trips and one
+        commit instead of one commit per record.
+
+        Returns:
+            list: the new ids in the same order as the records
+        """
+        logger.info("Creating %d records", len(records))
+        for record in records:
+            record.id = None  # id must be none to generate next primary key
+        db.session.add_all(records)
+        db.session.flush()
+        # read the ids before the commit expires them
+        ids = [record.id for record in records]
+        db.session.commit()
+        return ids
+
     def update(self):
         """
         Updates a Supplier to the database
         """
         logger.info("Updating %s", self.name)
+        self.invalidate_cache()
         db.session.commit()
 
     def delete(self):
         """Removes a Supplier from the data store"""
         logger.info("Deleting %s", self.name)
+        self.invalidate_cache(deleting=True)
         db.session.delete(self)
         db.session.commit()
 
     @classmethod
     def init_db(cls, app):
-        """Initializes the database session"""
+        """
+        Initializes the database session
+
+        Nothing is sent to the database here: connections are opened by the
+        first request and the tables are managed with flask db-init.
+        """
         logger.info("Initializing database")
         cls.app = app
-        # This is where we initialize SQLAlchemy from the Flask app
-        db.init_app(app)
-        app.app_context().push()
-        db.create_all()  # make our sqlalchemy tables
+        # the app is only set up once: the tests call init_db() again after
+        # it has handled requests, when Flask no longer allows it
+        if "sqlalchemy" not in app.extensions:
+            # options set explicitly win over the ones from the DB_POOL_* settings
+            app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+                **engine_options(app.config),
+                **app.config.get("SQLALCHEMY_ENGINE_OPTIONS", {}),
+            }
+            # This is where we initialize SQLAlchemy from the Flask app
+            db.init_app(app)
+            migrate.init_app(app, db)
+            replicas.init_app(app, engine_options)
+        with app.app_context():
+            db_stats.instrument(db.engine)
+
+    @classmethod
+    def loader_options(cls, loader=None):
+        """Returns query options that load all relationships with a strategy
+
+        Args:
+            loader (string): a key of LOADER_STRATEGIES, or None to keep
+                the lazy loading declared on the relationship
+        """
+        if loader is None:
+            return []
+        if loader not in LOADER_STRATEGIES:
+            raise ValueError(f"Unknown loader strategy '{loader}'")
+        strategy = LOADER_STRATEGIES[loader]
+        return [
+            strategy(getattr(cls, relationship.key))
+            for relationship in cls.__mapper__.relationships
+        ]
 
     @classmethod
-    def all(cls):
+    def all(cls, loader=None):
         """Returns all of the records in the database"""
         logger.info("Processing all records")
-        return cls.query.all()
+        return cls.query.options(*cls.loader_options(loader)).all()
+
+    @classmethod
+    def find_page(cls, *criteria, after=None, limit=20, loader=None):
+        """Returns up to limit records with an id greater than after
+
+        This is keyset pagination: the next page is found by seeking the
+        primary key index past the last id seen instead of counting rows
+        with OFFSET, so a page costs the same no matter how deep it is.
+
+        Args:
+            criteria: optional SQLAlchemy filter expressions
+            after (int): the last id of the previous page, or None for the first
+            limit (int): the maximum number of records to return
+            loader (string): how to load relationships, see loader_options()
+        """
+        logger.info("Processing page of %s records after id %s", limit, after)
+        query = cls.query.options(*cls.loader_options(loader)).filter(*criteria)
+        if after is not None:
+            query = query.filter(cls.id > after)
+        return query.order_by(cls.id).limit(limit).all()
+
+    @classmethod
+    def parse_fields(cls, fields=None, include=None, exclude=None):
+        """
+        Works out the columns and collections a sparse fieldset asks for
+
+        Args:
+            fields (string): comma separated names to return instead of all
+                columns (collections are only returned when named here)
+            include (string): comma separated collections to add
+            exclude (string): comma separated columns or collections to drop
+
+        Returns:
+            tuple: the list of column names (None means every column) and
+                the list of collection names to return
+        """
+        columns = list(cls.__table__.columns.keys())
+        collections = [rel.key for rel in cls.__mapper__.relationships if rel.uselist]
+        requested, included, excluded = (
+            [name.strip() for name in value.split(",") if name.strip()] if value else []
+            for value in (fields, include, exclude)
+        )
+        for name in requested + included + excluded:
+            if name not in columns and name not in collections:
+                raise DataValidationError(f"Invalid field: {cls.__name__} has no field '{name}'")
+
+        if requested:
+            columns = [name for name in columns if name in requested]
+            collections = [name for name in collections if name in requested + included]
+        columns = [name for name in columns if name not in excluded]
+        collections = [name for name in collections if name not in excluded]
+        if len(columns) == len(cls.__table__.columns):
+            columns = None
+        return columns, collections
 
     @classmethod
-    def find(cls, by_id):
+    def serialize_row(cls, row) -> dict:
+        """Converts a row of selected columns into a dictionary"""
+        return dict(row)
+
+    @classmethod
+    def find_fields(cls, columns, *criteria, after=None, limit=None):
+        """
+        Returns only the named columns of matching records as dictionaries
+
+        Only those columns are SELECTed and no ORM objects are built, so a
+        smaller response is also a cheaper query. The id is always returned
+        and the records come back in id order.
+
+        Args:
+            columns (list): column names, or None for every column
+            criteria: optional SQLAlchemy filter expressions
+            after (int): only return records with a greater id
+            limit (int): the maximum number of records to return
+        """
+        logger.info("Processing %s fields query ...", columns or "all")
+        names = list(cls.__table__.columns.keys()) if columns is None else columns
+        selected = [cls.__table__.c.id] + [cls.__table__.c[name] for name in names if name != "id"]
+        statement = db.select(*selected).where(*criteria).order_by(cls.id)
+        if after is not None:
+            statement = statement.where(cls.id > after)
+        if limit is not None:
+            statement = statement.limit(limit)
+        return [cls.serialize_row(row) for row in db.session.execute(statement).mappings()]
+
+    @classmethod
+    def find_many(cls, ids, loader=None):
+        """Finds the records with any of the ids using a single IN query
+
+        The records are returned in no particular order and ids that do
+        not exist are left out.
+        """
+        logger.info("Processing lookup for %d ids ...", len(ids))
+        return cls.query.options(*cls.loader_options(loader)).filter(cls.id.in_(ids)).all()
+
+    @classmethod
+    def stream(cls, batch_size=1000, loader=None):
+        """Yields every record in id order, batch_size rows at a time
+
+        Rows are read through a server-side cursor and turned into objects
+        one batch at a time, so memory use does not grow with the table.
+        Collections can only be streamed with the "selectin" loader.
+        """
+        logger.info("Streaming all records in batches of %s", batch_size)
+        query = cls.query.options(*cls.loader_options(loader)).order_by(cls.id)
+        yield from query.yield_per(batch_size)
+
+    @classmethod
+    def find(cls, by_id, loader=None):
         """Finds a record by it's ID"""
         logger.info("Processing lookup for id %s ...", by_id)
-        return cls.query.get(by_id)
+        return cls.query.options(*cls.loader_options(loader)).get(by_id)
 
 
 ######################################################################
@@ -101,9 +338,126 @@ class Item(db.Model, PersistentBase):
     quantity = db.Column(db.Integer, nullable=False)      # The minimum quantity that must be ordered
     price = db.Column(db.Numeric(10, 2), nullable=False)  # Price with 2 decimal places
 
+    # The fields deserialize() requires
+    FIELDS = ("supplier_id", "sku", "name", "quantity", "price")
+
+    # Items are always fetched by supplier, so every composite index leads
+    # with supplier_id: one for keyset pages in id order and one for each
+    # filter of the item listing. The sku index serves prefix searches too.
+    __table_args__ = (
+        db.Index("ix_item_supplier_id_id", "supplier_id", "id"),
+        db.Index(
+            "ix_item_supplier_id_sku", "supplier_id", "sku",
+            postgresql_ops={"sku": "varchar_pattern_ops"},
+        ),
+        db.Index("ix_item_supplier_id_name", "supplier_id", "name"),
+        db.Index("ix_item_supplier_id_price", "supplier_id", "price"),
+        db.Index("ix_item_supplier_id_quantity", "supplier_id", "quantity"),
+        # cross-supplier sku lookups read the cheapest offers first
+        db.Index("ix_item_sku_price", "sku", "price"),
+    )
+
     def __repr__(self):
         return f"<Item {self.id}>"
 
+    def cache_keys(self) -> list:
+        """An Item is cached on its own and inside its Supplier"""
+        return [self.cache_key(self.id), Supplier.cache_key(self.supplier_id)]
+
+    @classmethod
+    def append_many(cls, supplier_id, records):
+        """
+        Adds many Items to a Supplier in a single transaction
+
+        The Items are written with one multi-row INSERT ... RETURNING per
+        ITEMS_PER_INSERT of them, which keeps the statement under the bind
+        parameter limits of SQLite and Postgres, and then one commit. No
+        ORM objects are built, so the Supplier version is bumped and its
+        cached payload dropped here instead of by the flush listeners.
+
+        Args:
+            supplier_id (int): the Supplier the Items are added to
+            records (list): the column values of each Item from validate()
+
+        Returns:
+            list: the new ids in the same order as the records
+        """
+        logger.info("Adding %d Items to Supplier %s", len(records), supplier_id)
+        ids = []
+        for start in range(0, len(records), ITEMS_PER_INSERT):
+            rows = [
+                {**values, "supplier_id": supplier_id}
+                for values in records[start:start + ITEMS_PER_INSERT]
+            ]
+            result = db.session.execute(insert(cls.__table__).values(rows).returning(cls.id))
+            # RETURNING does not promise the row order but the ids are
+            # drawn in it, so sorting them lines them up with the rows
+            ids += sorted(result.scalars())
+        if ids:
+            Supplier.bump_versions([supplier_id])
+            invalidate_on_commit(Supplier.cache_key(supplier_id))
+        db.session.commit()
+        return ids
+
+    @classmethod
+    def find_by_sku(cls, sku, limit=20):
+        """Returns the Items with a sku from every Supplier, cheapest first
+
+        Args:
+            sku (string): the exact sku of the Items
+            limit (int): the maximum number of Items to return
+        """
+        logger.info("Processing sku query for %s ...", sku)
+        return cls.query.filter(cls.sku == sku).order_by(cls.price, cls.id).limit(limit).all()
+
+    @classmethod
+    def find_best_price(cls, sku, quantity):
+        """Returns the cheapest Item with a sku that can be ordered in a quantity
+
+        Args:
+            sku (string): the exact sku of the Item
+            quantity (int): the order quantity, which must be at least the
+                minimum order quantity of the Item
+        """
+        logger.info("Processing best price query for %s x %s ...", quantity, sku)
+        return (
+            cls.query.filter(cls.sku == sku, cls.quantity <= quantity)
+            .order_by(cls.price, cls.id)
+            .first()
+        )
+
+    @classmethod
+    def supplier_criteria(cls, supplier_id, sku=None, name=None, min_price=None,
+                          max_price=None, min_quantity=None, max_quantity=None):
+        """
+        Returns the filters for searching the Items of a Supplier
+
+        Every filter is optional and each one is backed by an index that
+        starts with supplier_id.
+
+        Args:
+            supplier_id (int): the Supplier the Items belong to
+            sku (string): the start of the sku
+            name (string): the exact name
+            min_price, max_price (Decimal): an inclusive price range
+            min_quantity, max_quantity (int): an inclusive minimum order range
+        """
+        # pylint: disable=too-many-arguments
+        criteria = [cls.supplier_id == supplier_id]
+        if sku:
+            criteria.append(cls.sku.startswith(sku, autoescape=True))
+        if name:
+            criteria.append(cls.name == name)
+        if min_price is not None:
+            criteria.append(cls.price >= min_price)
+        if max_price is not None:
+            criteria.append(cls.price <= max_price)
+        if min_quantity is not None:
+            criteria.append(cls.quantity >= min_quantity)
+        if max_quantity is not None:
+            criteria.append(cls.quantity <= max_quantity)
+        return criteria
+
     def __str__(self):
         return f"{self.name}"
 
@@ -122,15 +476,23 @@ class Item(db.Model, PersistentBase):
         """
         Populates an Item from a dictionary
 
+        Args:
+            data (dict): A dictionary containing the resource data
+        """
+        for name, value in self.validate(data).items():
+            setattr(self, name, value)
+        return self
+
+    @classmethod
+    def validate(cls, data: dict) -> dict:
+        """
+        Returns the column values of an Item from a dictionary
+
         Args:
             data (dict): A dictionary containing the resource data
         """
         try:
-            self.supplier_id = data["supplier_id"]
-            self.sku = data["sku"]
-            self.name = data["name"]
-            self.quantity = data["quantity"]
-            self.price = data["price"]
+            return {name: data[name] for name in cls.FIELDS}
         except KeyError as error:
             raise DataValidationError("Invalid Item: missing " + error.args[0]) from error
         except TypeError as error:
@@ -138,7 +500,6 @@ class Item(db.Model, PersistentBase):
                 "Invalid Item: body of request contained bad or no data "
                 + error.args[0]
             ) from error
-        return self
 
 
 ######################################################################
@@ -153,15 +514,29 @@ class Supplier(db.Model, PersistentBase):
 
     # Table Schema
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(64))
-    email = db.Column(db.String(64))
+    name = db.Column(db.String(64), index=True)
+    email = db.Column(db.String(64), index=True)
     phone_number = db.Column(db.String(32), nullable=True)  # phone number is optional
     date_joined = db.Column(db.Date(), nullable=False, default=date.today())
-    items = db.relationship("Item", backref="supplier", passive_deletes=True)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default="1")  # bumped on every change
+    # in id order, which ix_item_supplier_id_id serves without a sort
+    items = db.relationship("Item", backref="supplier", passive_deletes=True, order_by="Item.id")
 
     def __repr__(self):
         return f"<Supplier {self.name} id=[{self.id}]>"
 
+    def deleted_cache_keys(self) -> list:
+        """The database deletes the Items of a Supplier with it, so they go too"""
+        keys = self.cache_keys()
+        if "items" not in inspect(self).unloaded:
+            item_ids = [item.id for item in self.items]
+        elif self.id is not None:
+            item_ids = db.session.scalars(db.select(Item.id).where(Item.supplier_id == self.id))
+        else:
+            item_ids = []
+        keys.extend(Item.cache_key(item_id) for item_id in item_ids if item_id is not None)
+        return keys
+
     def serialize(self):
         """Converts a Supplier into a dictionary"""
         supplier = {
@@ -170,6 +545,7 @@ class Supplier(db.Model, PersistentBase):
             "email": self.email,
             "phone_number": self.phone_number,
             "date_joined": self.date_joined.isoformat(),
+            "version": self.version,
             "items": [],
         }
         for item in self.items:
@@ -201,14 +577,129 @@ class Supplier(db.Model, PersistentBase):
                 "Invalid Supplier: body of request contained "
                 "bad or no data - " + error.args[0]
             ) from error
+        except ValueError as error:
+            raise DataValidationError("Invalid Supplier: bad date_joined - " + error.args[0]) from error
+        for name in ("name", "email", "phone_number"):
+            self._check_text(name)
         return self
 
+    def _check_text(self, name):
+        """Raises DataValidationError for a value the column cannot hold"""
+        value = getattr(self, name)
+        column = self.__table__.c[name]
+        if value is None and name == "phone_number":
+            return  # phone number is optional
+        if not isinstance(value, str) or len(value) > column.type.length:
+            raise DataValidationError(
+                f"Invalid Supplier: {name} must be text of at most {column.type.length} characters"
+            )
+
+    @classmethod
+    def serialize_row(cls, row) -> dict:
+        """Converts a row of selected columns into a dictionary"""
+        supplier = dict(row)
+        if supplier.get("date_joined"):
+            supplier["date_joined"] = supplier["date_joined"].isoformat()
+        return supplier
+
+    @classmethod
+    def find_fields(cls, columns, *criteria, after=None, limit=None, with_items=False):
+        """
+        Returns only the named columns of matching Suppliers as dictionaries
+
+        The items are only read, with one more query for all of the
+        Suppliers, when with_items is True.
+        """
+        suppliers = super().find_fields(columns, *criteria, after=after, limit=limit)
+        if with_items and suppliers:
+            items = {supplier["id"]: supplier.setdefault("items", []) for supplier in suppliers}
+            for item in Item.find_fields(None, Item.supplier_id.in_(items)):
+                items[item["supplier_id"]].append(item)
+        return suppliers
+
+    @staticmethod
+    def make_etag(supplier_id, version, variant=""):
+        """Returns the entity tag of a Supplier version
+
+        Args:
+            variant (string): tells apart partial representations of the
+                same version, such as sparse fieldsets
+        """
+        etag = f"{supplier_id}-{version}"
+        return f"{etag}-{variant}" if variant else etag
+
     @classmethod
-    def find_by_name(cls, name):
+    def find_version(cls, by_id):
+        """Returns just the version of a Supplier, or None if it doesn't exist"""
+        logger.info("Processing version lookup for id %s ...", by_id)
+        return db.session.scalar(db.select(cls.version).where(cls.id == by_id))
+
+    @classmethod
+    def bump_versions(cls, supplier_ids, session=None):
+        """Bumps the version of Suppliers that are not loaded in the session"""
+        session = db.session if session is None else session
+        if supplier_ids:
+            session.execute(
+                cls.__table__.update()
+                .where(cls.id.in_(supplier_ids))
+                .values(version=cls.version + 1)
+            )
+
+    @classmethod
+    def find_by_name(cls, name, loader=None):
         """Returns all Suppliers with the given name
 
         Args:
             name (string): the name of the Suppliers you want to match
+            loader (string): how to load the items, see loader_options()
         """
         logger.info("Processing name query for %s ...", name)
-        return cls.query.filter(cls.name == name)
+        return cls.query.options(*cls.loader_options(loader)).filter(cls.name == name)
+
+
+@event.listens_for(Supplier.items, "append")
+def _supplier_item_appended(supplier, item, initiator):  # pylint: disable=unused-argument
+    """A new Item changes the cached payload of its Supplier"""
+    identity = inspect(supplier).identity
+    if identity and cache.enabled:
+        invalidate_on_commit(Supplier.cache_key(identity[0]), session=object_session(supplier))
+
+
+def _bump_changed_supplier_versions(session, flush_context, instances):  # pylint: disable=unused-argument
+    """Bumps the version of every Supplier whose row or Items are changing"""
+    suppliers = {
+        obj for obj in session.dirty
+        if isinstance(obj, Supplier) and session.is_modified(obj)
+    }
+    supplier_ids = set()
+    for obj in session.new | session.dirty | session.deleted:
+        if not isinstance(obj, Item) or obj.supplier_id is None:
+            continue  # Items appended to a Supplier show up as a change to it
+        if obj in session.new or obj in session.deleted or session.is_modified(obj):
+            supplier_ids.add(obj.supplier_id)
+
+    # Suppliers in the session are bumped as part of this flush ...
+    for supplier_id in list(supplier_ids):
+        supplier = session.identity_map.get(session.identity_key(Supplier, supplier_id))
+        if supplier is not None:
+            suppliers.add(supplier)
+            supplier_ids.discard(supplier_id)
+    for supplier in suppliers:
+        if supplier not in session.deleted:
+            supplier.version = Supplier.version + 1
+    # ... and the rest with a single UPDATE
+    Supplier.bump_versions(supplier_ids, session=session)
+
+
+def listen_session_events(target):
+    """Registers the cache and version listeners on a session or Session class
+
+    Sessions other than db.session, such as the ones behind the ASGI app,
+    need them too to keep versions and cached payloads in step.
+    """
+    event.listen(target, "before_flush", _bump_changed_supplier_versions)
+    event.listen(target, "after_commit", _invalidate_committed_keys)
+    event.listen(target, "after_rollback", _discard_rolled_back_keys)
+
+
+listen_session_events(db.session)
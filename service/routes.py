@@ -4,9 +4,15 @@ My Service
 Describe what your service does here
 """
 
-from flask import jsonify, request, url_for, abort
+import json
+import zlib
+from flask import Response, jsonify, request, url_for, abort, make_response, stream_with_context
 from service.common import status  # HTTP Status Codes
-from service.models import Supplier, Item
+from service.common.cache import cache
+from service.common.catalog import clean_row
+from service.common.query_args import QueryArgs, trim_page
+from service.common.db_pool import pool_stats
+from service.models import db, Supplier, Item, DataValidationError
 
 # Import Flask application
 from . import app
@@ -22,12 +28,30 @@ def index():
         jsonify(
             name="Supplier REST API Service",
             version="1.0",
-            # paths=url_for("list_suppliers", _external=True),
+            paths=url_for("list_suppliers", _external=True),
         ),
         status.HTTP_200_OK,
     )
 
 
+######################################################################
+# GET THE STATS OF THIS WORKER
+######################################################################
+@app.route("/stats")
+def get_stats():
+    """
+    Returns the connection pool and cache counters of this worker
+
+    Every worker process has its own pool and cache, so each request
+    reports on whichever worker answered it (see "pid"). With read
+    replicas it also counts the requests sent to each one.
+    """
+    stats = {"pool": pool_stats(db.engine), "cache": cache.stats()}
+    if "replicas" in app.extensions:
+        stats["replicas"] = app.extensions["replicas"].stats()
+    return jsonify(stats), status.HTTP_200_OK
+
+
 ######################################################################
 #  R E S T   A P I   E N D P O I N T S
 ######################################################################
@@ -36,6 +60,115 @@ def index():
 #                S U P P L I E R   E N D P O I N T S
 # ---------------------------------------------------------------------
 
+######################################################################
+# LIST SUPPLIERS
+######################################################################
+@app.route("/suppliers", methods=["GET"])
+def list_suppliers():
+    """
+    Returns a page of Suppliers
+
+    Pages are keyset paginated on id: pass the last id of a page as
+    ?after=<id> to get the next one. A Link header with rel="next" is
+    returned while there are more Suppliers to read.
+
+    With ?ids=1,2,3 the Suppliers with those ids are returned instead.
+    Both accept the sparse fieldset parameters of get_fields_args().
+    """
+    columns, collections = get_fields_args(Supplier)
+    with_items = "items" in collections
+    if "ids" in request.args:
+        return lookup_suppliers(get_ids_arg("ids"), columns, with_items)
+
+    app.logger.info("Request for Supplier list")
+    after = get_int_arg("after")
+    limit = get_limit_arg()
+
+    criteria = []
+    name = request.args.get("name")
+    if name:
+        criteria.append(Supplier.name == name)
+
+    # Read one extra row to find out if there is a next page
+    if columns is None and with_items:
+        # The items of the whole page are loaded with a single SELECT ... IN query
+        suppliers = Supplier.find_page(
+            *criteria, after=after, limit=limit + 1, loader="selectin"
+        )
+        results = [supplier.serialize() for supplier in suppliers]
+    else:
+        results = Supplier.find_fields(
+            columns, *criteria, after=after, limit=limit + 1, with_items=with_items
+        )
+    results, headers = paginate(results, limit, "list_suppliers")
+    app.logger.info("Returning %d suppliers", len(results))
+    return jsonify(results), status.HTTP_200_OK, headers
+
+
+def lookup_suppliers(supplier_ids, columns=None, with_items=True):
+    """
+    Returns many Suppliers by id in one round trip
+
+    All of the Suppliers are read with one IN query and their items with
+    one more. Results are in the order of the requested ids and an id
+    that does not exist gets a not found entry in its place.
+    """
+    app.logger.info("Request for %d Suppliers by id", len(supplier_ids))
+    if columns is None and with_items:
+        suppliers = {
+            supplier.id: supplier.serialize()
+            for supplier in Supplier.find_many(set(supplier_ids), loader="selectin")
+        }
+    else:
+        suppliers = {
+            supplier["id"]: supplier
+            for supplier in Supplier.find_fields(
+                columns, Supplier.id.in_(set(supplier_ids)), with_items=with_items
+            )
+        }
+    results = []
+    for supplier_id in supplier_ids:
+        supplier = suppliers.get(supplier_id)
+        if supplier:
+            results.append(supplier)
+        else:
+            results.append(
+                {
+                    "id": supplier_id,
+                    "status": status.HTTP_404_NOT_FOUND,
+                    "error": "Not Found",
+                    "message": f"Supplier with id '{supplier_id}' could not be found.",
+                }
+            )
+    return jsonify(results), status.HTTP_200_OK
+
+
+######################################################################
+# EXPORT ALL SUPPLIERS
+######################################################################
+@app.route("/suppliers/export", methods=["GET"])
+def export_suppliers():
+    """
+    Exports every Supplier with its items
+
+    The response is streamed as newline-delimited JSON (one Supplier per
+    line) while the Suppliers are read from the database in batches, so
+    memory use stays the same no matter how large the catalog is.
+    """
+    app.logger.info("Request to export all Suppliers")
+    batch_size = app.config["EXPORT_BATCH_SIZE"]
+
+    def generate():
+        for supplier in Supplier.stream(batch_size, loader="selectin"):
+            yield app.json.dumps(supplier.serialize()) + "\n"
+
+    return Response(
+        stream_with_context(generate()),
+        status=status.HTTP_200_OK,
+        mimetype="application/x-ndjson",
+    )
+
+
 ######################################################################
 # CREATE A NEW SUPPLIER
 ######################################################################
@@ -60,6 +193,42 @@ def create_suppliers():
     return jsonify(message), status.HTTP_201_CREATED, {"Location": location_url}
 
 
+######################################################################
+# CREATE A BATCH OF SUPPLIERS
+######################################################################
+@app.route("/suppliers/batch", methods=["POST"])
+def create_suppliers_batch():
+    """
+    Creates many Suppliers at once
+
+    The body is a JSON array of Suppliers or newline-delimited JSON with
+    one Supplier per line. Every Supplier and its items are validated
+    against the columns before anything is written; if any are invalid
+    nothing is created and the errors for each of them are returned.
+    Otherwise all Suppliers and their items are inserted in one
+    transaction.
+    """
+    app.logger.info("Request to create a batch of Suppliers")
+    media_type = check_content_type("application/json", "application/x-ndjson")
+    records = get_batch_records(media_type)
+
+    # Validate everything up front
+    suppliers = []
+    errors = []
+    for position, data in enumerate(records):
+        try:
+            suppliers.append(deserialize_batch_supplier(data))
+        except DataValidationError as error:
+            errors.append({"index": position, "message": str(error)})
+    if errors:
+        app.logger.warning("Rejected batch with %d invalid Suppliers", len(errors))
+        return jsonify(ids=[], errors=errors), status.HTTP_400_BAD_REQUEST
+
+    ids = Supplier.bulk_create(suppliers)
+    app.logger.info("Created %d Suppliers", len(ids))
+    return jsonify(ids=ids, errors=[]), status.HTTP_201_CREATED
+
+
 ######################################################################
 # READ A SUPPLIER
 ######################################################################
@@ -68,19 +237,51 @@ def get_suppliers(supplier_id):
     """
     Retrieve a single Supplier
 
-    This endpoint will return a Supplier based on it's id
+    This endpoint will return a Supplier based on it's id. The response
+    carries an ETag and a request with a matching If-None-Match header
+    gets a 304 Not Modified after looking up only the version. It accepts
+    the sparse fieldset parameters of get_fields_args().
     """
     app.logger.info("Request for Supplier with id: %s", supplier_id)
+    columns, collections = get_fields_args(Supplier)
+    with_items = "items" in collections
+    variant = "" if columns is None and with_items else fieldset_tag(columns, collections)
+
+    if request.if_none_match:
+        version = Supplier.find_version(supplier_id)
+        etag = Supplier.make_etag(supplier_id, version, variant)
+        if version is not None and request.if_none_match.contains_weak(etag):
+            response = make_response("", status.HTTP_304_NOT_MODIFIED)
+            response.set_etag(etag)
+            return response
+
+    def load_supplier():
+        # a single Supplier and its items come back from one joined query
+        supplier = Supplier.find(supplier_id, loader="joined")
+        return supplier.serialize() if supplier else None
+
+    if variant:
+        # the version is always read because the ETag needs it
+        selected = columns if columns is None or "version" in columns else columns + ["version"]
+        found = Supplier.find_fields(selected, Supplier.id == supplier_id, with_items=with_items)
+        message = found[0] if found else None
+    else:
+        message = cache.get_or_set(Supplier.cache_key(supplier_id), load_supplier)
 
     # See if the supplier exists and abort if it doesn't
-    supplier = Supplier.find(supplier_id)
-    if not supplier:
+    if not message:
         abort(
             status.HTTP_404_NOT_FOUND,
             f"Supplier with id '{supplier_id}' could not be found.",
         )
 
-    return jsonify(supplier.serialize()), status.HTTP_200_OK
+    if columns is None or "version" in columns:
+        version = message["version"]
+    else:
+        version = message.pop("version")
+    response = make_response(jsonify(message), status.HTTP_200_OK)
+    response.set_etag(Supplier.make_etag(supplier_id, version, variant))
+    return response
 
 
 # ---------------------------------------------------------------------
@@ -101,7 +302,8 @@ def create_items(supplier_id):
     check_content_type("application/json")
 
     # See if the supplier exists and abort if it doesn't
-    supplier = Supplier.find(supplier_id)
+    # (the existing items are not needed to append a new one)
+    supplier = Supplier.find(supplier_id, loader="noload")
     if not supplier:
         abort(
             status.HTTP_404_NOT_FOUND,
@@ -122,6 +324,101 @@ def create_items(supplier_id):
     return jsonify(message), status.HTTP_201_CREATED
 
 
+######################################################################
+# ADD A BATCH OF ITEMS TO A SUPPLIER
+######################################################################
+@app.route("/suppliers/<int:supplier_id>/items/batch", methods=["POST"])
+def create_items_batch(supplier_id):
+    """
+    Adds many Items to a Supplier at once
+
+    The body is a JSON array of Items or newline-delimited JSON with one
+    Item per line. Each one is checked like a row of flask import-catalog
+    (see catalog.clean_row()), types and lengths included. Items may
+    leave out supplier_id, and the one in the URL is used for all of them.
+    With ?mode=atomic (the default) nothing is created if any Item is
+    invalid; with ?mode=best-effort the valid Items are created and the
+    invalid ones are reported. Either way the Items are written with one
+    INSERT and one commit, and the ids come back in the order of the
+    valid Items.
+    """
+    app.logger.info("Request to add a batch of Items to Supplier with id: %s", supplier_id)
+    media_type = check_content_type("application/json", "application/x-ndjson")
+    mode = request.args.get("mode", "atomic")
+    if mode not in ("atomic", "best-effort"):
+        abort(status.HTTP_400_BAD_REQUEST, "Query parameter 'mode' must be atomic or best-effort.")
+    records = get_batch_records(media_type)
+
+    # See if the supplier exists and abort if it doesn't
+    if Supplier.find_version(supplier_id) is None:
+        abort(
+            status.HTTP_404_NOT_FOUND,
+            f"Supplier with id '{supplier_id}' could not be found.",
+        )
+
+    # Validate everything up front
+    items = []
+    errors = []
+    for position, data in enumerate(records):
+        try:
+            items.append(clean_row(data, supplier_id))
+        except DataValidationError as error:
+            errors.append({"index": position, "message": str(error)})
+    if errors and (mode == "atomic" or not items):
+        app.logger.warning("Rejected batch with %d invalid Items", len(errors))
+        return jsonify(ids=[], errors=errors), status.HTTP_400_BAD_REQUEST
+
+    ids = Item.append_many(supplier_id, items)
+    app.logger.info("Added %d Items to Supplier %s", len(ids), supplier_id)
+    return jsonify(ids=ids, errors=errors), status.HTTP_201_CREATED
+
+
+######################################################################
+# LIST THE ITEMS OF A SUPPLIER
+######################################################################
+@app.route("/suppliers/<int:supplier_id>/items", methods=["GET"])
+def list_items(supplier_id):
+    """
+    Returns a page of a Supplier's Items
+
+    Pages are keyset paginated on id like list_suppliers(). The Items can
+    be filtered with ?sku=<prefix>, ?name=, ?min_price=, ?max_price=,
+    ?min_quantity= and ?max_quantity=, all of which are applied in SQL.
+    It accepts the sparse fieldset parameters of get_fields_args().
+    """
+    app.logger.info("Request to list Items for Supplier with id: %s", supplier_id)
+    columns, _ = get_fields_args(Item)
+    after = get_int_arg("after")
+    limit = get_limit_arg()
+    criteria = Item.supplier_criteria(
+        supplier_id,
+        sku=request.args.get("sku"),
+        name=request.args.get("name"),
+        min_price=get_decimal_arg("min_price"),
+        max_price=get_decimal_arg("max_price"),
+        min_quantity=get_int_arg("min_quantity"),
+        max_quantity=get_int_arg("max_quantity"),
+    )
+
+    # See if the supplier exists and abort if it doesn't
+    if Supplier.find_version(supplier_id) is None:
+        abort(
+            status.HTTP_404_NOT_FOUND,
+            f"Supplier with id '{supplier_id}' could not be found.",
+        )
+
+    # Read one extra row to find out if there is a next page
+    if columns is None:
+        items = Item.find_page(*criteria, after=after, limit=limit + 1)
+        results = [item.serialize() for item in items]
+    else:
+        results = Item.find_fields(columns, *criteria, after=after, limit=limit + 1)
+
+    results, headers = paginate(results, limit, "list_items", supplier_id=supplier_id)
+    app.logger.info("Returning %d items", len(results))
+    return jsonify(results), status.HTTP_200_OK, headers
+
+
 ######################################################################
 # READ AN ITEM FROM A SUPPLIER
 ######################################################################
@@ -130,20 +427,80 @@ def get_items(supplier_id, item_id):
     """
     Get an Item
 
-    This endpoint returns just an item
+    This endpoint returns just an item. It accepts the sparse fieldset
+    parameters of get_fields_args().
     """
     app.logger.info(
         "Request to retrieve Item %s for Supplier id: %s", item_id, supplier_id
     )
 
+    def load_item():
+        item = Item.find(item_id)
+        return item.serialize() if item else None
+
+    columns, _ = get_fields_args(Item)
+    if columns is None:
+        message = cache.get_or_set(Item.cache_key(item_id), load_item)
+    else:
+        found = Item.find_fields(columns, Item.id == item_id)
+        message = found[0] if found else None
+
     # See if the item exists and abort if it doesn't
-    item = Item.find(item_id)
-    if not item:
+    if not message:
         abort(
             status.HTTP_404_NOT_FOUND,
             f"Supplier with id '{item_id}' could not be found.",
         )
 
+    return jsonify(message), status.HTTP_200_OK
+
+
+# ---------------------------------------------------------------------
+#          C R O S S - S U P P L I E R   I T E M   E N D P O I N T S
+# ---------------------------------------------------------------------
+
+######################################################################
+# SEARCH ITEMS BY SKU
+######################################################################
+@app.route("/items", methods=["GET"])
+def search_items():
+    """
+    Returns the Items with a sku from every Supplier
+
+    The sku is required (?sku=) and the Items are ordered by price, so the
+    first page holds the cheapest offers. Use ?limit= for more of them.
+    """
+    sku = get_required_arg("sku")
+    app.logger.info("Request for Items with sku: %s", sku)
+    items = Item.find_by_sku(sku, limit=get_limit_arg())
+    results = [item.serialize() for item in items]
+    app.logger.info("Returning %d items", len(results))
+    return jsonify(results), status.HTTP_200_OK
+
+
+######################################################################
+# FIND THE CHEAPEST SUPPLIER OF A SKU
+######################################################################
+@app.route("/items/best-price", methods=["GET"])
+def get_best_price():
+    """
+    Returns the cheapest Item with a sku for an order quantity
+
+    Both ?sku= and ?qty= are required. Only Items whose minimum order
+    quantity is at or below qty are considered.
+    """
+    sku = get_required_arg("sku")
+    quantity = get_int_arg("qty")
+    if quantity is None:
+        abort(status.HTTP_400_BAD_REQUEST, "Query parameter 'qty' is required.")
+    app.logger.info("Request for best price of %s x %s", quantity, sku)
+
+    item = Item.find_best_price(sku, quantity)
+    if not item:
+        abort(
+            status.HTTP_404_NOT_FOUND,
+            f"No Supplier sells sku '{sku}' in a quantity of {quantity}.",
+        )
     return jsonify(item.serialize()), status.HTTP_200_OK
 
 
@@ -152,13 +509,131 @@ def get_items(supplier_id, item_id):
 ######################################################################
 
 
-def check_content_type(media_type):
-    """Checks that the media type is correct"""
+def query_args():
+    """Returns the query parameters of the request, which abort with 400 when bad"""
+    return QueryArgs(request.args, app.config, bad_request)
+
+
+def bad_request(message):
+    """Aborts the request with a 400 Bad Request"""
+    abort(status.HTTP_400_BAD_REQUEST, message)
+
+
+def get_required_arg(name):
+    """Returns a query parameter that must be present or aborts with 400"""
+    return query_args().required(name)
+
+
+def get_int_arg(name, default=None):
+    """Returns a non-negative integer query parameter that fits an Integer column or aborts with 400"""
+    return query_args().integer(name, default)
+
+
+def paginate(results, limit, endpoint, **values):
+    """
+    Trims a page read with one extra row and returns it with its headers
+
+    When the extra row is there a Link header with rel="next" points at
+    the next page, keeping all the other query parameters of the request.
+    """
+    headers = {}
+    results, after = trim_page(results, limit)
+    if after is not None:
+        args = request.args.to_dict()
+        args.update(values, after=after, limit=limit)
+        next_url = url_for(endpoint, **args, _external=True)
+        headers["Link"] = f'<{next_url}>; rel="next"'
+    return results, headers
+
+
+def get_decimal_arg(name):
+    """Returns a non-negative decimal query parameter or aborts with 400"""
+    return query_args().decimal(name)
+
+
+def get_fields_args(model):
+    """
+    Returns the columns and collections a read request asks for
+
+    ?fields=id,name returns only those columns (and a collection such as
+    items only when it is listed too), ?include=items adds a collection to
+    a fieldset and ?exclude=items,email drops names from the response.
+    The columns are None when the full representation was asked for.
+    """
+    return model.parse_fields(
+        request.args.get("fields"),
+        request.args.get("include"),
+        request.args.get("exclude"),
+    )
+
+
+def fieldset_tag(columns, collections):
+    """Returns a short tag that identifies a sparse fieldset"""
+    return format(zlib.crc32(repr((columns, collections)).encode("utf-8")), "08x")
+
+
+def get_ids_arg(name):
+    """Returns a comma separated list of ids or aborts with 400"""
+    return query_args().ids(name)
+
+
+def get_limit_arg():
+    """Returns the requested page size capped at PAGE_SIZE_MAX"""
+    return query_args().limit()
+
+
+def get_batch_records(media_type):
+    """Returns the list of records in a JSON array or NDJSON request body"""
+    if media_type == "application/x-ndjson":
+        records = []
+        for number, line in enumerate(request.get_data(as_text=True).splitlines(), 1):
+            if not line.strip():
+                continue
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                abort(status.HTTP_400_BAD_REQUEST, f"Line {number} is not valid JSON.")
+    else:
+        records = request.get_json()
+        if not isinstance(records, list):
+            abort(status.HTTP_400_BAD_REQUEST, "Request body must be a JSON array.")
+
+    if len(records) > app.config["BATCH_MAX_SIZE"]:
+        abort(
+            status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            f"A batch can hold at most {app.config['BATCH_MAX_SIZE']} records.",
+        )
+    return records
+
+
+def deserialize_batch_supplier(data):
+    """
+    Returns a new Supplier from a record of a batch
+
+    Its items are checked like the rows of import-catalog, so a value the
+    item table cannot hold is reported instead of failing the INSERT.
+    """
+    supplier = Supplier().deserialize(data)
+    for position, (item, raw) in enumerate(zip(supplier.items, data["items"])):
+        try:
+            # the Supplier is new, its id is filled in by the relationship
+            values = clean_row({**raw, "supplier_id": 0})
+        except DataValidationError as error:
+            raise DataValidationError(f"Invalid Supplier: items[{position}] - {error}") from error
+        del values["supplier_id"]
+        for name, value in values.items():
+            setattr(item, name, value)
+    return supplier
+
+
+def check_content_type(*media_types):
+    """Checks that the media type is correct and returns it"""
     content_type = request.headers.get("Content-Type")
-    if content_type and content_type == media_type:
-        return
+    if content_type and content_type in media_types:
+        return content_type
     app.logger.error("Invalid Content-Type: %s", content_type)
     abort(
         status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
-        f"Content-Type must be {media_type}",
+        f"Content-Type must be {' or '.join(media_types)}",
     )
+    return None
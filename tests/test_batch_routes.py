@@ -0,0 +1,234 @@
+"""
+Test cases for creating Suppliers and Items in batches
+"""
+import json
+from decimal import Decimal
+from tests.factories import SupplierFactory, ItemFactory
+from tests.service_case import BASE_URL, ServiceTestCase
+from service.common import status  # HTTP Status Codes
+from service.models import Supplier, Item
+from service.routes import app
+
+
+######################################################################
+#  T E S T   C A S E S
+######################################################################
+class TestBatchRoutes(ServiceTestCase):
+    """Tests for the batch routes"""
+
+    ######################################################################
+    #  S U P P L I E R   B A T C H   T E S T   C A S E S
+    ######################################################################
+
+    def test_create_supplier_batch(self):
+        """It should Create a batch of Suppliers with their items"""
+        suppliers = SupplierFactory.build_batch(3)
+        batch = [supplier.serialize() for supplier in suppliers]
+        batch[0]["items"] = [ItemFactory(supplier=None).serialize() for _ in range(2)]
+        resp = self.client.post(f"{BASE_URL}/batch", json=batch)
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+        data = resp.get_json()
+        self.assertEqual(data["errors"], [])
+        self.assertEqual(len(data["ids"]), 3)
+
+        for supplier, supplier_id in zip(suppliers, data["ids"]):
+            resp = self.client.get(f"{BASE_URL}/{supplier_id}")
+            self.assertEqual(resp.status_code, status.HTTP_200_OK)
+            self.assertEqual(resp.get_json()["name"], supplier.name)
+        resp = self.client.get(f"{BASE_URL}/{data['ids'][0]}")
+        self.assertEqual(len(resp.get_json()["items"]), 2)
+
+    def test_create_supplier_batch_ndjson(self):
+        """It should Create a batch of Suppliers from NDJSON"""
+        suppliers = SupplierFactory.build_batch(2)
+        body = "\n".join(json.dumps(supplier.serialize()) for supplier in suppliers) + "\n\n"
+        resp = self.client.post(
+            f"{BASE_URL}/batch", data=body, content_type="application/x-ndjson"
+        )
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(resp.get_json()["ids"]), 2)
+
+    def test_create_supplier_batch_invalid(self):
+        """It should not Create any Suppliers when one in the batch is invalid"""
+        batch = [supplier.serialize() for supplier in SupplierFactory.build_batch(3)]
+        del batch[1]["name"]
+        batch[2] = "not a supplier"
+        batch.append({**batch[0], "date_joined": "2023-13-45"})
+        resp = self.client.post(f"{BASE_URL}/batch", json=batch)
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        data = resp.get_json()
+        self.assertEqual(data["ids"], [])
+        self.assertEqual([error["index"] for error in data["errors"]], [1, 2, 3])
+        self.assertIn("name", data["errors"][0]["message"])
+        self.assertIn("date_joined", data["errors"][2]["message"])
+        self.assertEqual(len(Supplier.all()), 0)
+
+    def test_create_supplier_batch_bad_columns(self):
+        """It should report Suppliers and items the tables cannot hold instead of failing the batch"""
+        batch = [supplier.serialize() for supplier in SupplierFactory.build_batch(5)]
+        batch[0]["items"] = [ItemFactory(supplier=None).serialize()]
+        batch[1]["items"] = [{**batch[0]["items"][0], "price": "abc", "quantity": "lots"}]
+        batch[2]["name"] = "X" * 500
+        batch[3]["email"] = 123
+        batch[4]["phone_number"] = "5" * 40
+        resp = self.client.post(f"{BASE_URL}/batch", json=batch)
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        data = resp.get_json()
+        self.assertEqual([error["index"] for error in data["errors"]], [1, 2, 3, 4])
+        self.assertIn("items[0]", data["errors"][0]["message"])
+        self.assertIn("name", data["errors"][1]["message"])
+        self.assertIn("email", data["errors"][2]["message"])
+        self.assertIn("phone_number", data["errors"][3]["message"])
+        self.assertEqual(len(Supplier.all()), 0)
+
+        # the valid Supplier goes in alone, with its item cleaned up
+        batch[0]["items"][0]["price"] = "12.5"
+        resp = self.client.post(f"{BASE_URL}/batch", json=batch[:1])
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+        items = Supplier.find(resp.get_json()["ids"][0]).items
+        self.assertEqual(items[0].price, Decimal("12.50"))
+
+    def test_create_supplier_batch_bad_body(self):
+        """It should not Create a batch that is not a list of records"""
+        resp = self.client.post(f"{BASE_URL}/batch", json={"name": "foo"})
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        resp = self.client.post(
+            f"{BASE_URL}/batch", data="{not json", content_type="application/x-ndjson"
+        )
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        resp = self.client.post(f"{BASE_URL}/batch", data="[]", content_type="text/csv")
+        self.assertEqual(resp.status_code, status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+
+    def test_create_supplier_batch_too_large(self):
+        """It should not Create a batch larger than BATCH_MAX_SIZE"""
+        batch_max_size = app.config["BATCH_MAX_SIZE"]
+        app.config["BATCH_MAX_SIZE"] = 2
+        try:
+            batch = [supplier.serialize() for supplier in SupplierFactory.build_batch(3)]
+            resp = self.client.post(f"{BASE_URL}/batch", json=batch)
+        finally:
+            app.config["BATCH_MAX_SIZE"] = batch_max_size
+        self.assertEqual(resp.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+    def test_create_supplier_batch_query_count(self):
+        """It should Create a batch with a few statements regardless of its size"""
+        batch = [supplier.serialize() for supplier in SupplierFactory.build_batch(20)]
+        for supplier in batch:
+            supplier["items"] = [ItemFactory(supplier=None).serialize() for _ in range(3)]
+        with self._count_queries() as statements:
+            resp = self.client.post(f"{BASE_URL}/batch", json=batch)
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+        inserts = [statement for statement in statements if statement.startswith("INSERT")]
+        self.assertLessEqual(len(inserts), 2)
+
+    ######################################################################
+    #  I T E M   B A T C H   T E S T   C A S E S
+    ######################################################################
+
+    def test_add_item_batch(self):
+        """It should Add a batch of Items to a Supplier with one INSERT"""
+        supplier = self._create_suppliers(1)[0]
+        resp = self.client.get(f"{BASE_URL}/{supplier.id}")
+        etag = resp.headers["ETag"]
+        items = ItemFactory.build_batch(5, supplier=None)
+        batch = [item.serialize() for item in items]
+        batch[0]["supplier_id"] = supplier.id + 1  # the URL wins
+        with self._count_queries() as statements:
+            resp = self.client.post(f"{BASE_URL}/{supplier.id}/items/batch", json=batch)
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+        data = resp.get_json()
+        self.assertEqual(data["errors"], [])
+        self.assertEqual(len(data["ids"]), 5)
+        inserts = [statement for statement in statements if statement.startswith("INSERT")]
+        self.assertEqual(len(inserts), 1)
+
+        # the cached Supplier is dropped and its version bumped
+        resp = self.client.get(f"{BASE_URL}/{supplier.id}")
+        self.assertNotEqual(resp.headers["ETag"], etag)
+        found = {item["id"]: item for item in resp.get_json()["items"]}
+        for item, item_id in zip(items, data["ids"]):
+            self.assertEqual(found[item_id]["sku"], item.sku)
+            self.assertEqual(found[item_id]["supplier_id"], supplier.id)
+
+    def test_add_item_batch_atomic(self):
+        """It should not Add any Items when one in an atomic batch is invalid"""
+        supplier = self._create_suppliers(1)[0]
+        batch = [item.serialize() for item in ItemFactory.build_batch(3, supplier=None)]
+        del batch[1]["sku"]
+        batch[2] = "not an item"
+        resp = self.client.post(f"{BASE_URL}/{supplier.id}/items/batch", json=batch)
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        data = resp.get_json()
+        self.assertEqual(data["ids"], [])
+        self.assertEqual([error["index"] for error in data["errors"]], [1, 2])
+        self.assertIn("sku", data["errors"][0]["message"])
+        self.assertEqual(len(Item.all()), 0)
+
+    def test_add_item_batch_best_effort(self):
+        """It should Add the valid Items of a best-effort batch"""
+        supplier = self._create_suppliers(1)[0]
+        items = ItemFactory.build_batch(6, supplier=None)
+        batch = [item.serialize() for item in items]
+        del batch[1]["price"]
+        batch[2]["price"] = "abc"
+        batch[3]["quantity"] = "x"
+        batch[4]["sku"] = "A" * 50
+        del batch[5]["supplier_id"]  # taken from the URL
+        batch[5]["price"] = 12.3
+        resp = self.client.post(
+            f"{BASE_URL}/{supplier.id}/items/batch",
+            query_string={"mode": "best-effort"},
+            data="\n".join(json.dumps(record, default=str) for record in batch),
+            content_type="application/x-ndjson",
+        )
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+        data = resp.get_json()
+        self.assertEqual(len(data["ids"]), 2)
+        self.assertEqual([error["index"] for error in data["errors"]], [1, 2, 3, 4])
+        self.assertIn("price", data["errors"][1]["message"])
+        self.assertIn("quantity", data["errors"][2]["message"])
+        self.assertIn("sku", data["errors"][3]["message"])
+        self.assertEqual(
+            [Item.find(item_id).sku for item_id in data["ids"]], [items[0].sku, items[5].sku]
+        )
+        self.assertEqual(Item.find(data["ids"][1]).price, Decimal("12.30"))
+
+        # nothing valid is still a bad request
+        resp = self.client.post(
+            f"{BASE_URL}/{supplier.id}/items/batch", query_string={"mode": "best-effort"}, json=[{}]
+        )
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_add_item_batch_bad_quantities(self):
+        """It should report quantities the item table cannot take as errors"""
+        supplier = self._create_suppliers(1)[0]
+        batch = [item.serialize() for item in ItemFactory.build_batch(3, supplier=None)]
+        batch[1]["quantity"] = "²"
+        batch[2]["quantity"] = 3000000000
+        for mode, code in (("atomic", status.HTTP_400_BAD_REQUEST), ("best-effort", status.HTTP_201_CREATED)):
+            resp = self.client.post(
+                f"{BASE_URL}/{supplier.id}/items/batch",
+                query_string={"mode": mode},
+                data=json.dumps(batch, default=str),
+                content_type="application/json",
+            )
+            self.assertEqual(resp.status_code, code, mode)
+            data = resp.get_json()
+            self.assertEqual([error["index"] for error in data["errors"]], [1, 2])
+            self.assertIn("quantity", data["errors"][1]["message"])
+        self.assertEqual(len(Item.all()), 1)
+
+    def test_add_item_batch_bad_requests(self):
+        """It should not Add a batch of Items with a bad mode or Supplier"""
+        supplier = self._create_suppliers(1)[0]
+        batch = [ItemFactory(supplier=None).serialize()]
+        resp = self.client.post(f"{BASE_URL}/0/items/batch", json=batch)
+        self.assertEqual(resp.status_code, status.HTTP_404_NOT_FOUND)
+        resp = self.client.post(
+            f"{BASE_URL}/{supplier.id}/items/batch", query_string={"mode": "some"}, json=batch
+        )
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        resp = self.client.post(f"{BASE_URL}/{supplier.id}/items/batch", json={"sku": "A1"})
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        resp = self.client.post(f"{BASE_URL}/{supplier.id}/items/batch", data="[]", content_type="text/csv")
+        self.assertEqual(resp.status_code, status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
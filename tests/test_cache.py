@@ -0,0 +1,141 @@
+"""
+Test cases for the read-through cache
+"""
+from unittest import TestCase
+from service.common.cache import Cache, LRUCache
+
+
+class FakeClock:  # pylint: disable=too-few-public-methods
+    """A clock that only moves when told to"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+######################################################################
+#  L R U   C A C H E   T E S T   C A S E S
+######################################################################
+class TestLRUCache(TestCase):
+    """Test Cases for the in-process LRU backend"""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.backend = LRUCache(max_size=2, ttl=10, clock=self.clock)
+
+    def test_set_and_get(self):
+        """It should return a value that was set"""
+        self.backend.set("a", {"id": 1})
+        self.assertEqual(self.backend.get("a"), {"id": 1})
+        self.assertIsNone(self.backend.get("b"))
+        self.assertEqual(len(self.backend), 1)
+
+    def test_evicts_least_recently_used(self):
+        """It should evict the least recently used key when full"""
+        self.backend.set("a", 1)
+        self.backend.set("b", 2)
+        self.backend.get("a")
+        self.backend.set("c", 3)
+        self.assertEqual(self.backend.get("a"), 1)
+        self.assertIsNone(self.backend.get("b"))
+        self.assertEqual(self.backend.get("c"), 3)
+
+    def test_expires_after_ttl(self):
+        """It should not return a value older than the ttl"""
+        self.backend.set("a", 1)
+        self.clock.now = 9.9
+        self.assertEqual(self.backend.get("a"), 1)
+        self.clock.now = 10.0
+        self.assertIsNone(self.backend.get("a"))
+        self.assertEqual(len(self.backend), 0)
+
+    def test_delete_and_clear(self):
+        """It should delete keys and clear everything"""
+        self.backend.set("a", 1)
+        self.backend.set("b", 2)
+        self.backend.delete("a", "missing")
+        self.assertIsNone(self.backend.get("a"))
+        self.backend.clear()
+        self.assertEqual(len(self.backend), 0)
+
+
+######################################################################
+#  C A C H E   T E S T   C A S E S
+######################################################################
+class TestCache(TestCase):
+    """Test Cases for the read-through Cache"""
+
+    def setUp(self):
+        self.cache = Cache(LRUCache(max_size=10, ttl=60))
+
+    def test_get_or_set(self):
+        """It should call the loader only on a miss"""
+        calls = []
+
+        def loader():
+            calls.append(1)
+            return {"id": 1}
+
+        self.assertEqual(self.cache.get_or_set("supplier:1", loader), {"id": 1})
+        self.assertEqual(self.cache.get_or_set("supplier:1", loader), {"id": 1})
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(self.cache.stats(), {"enabled": True, "hits": 1, "misses": 1, "coalesced": 0, "size": 1})
+
+    def test_not_found_is_not_cached(self):
+        """It should not cache a loader that returns None"""
+        self.assertIsNone(self.cache.get_or_set("supplier:1", lambda: None))
+        self.assertEqual(self.cache.stats()["size"], 0)
+
+    def test_invalidate(self):
+        """It should call the loader again after an invalidation"""
+        self.cache.get_or_set("supplier:1", lambda: 1)
+        self.cache.invalidate("supplier:1")
+        self.assertEqual(self.cache.get_or_set("supplier:1", lambda: 2), 2)
+
+    def test_invalidate_while_loading(self):
+        """It should not cache a value loaded while an invalidation happened"""
+
+        def loader():
+            self.cache.invalidate("supplier:1")
+            return "stale"
+
+        self.assertEqual(self.cache.get_or_set("supplier:1", loader), "stale")
+        self.assertEqual(self.cache.get_or_set("supplier:1", lambda: "fresh"), "fresh")
+
+    def test_fill_checks(self):
+        """It should not cache a value that a fill check turns down"""
+        self.cache.fill_checks.append(lambda key: key != "supplier:1")
+        self.assertEqual(self.cache.get_or_set("supplier:1", lambda: 1), 1)
+        self.assertEqual(self.cache.get_or_set("supplier:2", lambda: 2), 2)
+        self.assertEqual(self.cache.stats()["size"], 1)
+
+    def test_share_checks(self):
+        """It should load on its own when a share check turns down the load in flight"""
+        self.cache.share_checks.append(lambda key: False)
+        self.assertEqual(self.cache.get_or_set("supplier:1", lambda: 1), 1)
+        self.assertEqual(self.cache.flights.calls, 0)
+        self.assertEqual(self.cache.get_or_set("supplier:1", lambda: 2), 1)
+
+    def test_invalidation_listeners(self):
+        """It should tell the listeners about every invalidation"""
+        invalidated = []
+        self.cache.invalidation_listeners.append(invalidated.append)
+        self.cache.invalidate("supplier:1", "item:2")
+        self.assertEqual(invalidated, [("supplier:1", "item:2")])
+
+    def test_disabled(self):
+        """It should always call the loader when disabled"""
+        self.cache.enabled = False
+        self.cache.get_or_set("supplier:1", lambda: 1)
+        self.assertEqual(self.cache.get_or_set("supplier:1", lambda: 2), 2)
+        self.assertEqual(self.cache.stats()["hits"], 0)
+        self.assertEqual(self.cache.stats()["misses"], 0)
+
+    def test_clear(self):
+        """It should clear the keys and the counters"""
+        self.cache.get_or_set("supplier:1", lambda: 1)
+        self.cache.get_or_set("supplier:1", lambda: 1)
+        self.cache.clear()
+        self.assertEqual(self.cache.stats(), {"enabled": True, "hits": 0, "misses": 0, "coalesced": 0, "size": 0})
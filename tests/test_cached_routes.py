@@ -0,0 +1,134 @@
+"""
+Test cases for the cached reads of the routes
+"""
+import time
+import threading
+from unittest.mock import patch
+from sqlalchemy import event
+from tests.service_case import BASE_URL, ServiceTestCase
+from service.common import status  # HTTP Status Codes
+from service.common.cache import cache
+from service.models import db, Supplier, Item
+from service.routes import app
+
+
+######################################################################
+#  T E S T   C A S E S
+######################################################################
+class TestCachedRoutes(ServiceTestCase):
+    """Tests for reading Suppliers and Items through the cache"""
+
+    def test_get_supplier_is_cached(self):
+        """It should Read a Supplier from the cache the second time"""
+        supplier = self._create_suppliers(1)[0]
+        resp = self.client.get(f"{BASE_URL}/{supplier.id}")
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        with self._count_queries() as statements:
+            resp = self.client.get(f"{BASE_URL}/{supplier.id}")
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.get_json()["name"], supplier.name)
+        self.assertEqual(statements, [])
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_get_supplier_cache_disabled(self):
+        """It should Read a Supplier from the database when the cache is off"""
+        supplier = self._create_suppliers(1)[0]
+        cache.enabled = False
+        try:
+            self.client.get(f"{BASE_URL}/{supplier.id}")
+            with self._count_queries() as statements:
+                resp = self.client.get(f"{BASE_URL}/{supplier.id}")
+        finally:
+            cache.enabled = True
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(statements, [])
+        self.assertEqual(cache.stats()["hits"], 0)
+
+    def test_get_supplier_coalesced(self):
+        """It should run one query for concurrent reads of a Supplier"""
+        supplier = self._create_suppliers(1)[0]
+        cache.clear()
+        queries = []
+        loading = threading.Event()
+        release = threading.Event()
+        find = Supplier.find
+
+        def slow_find(*args, **kwargs):
+            loading.set()
+            release.wait(5)  # keep the load in flight until every request has joined it
+            return find(*args, **kwargs)
+
+        def count_queries(conn, cursor, statement, *args):  # pylint: disable=unused-argument
+            if "FROM supplier" in statement:
+                queries.append(statement)
+
+        responses = []
+
+        def read():
+            responses.append(app.test_client().get(f"{BASE_URL}/{supplier.id}"))
+
+        readers = [threading.Thread(target=read) for _ in range(8)]
+        event.listen(db.engine, "before_cursor_execute", count_queries)
+        try:
+            with patch.object(Supplier, "find", side_effect=slow_find):
+                readers[0].start()
+                loading.wait(5)
+                for reader in readers[1:]:
+                    reader.start()
+                deadline = time.time() + 5
+                while cache.flights.coalesced < len(readers) - 1 and time.time() < deadline:
+                    time.sleep(0.001)
+                release.set()
+                for reader in readers:
+                    reader.join(5)
+        finally:
+            event.remove(db.engine, "before_cursor_execute", count_queries)
+
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(cache.stats()["coalesced"], len(readers) - 1)
+        self.assertEqual([resp.status_code for resp in responses], [status.HTTP_200_OK] * len(readers))
+        self.assertTrue(all(resp.get_json() == responses[0].get_json() for resp in responses))
+
+    def test_add_item_invalidates_cached_supplier(self):
+        """It should not Read a stale Supplier after an item is added"""
+        supplier = self._create_suppliers(1)[0]
+        resp = self.client.get(f"{BASE_URL}/{supplier.id}")
+        self.assertEqual(resp.get_json()["items"], [])
+        self._create_items(supplier, 1)
+        resp = self.client.get(f"{BASE_URL}/{supplier.id}")
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(resp.get_json()["items"]), 1)
+
+    def test_update_item_invalidates_cached_item(self):
+        """It should not Read a stale Item after it is updated"""
+        supplier = self._create_suppliers(1)[0]
+        self._create_items(supplier, 1)
+        item = Supplier.find(supplier.id).items[0]
+        resp = self.client.get(f"{BASE_URL}/{supplier.id}/items/{item.id}")
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.client.get(f"{BASE_URL}/{supplier.id}")
+
+        item.name = "Renamed"
+        item.update()
+        resp = self.client.get(f"{BASE_URL}/{supplier.id}/items/{item.id}")
+        self.assertEqual(resp.get_json()["name"], "Renamed")
+        resp = self.client.get(f"{BASE_URL}/{supplier.id}")
+        self.assertEqual(resp.get_json()["items"][0]["name"], "Renamed")
+
+    def test_delete_supplier_invalidates_cached_items(self):
+        """It should drop the cached Items of a Supplier when it is deleted, and only then"""
+        supplier = self._create_suppliers(1)[0]
+        self._create_items(supplier, 1)
+        item_id = Supplier.find(supplier.id).items[0].id
+        self.client.get(f"{BASE_URL}/{supplier.id}/items/{item_id}")
+
+        supplier = Supplier.find(supplier.id)
+        supplier.name = "Renamed"
+        with self._count_queries() as statements:
+            supplier.update()
+        self.assertFalse([statement for statement in statements if "FROM item" in statement])
+        self.assertIsNotNone(cache.backend.get(Item.cache_key(item_id)))
+
+        Supplier.find(supplier.id).delete()
+        self.assertIsNone(cache.backend.get(Item.cache_key(item_id)))
@@ -4,20 +4,66 @@ CLI Command Extensions for Flask
 import os
 from unittest import TestCase
 from unittest.mock import patch, MagicMock
-from click.testing import CliRunner
-from service.common.cli_commands import db_create
+from service import app
+from service.common.cli_commands import db_create, db_init
 
 
 class TestFlaskCLI(TestCase):
     """Test Flask CLI Commands"""
 
     def setUp(self):
-        self.runner = CliRunner()
+        # the commands run in a context of the app, there is no global one
+        self.runner = app.test_cli_runner()
 
+    @patch('service.common.cli_commands.stamp')
     @patch('service.common.cli_commands.db')
-    def test_db_create(self, db_mock):
+    def test_db_create(self, db_mock, stamp_mock):
         """It should call the db-create command"""
         db_mock.return_value = MagicMock()
         with patch.dict(os.environ, {"FLASK_APP": "service:app"}, clear=True):
             result = self.runner.invoke(db_create)
             self.assertEqual(result.exit_code, 0)
+        stamp_mock.assert_called_once()
+
+    @patch('service.common.cli_commands.upgrade')
+    @patch('service.common.cli_commands.stamp')
+    @patch('service.common.cli_commands.inspect')
+    @patch('service.common.cli_commands.db')
+    def test_db_init_new_database(self, db_mock, inspect_mock, stamp_mock, upgrade_mock):
+        """It should create and stamp the tables of an empty database"""
+        inspect_mock.return_value.get_table_names.return_value = []
+        with patch.dict(os.environ, {"FLASK_APP": "service:app"}, clear=True):
+            result = self.runner.invoke(db_init)
+            self.assertEqual(result.exit_code, 0)
+        db_mock.create_all.assert_called_once()
+        stamp_mock.assert_called_once()
+        upgrade_mock.assert_not_called()
+
+    @patch('service.common.cli_commands.upgrade')
+    @patch('service.common.cli_commands.stamp')
+    @patch('service.common.cli_commands.inspect')
+    @patch('service.common.cli_commands.db')
+    def test_db_init_upgrade(self, db_mock, inspect_mock, stamp_mock, upgrade_mock):
+        """It should upgrade a versioned database"""
+        inspect_mock.return_value.get_table_names.return_value = ["alembic_version", "supplier", "item"]
+        with patch.dict(os.environ, {"FLASK_APP": "service:app"}, clear=True):
+            result = self.runner.invoke(db_init)
+            self.assertEqual(result.exit_code, 0)
+        upgrade_mock.assert_called_once()
+        db_mock.create_all.assert_not_called()
+        stamp_mock.assert_not_called()
+
+    @patch('service.common.cli_commands.upgrade')
+    @patch('service.common.cli_commands.stamp')
+    @patch('service.common.cli_commands.inspect')
+    @patch('service.common.cli_commands.db')
+    def test_db_init_unversioned(self, db_mock, inspect_mock, stamp_mock, upgrade_mock):
+        """It should refuse to guess the version of existing tables"""
+        inspect_mock.return_value.get_table_names.return_value = ["supplier", "item"]
+        with patch.dict(os.environ, {"FLASK_APP": "service:app"}, clear=True):
+            result = self.runner.invoke(db_init)
+            self.assertEqual(result.exit_code, 1)
+            self.assertIn("flask db stamp 0001", result.output)
+        db_mock.create_all.assert_not_called()
+        stamp_mock.assert_not_called()
+        upgrade_mock.assert_not_called()
@@ -0,0 +1,128 @@
+"""
+Test cases for the connection pool settings and metrics
+"""
+import sqlite3
+import threading
+from unittest import TestCase
+from sqlalchemy import exc
+from service import config
+from service.common.db_pool import MeteredQueuePool, engine_options, pool_stats
+
+
+def settings(uri, **overrides):
+    """Returns a Flask style config for a database URI"""
+    values = {name: getattr(config, name) for name in dir(config) if name.startswith("DB_")}
+    values["SQLALCHEMY_DATABASE_URI"] = uri
+    values.update(overrides)
+    return values
+
+
+######################################################################
+#  E N G I N E   O P T I O N S   T E S T   C A S E S
+######################################################################
+class TestEngineOptions(TestCase):
+    """Test Cases for building the engine options"""
+
+    def test_postgres_options(self):
+        """It should size and meter the pool of a Postgres database"""
+        options = engine_options(
+            settings(
+                "postgresql+psycopg://postgres@localhost/postgres",
+                DB_POOL_SIZE=7, DB_MAX_OVERFLOW=3, DB_POOL_TIMEOUT=2.5,
+                DB_POOL_RECYCLE=600, DB_POOL_PRE_PING=True, DB_STATEMENT_TIMEOUT=5000,
+            )
+        )
+        self.assertIs(options["poolclass"], MeteredQueuePool)
+        self.assertEqual(options["pool_size"], 7)
+        self.assertEqual(options["max_overflow"], 3)
+        self.assertEqual(options["pool_timeout"], 2.5)
+        self.assertEqual(options["pool_recycle"], 600)
+        self.assertTrue(options["pool_pre_ping"])
+        self.assertEqual(options["connect_args"], {"options": "-c statement_timeout=5000"})
+
+    def test_no_statement_timeout(self):
+        """It should not set a statement timeout unless one is configured"""
+        options = engine_options(
+            settings("postgresql+psycopg://postgres@localhost/postgres", DB_STATEMENT_TIMEOUT=0)
+        )
+        self.assertNotIn("connect_args", options)
+        options = engine_options(settings("sqlite:////tmp/test.db", DB_STATEMENT_TIMEOUT=5000))
+        self.assertIs(options["poolclass"], MeteredQueuePool)
+        self.assertNotIn("connect_args", options)
+
+    def test_sqlite_memory_options(self):
+        """It should not size the single connection of an in-memory database"""
+        options = engine_options(settings("sqlite://", DB_POOL_PRE_PING=False))
+        self.assertEqual(options, {"pool_pre_ping": False})
+
+
+######################################################################
+#  M E T E R E D   P O O L   T E S T   C A S E S
+######################################################################
+class TestMeteredQueuePool(TestCase):
+    """Test Cases for the pool metrics"""
+
+    def setUp(self):
+        self.pool = MeteredQueuePool(
+            lambda: sqlite3.connect(":memory:", check_same_thread=False),
+            pool_size=1, max_overflow=1, timeout=0.05,
+        )
+
+    def tearDown(self):
+        self.pool.dispose()
+
+    def test_counts_checkouts(self):
+        """It should count checkouts and report the connections in use"""
+        first = self.pool.connect()
+        second = self.pool.connect()
+        stats = self.pool.stats()
+        self.assertEqual(stats["checkouts"], 2)
+        self.assertEqual(stats["checked_out"], 2)
+        self.assertEqual(stats["overflow"], 1)
+        self.assertEqual(stats["checkout_failures"], 0)
+        self.assertGreaterEqual(stats["wait_ms_max"], 0)
+        first.close()
+        second.close()
+        stats = self.pool.stats()
+        self.assertEqual(stats["checked_out"], 0)
+        self.assertEqual(stats["checkouts"], 2)
+
+    def test_counts_timeouts(self):
+        """It should count a checkout that timed out and how long it waited"""
+        connections = [self.pool.connect(), self.pool.connect()]
+        self.assertRaises(exc.TimeoutError, self.pool.connect)
+        stats = self.pool.stats()
+        self.assertEqual(stats["checkout_failures"], 1)
+        self.assertEqual(stats["checkouts"], 2)
+        for connection in connections:
+            connection.close()
+
+    def test_counts_waits(self):
+        """It should include the time spent waiting for a free connection"""
+        connections = [self.pool.connect(), self.pool.connect()]
+        self.pool._timeout = 5  # pylint: disable=protected-access
+        threading.Timer(0.05, connections[0].close).start()
+        connection = self.pool.connect()
+        self.assertGreaterEqual(self.pool.stats()["wait_ms_max"], 40)
+        connection.close()
+        connections[1].close()
+
+    def test_recreate_keeps_metrics(self):
+        """It should keep the counters when the pool is recreated"""
+        self.pool.connect().close()
+        pool = self.pool.recreate()
+        self.assertIs(pool.metrics, self.pool.metrics)
+        self.assertEqual(pool.stats()["checkouts"], 1)
+        pool.dispose()
+
+    def test_pool_stats(self):
+        """It should report the pool of an engine with the process id"""
+
+        class Engine:  # pylint: disable=too-few-public-methods
+            """Just enough of an Engine"""
+            pool = self.pool
+
+        stats = pool_stats(Engine())
+        self.assertEqual(stats["pool"], "MeteredQueuePool")
+        self.assertIn("pid", stats)
+        self.assertIn("checked_out", stats)
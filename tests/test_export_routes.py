@@ -0,0 +1,72 @@
+"""
+Test cases for streaming the Suppliers export
+"""
+import json
+import tracemalloc
+from tests.service_case import BASE_URL, ServiceTestCase
+from service.common import status  # HTTP Status Codes
+from service.routes import app
+
+
+######################################################################
+#  T E S T   C A S E S
+######################################################################
+class TestExportRoutes(ServiceTestCase):
+    """Tests for GET /suppliers/export"""
+
+    ######################################################################
+    #  H E L P E R   M E T H O D S
+    ######################################################################
+
+    def _export_peak_memory(self):
+        """Streams the export and returns (lines, peak traced memory)"""
+        lines = 0
+        tracemalloc.start()
+        try:
+            resp = self.client.get(f"{BASE_URL}/export", buffered=False)
+            for chunk in resp.response:
+                lines += chunk.count(b"\n")
+            resp.close()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return lines, peak
+
+    ######################################################################
+    #  T E S T   C A S E S
+    ######################################################################
+
+    def test_export_suppliers(self):
+        """It should Export all Suppliers with their items as NDJSON"""
+        supplier_ids = self._seed_suppliers(5, items_per_supplier=2)
+        resp = self.client.get(f"{BASE_URL}/export")
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.mimetype, "application/x-ndjson")
+        suppliers = [json.loads(line) for line in resp.get_data(as_text=True).splitlines()]
+        self.assertEqual([supplier["id"] for supplier in suppliers], sorted(supplier_ids))
+        for supplier in suppliers:
+            self.assertEqual(len(supplier["items"]), 2)
+            self.assertEqual(supplier["items"][0]["supplier_id"], supplier["id"])
+
+    def test_export_suppliers_empty(self):
+        """It should Export nothing when there are no Suppliers"""
+        resp = self.client.get(f"{BASE_URL}/export")
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.get_data(), b"")
+
+    def test_export_suppliers_memory_is_bounded(self):
+        """It should Export Suppliers without memory growing with the row count"""
+        batch_size = app.config["EXPORT_BATCH_SIZE"]
+        app.config["EXPORT_BATCH_SIZE"] = 100
+        try:
+            self._seed_suppliers(500, items_per_supplier=3)
+            lines, small_peak = self._export_peak_memory()
+            self.assertEqual(lines, 500)
+
+            self._seed_suppliers(2500, items_per_supplier=3)
+            lines, large_peak = self._export_peak_memory()
+            self.assertEqual(lines, 3000)
+        finally:
+            app.config["EXPORT_BATCH_SIZE"] = batch_size
+        # six times the rows must not cost anywhere near six times the memory
+        self.assertLess(large_peak, small_peak * 2)
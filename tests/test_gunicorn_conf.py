@@ -0,0 +1,75 @@
+"""
+Test cases for the gunicorn configuration
+"""
+import os
+import runpy
+import tempfile
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+from service import app
+from service.models import db
+
+CONFIG_FILE = os.path.join(os.path.dirname(os.path.dirname(__file__)), "gunicorn.conf.py")
+
+
+def load_config(**env):
+    """Returns the settings of gunicorn.conf.py for some environment variables"""
+    with patch.dict(os.environ, env):
+        return runpy.run_path(CONFIG_FILE)
+
+
+######################################################################
+#  T E S T   C A S E S
+######################################################################
+class TestGunicornConfig(TestCase):
+    """Test Cases for gunicorn.conf.py"""
+
+    def test_defaults(self):
+        """It should preload sync workers that are recycled with jitter"""
+        settings = load_config(PORT="9000", GUNICORN_WORKERS="3")
+        self.assertEqual(settings["bind"], "0.0.0.0:9000")
+        self.assertEqual(settings["workers"], 3)
+        self.assertEqual(settings["worker_class"], "sync")
+        self.assertEqual(settings["threads"], 1)
+        self.assertTrue(settings["preload_app"])
+        self.assertGreater(settings["max_requests"], 0)
+        self.assertGreater(settings["max_requests_jitter"], 0)
+        self.assertGreater(settings["keepalive"], 0)
+
+    def test_worker_classes(self):
+        """It should take the worker class and threads from the environment"""
+        settings = load_config(GUNICORN_WORKER_CLASS="gthread", GUNICORN_THREADS="8")
+        self.assertEqual(settings["worker_class"], "gthread")
+        self.assertEqual(settings["threads"], 8)
+        settings = load_config(GUNICORN_WORKER_CLASS="gevent")
+        self.assertEqual(settings["worker_class"], "gevent")
+        self.assertFalse(settings["preload_app"])
+        settings = load_config(GUNICORN_WORKER_CLASS="gevent", GUNICORN_PRELOAD="true")
+        self.assertTrue(settings["preload_app"])
+        self.assertRaises(ValueError, load_config, GUNICORN_WORKER_CLASS="eventlet")
+
+    def test_post_fork_replaces_pool(self):
+        """It should give a forked worker a new connection pool"""
+        settings = load_config()
+        with app.app_context():
+            pool = db.engine.pool
+            with db.engine.connect():
+                pass  # the master opened a connection before forking
+        settings["post_fork"](MagicMock(), MagicMock())
+        with app.app_context():
+            self.assertIsNot(db.engine.pool, pool)
+            self.assertEqual(db.engine.pool.checkedin(), 0)
+
+    def test_metrics_hooks(self):
+        """It should clear and mark dead the metrics of the workers"""
+        with tempfile.TemporaryDirectory() as directory:
+            stale = os.path.join(directory, "counter_123.db")
+            with open(stale, "wb"):
+                pass
+            settings = load_config(PROMETHEUS_MULTIPROC_DIR=directory)
+            with patch.dict(os.environ, {"PROMETHEUS_MULTIPROC_DIR": directory}):
+                settings["on_starting"](MagicMock())
+                self.assertFalse(os.path.exists(stale))
+                with patch("prometheus_client.multiprocess.mark_process_dead") as mark_dead:
+                    settings["child_exit"](MagicMock(), MagicMock(pid=123))
+                    mark_dead.assert_called_once_with(123)
@@ -0,0 +1,72 @@
+"""
+Test cases for the JSON provider
+"""
+from datetime import date, datetime
+from decimal import Decimal
+from unittest import TestCase
+from flask import Flask
+from service.common import json_provider
+from service.common.json_provider import FastJSONProvider
+
+PAYLOAD = {
+    "name": "Shirt",
+    "price": Decimal("10.50"),
+    "date_joined": date(2023, 9, 1),
+    "updated": datetime(2023, 9, 1, 12, 30),
+    "items": [1, 2],
+}
+EXPECTED = {
+    "name": "Shirt",
+    "price": "10.50",
+    "date_joined": "2023-09-01",
+    "updated": "2023-09-01T12:30:00",
+    "items": [1, 2],
+}
+
+
+class TestFastJSONProvider(TestCase):
+    """Test Cases for FastJSONProvider"""
+
+    def setUp(self):
+        self.app = Flask(__name__)
+
+    def _provider(self, encoder):
+        """Returns a provider for an app configured with the encoder"""
+        self.app.config["JSON_ENCODER"] = encoder
+        return FastJSONProvider(self.app)
+
+    def test_auto_picks_fastest(self):
+        """It should pick the first available encoder by default"""
+        provider = self._provider("auto")
+        self.assertEqual(provider.encoder, next(iter(json_provider.ENCODERS)))
+
+    def test_unknown_encoder(self):
+        """It should not accept an encoder that is not available"""
+        self.assertRaises(ValueError, self._provider, "simdjson")
+
+    def test_encoders_agree(self):
+        """It should encode Decimal and dates the same with every encoder"""
+        for encoder in json_provider.ENCODERS:
+            provider = self._provider(encoder)
+            self.assertEqual(provider.loads(provider.dumps(PAYLOAD)), EXPECTED, encoder)
+
+    def test_sorted_compact_output(self):
+        """It should write sorted keys without whitespace"""
+        for encoder in json_provider.ENCODERS:
+            provider = self._provider(encoder)
+            self.assertEqual(provider.dumps({"b": 1, "a": [1, 2]}), '{"a":[1,2],"b":1}')
+
+    def test_response(self):
+        """It should build a JSON response"""
+        for encoder in json_provider.ENCODERS:
+            provider = self._provider(encoder)
+            with self.app.app_context():
+                resp = provider.response(PAYLOAD)
+            self.assertEqual(resp.mimetype, "application/json")
+            self.assertEqual(provider.loads(resp.get_data()), EXPECTED)
+
+    def test_unsupported_type(self):
+        """It should not encode objects it doesn't know"""
+        for encoder in json_provider.ENCODERS:
+            provider = self._provider(encoder)
+            self.assertRaises(TypeError, provider.dumps, {"value": object()})
@@ -0,0 +1,265 @@
+"""
+Test cases for listing, looking up and searching Suppliers and Items
+"""
+import re
+from tests.service_case import BASE_URL, ServiceTestCase
+from service.common import status  # HTTP Status Codes
+from service.routes import app
+
+
+######################################################################
+#  T E S T   C A S E S
+######################################################################
+class TestListRoutes(ServiceTestCase):
+    """Tests for the list and search routes"""
+
+    ######################################################################
+    #  S U P P L I E R   L I S T   T E S T   C A S E S
+    ######################################################################
+
+    def test_list_suppliers(self):
+        """It should List Suppliers"""
+        self._create_suppliers(5)
+        resp = self.client.get(BASE_URL)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        data = resp.get_json()
+        self.assertEqual(len(data), 5)
+        self.assertIsNone(resp.headers.get("Link"))
+
+    def test_list_suppliers_fields(self):
+        """It should List only the requested fields of Suppliers page by page"""
+        suppliers = self._create_suppliers(3)
+        self._create_items(suppliers[0], 1)
+        resp = self.client.get(BASE_URL, query_string={"fields": "name", "limit": 2})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        data = resp.get_json()
+        self.assertEqual([sorted(supplier) for supplier in data], [["id", "name"]] * 2)
+        # the next page keeps the fieldset
+        next_url = re.match(r'<([^>]+)>; rel="next"', resp.headers["Link"]).group(1)
+        self.assertIn("fields=name", next_url)
+        resp = self.client.get(next_url)
+        self.assertEqual([sorted(supplier) for supplier in resp.get_json()], [["id", "name"]])
+
+    def test_list_suppliers_by_name(self):
+        """It should List Suppliers filtered by name"""
+        suppliers = self._create_suppliers(3)
+        resp = self.client.get(BASE_URL, query_string={"name": suppliers[1].name})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        data = resp.get_json()
+        self.assertEqual(len(data), 1)
+        self.assertEqual(data[0]["id"], suppliers[1].id)
+
+    def test_list_suppliers_pages(self):
+        """It should List Suppliers one keyset page at a time"""
+        suppliers = self._create_suppliers(5)
+        expected = sorted(supplier.id for supplier in suppliers)
+
+        resp = self.client.get(BASE_URL, query_string={"limit": 2})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        seen = [supplier["id"] for supplier in resp.get_json()]
+        self.assertEqual(seen, expected[:2])
+
+        # follow the next links until they run out
+        while resp.headers.get("Link"):
+            next_url = re.match(r'<([^>]+)>; rel="next"', resp.headers["Link"]).group(1)
+            resp = self.client.get(next_url)
+            self.assertEqual(resp.status_code, status.HTTP_200_OK)
+            seen.extend(supplier["id"] for supplier in resp.get_json())
+        self.assertEqual(seen, expected)
+
+    def test_list_suppliers_after(self):
+        """It should List Suppliers after a given id"""
+        suppliers = self._create_suppliers(3)
+        first_id = min(supplier.id for supplier in suppliers)
+        resp = self.client.get(BASE_URL, query_string={"after": first_id})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        data = resp.get_json()
+        self.assertEqual(len(data), 2)
+        self.assertTrue(all(supplier["id"] > first_id for supplier in data))
+
+    def test_list_suppliers_limit_is_capped(self):
+        """It should not return more than PAGE_SIZE_MAX Suppliers"""
+        self._create_suppliers(3)
+        page_size_max = app.config["PAGE_SIZE_MAX"]
+        app.config["PAGE_SIZE_MAX"] = 2
+        try:
+            resp = self.client.get(BASE_URL, query_string={"limit": 1000})
+        finally:
+            app.config["PAGE_SIZE_MAX"] = page_size_max
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(resp.get_json()), 2)
+        self.assertIn('rel="next"', resp.headers.get("Link"))
+
+    def test_list_suppliers_bad_paging(self):
+        """It should not List Suppliers with bad paging parameters"""
+        too_big = "99999999999999999999999"  # more than an Integer column holds
+        for query in ({"after": "abc"}, {"after": -1}, {"after": too_big}, {"limit": 0}, {"limit": "x"}):
+            resp = self.client.get(BASE_URL, query_string=query)
+            self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_lookup_suppliers_by_ids(self):
+        """It should Read many Suppliers by id in request order"""
+        suppliers = self._create_suppliers(3)
+        self._create_items(suppliers[0], 2)
+        ids = [suppliers[2].id, 0, suppliers[0].id, suppliers[2].id]
+        resp = self.client.get(BASE_URL, query_string={"ids": ",".join(map(str, ids))})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        data = resp.get_json()
+        self.assertEqual([supplier["id"] for supplier in data], ids)
+        self.assertEqual(data[0]["name"], suppliers[2].name)
+        self.assertEqual(data[1]["status"], status.HTTP_404_NOT_FOUND)
+        self.assertEqual(data[1]["error"], "Not Found")
+        self.assertNotIn("status", data[2])
+        self.assertEqual(len(data[2]["items"]), 2)
+
+    def test_lookup_suppliers_fields(self):
+        """It should Read only the requested fields of many Suppliers"""
+        suppliers = self._create_suppliers(2)
+        self._create_items(suppliers[1], 1)
+        ids = f"{suppliers[1].id},0"
+        resp = self.client.get(
+            BASE_URL, query_string={"ids": ids, "fields": "email", "include": "items"}
+        )
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        data = resp.get_json()
+        self.assertEqual(data[0]["email"], suppliers[1].email)
+        self.assertEqual(len(data[0]["items"]), 1)
+        self.assertNotIn("name", data[0])
+        self.assertEqual(data[1]["status"], status.HTTP_404_NOT_FOUND)
+
+    def test_lookup_suppliers_bad_ids(self):
+        """It should not Read Suppliers with a bad list of ids"""
+        for ids in ("", "1,x", "1,,2", "1,99999999999999999999999"):
+            resp = self.client.get(BASE_URL, query_string={"ids": ids})
+            self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+
+        batch_max_size = app.config["BATCH_MAX_SIZE"]
+        app.config["BATCH_MAX_SIZE"] = 2
+        try:
+            resp = self.client.get(BASE_URL, query_string={"ids": "1,2,3"})
+        finally:
+            app.config["BATCH_MAX_SIZE"] = batch_max_size
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+
+    ######################################################################
+    #  I T E M   L I S T   T E S T   C A S E S
+    ######################################################################
+
+    def test_list_items(self):
+        """It should List the Items of a Supplier one page at a time"""
+        suppliers = self._create_suppliers(2)
+        self._create_items(suppliers[0], 5)
+        self._create_items(suppliers[1], 1)
+
+        resp = self.client.get(f"{BASE_URL}/{suppliers[0].id}/items", query_string={"limit": 2})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        items = resp.get_json()
+        while resp.headers.get("Link"):
+            next_url = re.match(r'<([^>]+)>; rel="next"', resp.headers["Link"]).group(1)
+            resp = self.client.get(next_url)
+            items.extend(resp.get_json())
+        self.assertEqual(len(items), 5)
+        self.assertTrue(all(item["supplier_id"] == suppliers[0].id for item in items))
+        ids = [item["id"] for item in items]
+        self.assertEqual(ids, sorted(ids))
+
+    def test_list_items_filters(self):
+        """It should List the Items of a Supplier that match the filters"""
+        supplier = self._create_suppliers(1)[0]
+        self._add_items(
+            supplier,
+            [
+                ("ABC0001", "Shirt", 10, "5.00"),
+                ("ABC0002", "Pants", 100, "20.00"),
+                ("ABD0003", "Shirt", 500, "50.00"),
+                ("A_C0004", "Hat", 1000, "75.00"),
+            ],
+        )
+        url = f"{BASE_URL}/{supplier.id}/items"
+        queries = [
+            ({"sku": "ABC"}, ["ABC0001", "ABC0002"]),
+            ({"sku": "A_C"}, ["A_C0004"]),
+            ({"name": "Shirt"}, ["ABC0001", "ABD0003"]),
+            ({"min_price": "20", "max_price": "50.00"}, ["ABC0002", "ABD0003"]),
+            ({"min_quantity": 100, "max_quantity": 500}, ["ABC0002", "ABD0003"]),
+            ({"sku": "AB", "name": "Shirt", "max_price": "10"}, ["ABC0001"]),
+        ]
+        for query, skus in queries:
+            resp = self.client.get(url, query_string=query)
+            self.assertEqual(resp.status_code, status.HTTP_200_OK)
+            self.assertEqual([item["sku"] for item in resp.get_json()], skus, query)
+
+    def test_list_items_fields(self):
+        """It should List only the requested fields of Items"""
+        supplier = self._create_suppliers(1)[0]
+        self._create_items(supplier, 3)
+        resp = self.client.get(
+            f"{BASE_URL}/{supplier.id}/items", query_string={"fields": "sku", "limit": 2}
+        )
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual([sorted(item) for item in resp.get_json()], [["id", "sku"]] * 2)
+        self.assertIn("fields=sku", resp.headers["Link"])
+
+    def test_list_items_bad_filters(self):
+        """It should not List Items with bad filters"""
+        supplier = self._create_suppliers(1)[0]
+        url = f"{BASE_URL}/{supplier.id}/items"
+        for query in ({"min_price": "cheap"}, {"max_price": "-1"}, {"min_price": "NaN"},
+                      {"min_quantity": "x"}, {"max_quantity": "9" * 23}, {"fields": "color"}):
+            resp = self.client.get(url, query_string=query)
+            self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST, query)
+
+    def test_list_items_supplier_not_found(self):
+        """It should not List the Items of a Supplier that is not found"""
+        resp = self.client.get(f"{BASE_URL}/0/items")
+        self.assertEqual(resp.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_search_items_by_sku(self):
+        """It should List the Items with a sku from every Supplier, cheapest first"""
+        suppliers = self._create_suppliers(3)
+        self._add_items(suppliers[0], [("SKU0001", "Shirt", 10, "9.50"), ("SKU0002", "Hat", 1, "3.00")])
+        self._add_items(suppliers[1], [("SKU0001", "Shirt", 100, "7.25")])
+        self._add_items(suppliers[2], [("SKU0001", "Shirt", 1, "12.00")])
+
+        resp = self.client.get("/items", query_string={"sku": "SKU0001"})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        data = resp.get_json()
+        self.assertEqual([item["price"] for item in data], ["7.25", "9.50", "12.00"])
+        self.assertEqual(data[0]["supplier_id"], suppliers[1].id)
+
+        resp = self.client.get("/items", query_string={"sku": "SKU0001", "limit": 1})
+        self.assertEqual(len(resp.get_json()), 1)
+        resp = self.client.get("/items", query_string={"sku": "SKU"})
+        self.assertEqual(resp.get_json(), [])
+        resp = self.client.get("/items")
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_get_best_price(self):
+        """It should find the cheapest Supplier of a sku for an order quantity"""
+        suppliers = self._create_suppliers(3)
+        self._add_items(suppliers[0], [("SKU0001", "Shirt", 10, "9.50")])
+        self._add_items(suppliers[1], [("SKU0001", "Shirt", 100, "7.25")])
+        self._add_items(suppliers[2], [("SKU0001", "Shirt", 1, "12.00")])
+        expected = [(1, suppliers[2].id), (10, suppliers[0].id), (99, suppliers[0].id),
+                    (100, suppliers[1].id), (5000, suppliers[1].id)]
+        for qty, supplier_id in expected:
+            resp = self.client.get("/items/best-price", query_string={"sku": "SKU0001", "qty": qty})
+            self.assertEqual(resp.status_code, status.HTTP_200_OK)
+            self.assertEqual(resp.get_json()["supplier_id"], supplier_id, qty)
+
+    def test_get_best_price_bad_request(self):
+        """It should not find a best price without a sku and quantity"""
+        supplier = self._create_suppliers(1)[0]
+        self._add_items(supplier, [("SKU0001", "Shirt", 10, "9.50")])
+        too_big = "99999999999999999999999"
+        for query in (
+            {"sku": "SKU0001"},
+            {"qty": 10},
+            {"sku": "SKU0001", "qty": "-1"},
+            {"sku": "SKU0001", "qty": too_big},
+        ):
+            resp = self.client.get("/items/best-price", query_string=query)
+            self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST, query)
+        for query in ({"sku": "SKU0001", "qty": 9}, {"sku": "NOPE", "qty": 10}):
+            resp = self.client.get("/items/best-price", query_string=query)
+            self.assertEqual(resp.status_code, status.HTTP_404_NOT_FOUND, query)
@@ -0,0 +1,65 @@
+"""
+Test cases for the schema migrations
+
+The migrations are run against a scratch SQLite database so they can be
+checked without touching the service database.
+"""
+import os
+import logging
+import tempfile
+from unittest import TestCase
+from flask import Flask
+from flask_migrate import upgrade, downgrade
+from sqlalchemy import inspect
+from service.models import db, migrate
+
+
+class TestMigrations(TestCase):
+    """Test Cases for the Alembic migrations"""
+
+    def setUp(self):
+        handle, self.db_file = tempfile.mkstemp(suffix=".db")
+        os.close(handle)
+        self.app = Flask(__name__)
+        self.app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{self.db_file}"
+        self.app.logger.setLevel(logging.CRITICAL)
+        db.init_app(self.app)
+        migrate.init_app(self.app, db)
+
+    def tearDown(self):
+        os.remove(self.db_file)
+
+    def _indexes(self, table):
+        """Returns the index names of a table"""
+        return {index["name"] for index in inspect(db.engine).get_indexes(table)}
+
+    def test_upgrade_matches_models(self):
+        """It should migrate an empty database to the schema of the models"""
+        with self.app.app_context():
+            upgrade()
+            inspector = inspect(db.engine)
+            for table in db.metadata.sorted_tables:
+                columns = {column["name"] for column in inspector.get_columns(table.name)}
+                self.assertEqual(columns, set(table.columns.keys()))
+                expected = {index.name for index in table.indexes}
+                self.assertEqual(self._indexes(table.name), expected)
+
+    def test_upgrade_from_initial_schema(self):
+        """It should add the lookup indexes to a database from the initial schema"""
+        with self.app.app_context():
+            upgrade(revision="0001")
+            self.assertEqual(self._indexes("item"), set())
+            upgrade()
+            for table in db.metadata.sorted_tables:
+                expected = {index.name for index in table.indexes}
+                self.assertEqual(self._indexes(table.name), expected)
+
+    def test_downgrade(self):
+        """It should downgrade back to the initial schema"""
+        with self.app.app_context():
+            upgrade()
+            downgrade(revision="0001")
+            columns = {column["name"] for column in inspect(db.engine).get_columns("supplier")}
+            self.assertNotIn("version", columns)
+            self.assertEqual(self._indexes("supplier"), set())
+            self.assertEqual(self._indexes("item"), set())
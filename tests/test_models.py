@@ -28,10 +28,16 @@ class TestSupplier(unittest.TestCase):
         app.config["SQLALCHEMY_DATABASE_URI"] = DATABASE_URI
         app.logger.setLevel(logging.CRITICAL)
         Supplier.init_db(app)
+        # the service no longer pushes a context or creates the tables itself
+        cls.app_context = app.app_context()
+        cls.app_context.push()
+        db.create_all()
 
     @classmethod
     def tearDownClass(cls):
         """This runs once after the entire test suite"""
+        db.session.remove()
+        cls.app_context.pop()
 
     def setUp(self):
         """This runs before each test"""
@@ -0,0 +1,191 @@
+"""
+Test cases for routing reads to replicas
+
+A primary and two replicas are SQLite files that each hold a Supplier
+with id 1 named after the database, so every read shows where it went.
+A third replica lives in a folder that does not exist and is always down.
+"""
+import os
+import time
+import logging
+import tempfile
+import threading
+from unittest import TestCase
+from flask import Flask
+from service import config
+from service.common.cache import cache
+from service.common.replicas import STICKY_COOKIE
+from service.models import db, Supplier, init_db
+from tests.factories import SupplierFactory
+
+
+######################################################################
+#  T E S T   C A S E S
+######################################################################
+class TestReplicas(TestCase):
+    """Tests for the replica routing of db.session"""
+
+    @classmethod
+    def setUpClass(cls):
+        """Creates an app with a primary and three replicas"""
+        # removed in tearDownClass()
+        cls.directory = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        path = cls.directory.name
+        cls.app = Flask(__name__)
+        cls.app.config.from_object(config)
+        cls.app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{path}/primary.db"
+        cls.app.config["DATABASE_REPLICA_URIS"] = [
+            f"sqlite:///{path}/replica0.db",
+            f"sqlite:///{path}/replica1.db",
+            f"sqlite:///{path}/missing/replica2.db",
+        ]
+        cls.app.logger.setLevel(logging.CRITICAL)
+        init_db(cls.app)
+        cls.replicas = cls.app.extensions["replicas"]
+        with cls.app.app_context():
+            engines = {"primary": db.engine}
+        engines.update((replica.key, replica.engine) for replica in cls.replicas.replicas[:2])
+        for name, engine in engines.items():
+            db.metadata.create_all(engine)
+            supplier = SupplierFactory.build(id=1, name=name, version=1)
+            row = {column.name: getattr(supplier, column.name) for column in Supplier.__table__.columns}
+            with engine.begin() as connection:
+                connection.execute(Supplier.__table__.insert(), row)
+
+    @classmethod
+    def tearDownClass(cls):
+        """Closes the databases"""
+        with cls.app.app_context():
+            db.engine.dispose()
+        cls.replicas.dispose()
+        cls.directory.cleanup()
+
+    def setUp(self):
+        """Runs before each test"""
+        cache.clear()
+        self.replicas.invalidated.clear()
+        for replica in self.replicas.replicas:
+            replica.healthy = True
+            replica.check_at = 0.0
+
+    def _read(self, method="GET", **kwargs):
+        """Returns the name of the Supplier read in a request"""
+        with self.app.test_request_context("/suppliers/1", method=method, **kwargs):
+            self.app.preprocess_request()
+            return Supplier.find(1).name
+
+    def test_round_robin(self):
+        """It should spread the reads of GET requests over the healthy replicas"""
+        names = [self._read() for _ in range(4)]
+        self.assertEqual(sorted(names), ["replica0", "replica0", "replica1", "replica1"])
+        self.assertEqual(self._read("HEAD")[:7], "replica")
+        stats = self.replicas.stats()
+        self.assertFalse(stats["replicas"]["replica2"]["healthy"])
+        self.assertEqual(stats["replicas"]["replica2"]["requests"], 0)
+
+    def test_writes_on_primary(self):
+        """It should read from the primary in requests that are not reads"""
+        self.assertEqual(self._read("POST"), "primary")
+        self.assertEqual(self._read("DELETE"), "primary")
+        with self.app.app_context():
+            self.assertEqual(Supplier.find(1).name, "primary")
+
+    def test_read_your_writes(self):
+        """It should read from the primary after a write"""
+        with self.app.test_request_context("/suppliers", method="GET"):
+            self.app.preprocess_request()
+            supplier = SupplierFactory(id=None, items=[])
+            supplier.create()
+            # the refresh after the commit must see the new row
+            self.assertEqual(Supplier.find(supplier.id).name, supplier.name)
+            response = self.app.process_response(self.app.response_class())
+        self.assertIn(STICKY_COOKIE, response.headers["Set-Cookie"])
+
+        # the client with the cookie reads from the primary, the others do not
+        self.assertEqual(self._read(headers={"Cookie": f"{STICKY_COOKIE}=1"}), "primary")
+        self.assertNotEqual(self._read(), "primary")
+        with self.app.app_context():
+            Supplier.find(supplier.id).delete()
+
+    def test_fallback_to_primary(self):
+        """It should read from the primary when every replica is down"""
+        for replica in self.replicas.replicas:
+            replica.mark_down()
+        primary_requests = self.replicas.stats()["primary_requests"]
+        self.assertEqual(self._read(), "primary")
+        self.assertEqual(self.replicas.stats()["primary_requests"], primary_requests + 1)
+
+    def test_health_checks(self):
+        """It should check a replica that is down again after REPLICA_CHECK_INTERVAL"""
+        replica = self.replicas.replicas[0]
+        replica.mark_down()
+        self.assertGreater(replica.check_at, time.monotonic())
+        self.assertNotIn("replica0", [self._read() for _ in range(3)])
+        replica.check_at = 0.0
+        self.assertIn("replica0", [self._read() for _ in range(3)])
+        self.assertTrue(replica.healthy)
+
+    def test_missing_replica(self):
+        """It should find a replica that cannot be reached unhealthy"""
+        replica = self.replicas.replicas[2]
+        self.assertFalse(replica.is_healthy(time.monotonic()))
+        self.assertFalse(os.path.exists(os.path.join(self.directory.name, "missing")))
+
+    def _cached_read(self, method="GET"):
+        """Reads the Supplier through the cache and returns whether it was stored"""
+        with self.app.test_request_context("/suppliers/1", method=method):
+            self.app.preprocess_request()
+            cache.get_or_set(Supplier.cache_key(1), lambda: Supplier.find(1).name)
+        return cache.backend.get(Supplier.cache_key(1)) is not None
+
+    def _invalidate(self):
+        """Invalidates the cached Supplier the way a commit in the app does"""
+        with self.app.app_context():
+            cache.invalidate(Supplier.cache_key(1))
+
+    def test_cache_fills(self):
+        """It should not cache a replica read of a record that was just invalidated"""
+        self.assertTrue(self._cached_read())
+        self._invalidate()
+        self.assertFalse(self._cached_read())
+        self.assertTrue(self._cached_read("POST"))  # read from the primary
+
+        self._invalidate()
+        sticky_seconds = self.replicas.sticky_seconds
+        self.replicas.sticky_seconds = 0.001
+        try:
+            time.sleep(0.002)
+            self.assertTrue(self._cached_read())
+        finally:
+            self.replicas.sticky_seconds = sticky_seconds
+
+    def test_sticky_reads_load_alone(self):
+        """It should not let a client that reads the primary share a load from a replica"""
+        loading = threading.Event()
+        release = threading.Event()
+        names = {}
+
+        def slow_read():
+            name = Supplier.find(1).name
+            loading.set()
+            release.wait(5)  # keep the load in flight while the sticky client reads
+            return name
+
+        def replica_read():
+            with self.app.test_request_context("/suppliers/1"):
+                self.app.preprocess_request()
+                names["replica"] = cache.get_or_set(Supplier.cache_key(1), slow_read)
+
+        reader = threading.Thread(target=replica_read)
+        reader.start()
+        try:
+            loading.wait(5)
+            with self.app.test_request_context("/suppliers/1", headers={"Cookie": f"{STICKY_COOKIE}=1"}):
+                self.app.preprocess_request()
+                names["sticky"] = cache.get_or_set(Supplier.cache_key(1), lambda: Supplier.find(1).name)
+        finally:
+            release.set()
+            reader.join(5)
+        self.assertEqual(names["sticky"], "primary")
+        self.assertTrue(names["replica"].startswith("replica"))
+        self.assertEqual(cache.flights.coalesced, 0)
@@ -0,0 +1,141 @@
+"""
+Test cases for the SQL statements the routes run
+"""
+from tests.factories import SupplierFactory, ItemFactory
+from tests.service_case import BASE_URL, ServiceTestCase
+from service.common import status  # HTTP Status Codes
+from service.common.cache import cache
+from service.models import db, Supplier
+from service.routes import app
+
+
+######################################################################
+#  T E S T   C A S E S
+######################################################################
+class TestRouteQueries(ServiceTestCase):
+    """Tests for the query counts and statement logging of the routes"""
+
+    def test_route_query_budgets(self):
+        """It should run at most a fixed number of SQL statements on every route"""
+        suppliers = self._create_suppliers(3)
+        supplier_id = suppliers[0].id
+        self._add_items(suppliers[0], [("SKU0001", "Shirt", 10, "9.50"), ("SKU0002", "Hat", 1, "3.00")])
+        self._add_items(suppliers[1], [("SKU0001", "Shirt", 100, "7.25")])
+        item_id = Supplier.find(supplier_id).items[0].id
+        ids = ",".join(str(supplier.id) for supplier in suppliers)
+        budgets = [
+            (0, "GET", "/"),
+            (2, "GET", BASE_URL),
+            (2, "GET", f"{BASE_URL}?ids={ids}"),
+            (1, "GET", f"{BASE_URL}?fields=name"),
+            (2, "GET", f"{BASE_URL}?fields=name,items"),
+            (1, "GET", f"{BASE_URL}/{supplier_id}"),
+            (1, "GET", f"{BASE_URL}/{supplier_id}?fields=name"),
+            (2, "GET", f"{BASE_URL}/{supplier_id}/items"),
+            (2, "GET", f"{BASE_URL}/{supplier_id}/items?fields=sku"),
+            (1, "GET", f"{BASE_URL}/{supplier_id}/items/{item_id}"),
+            (1, "GET", "/items?sku=SKU0001"),
+            (1, "GET", "/items/best-price?sku=SKU0001&qty=10"),
+        ]
+        for limit, method, url in budgets:
+            cache.clear()
+            resp = self._assert_max_queries(limit, method, url)
+            self.assertEqual(resp.status_code, status.HTTP_200_OK, url)
+
+        supplier = SupplierFactory()
+        self._assert_max_queries(3, "POST", BASE_URL, json=supplier.serialize())
+        item = ItemFactory()
+        self._assert_max_queries(4, "POST", f"{BASE_URL}/{supplier_id}/items", json=item.serialize())
+        batch = [SupplierFactory().serialize() for _ in range(10)]
+        self._assert_max_queries(1, "POST", f"{BASE_URL}/batch", json=batch)
+
+    def test_db_stats_header(self):
+        """It should only report the statements of a request when asked to"""
+        resp = self.client.get(BASE_URL)
+        self.assertNotIn("X-DB-Stats", resp.headers)
+        app.config["DB_STATS_HEADER"] = True
+        try:
+            resp = self.client.get(BASE_URL)
+        finally:
+            app.config["DB_STATS_HEADER"] = False
+        self.assertRegex(resp.headers["X-DB-Stats"], r"^count=1; time_ms=\d+\.\d{3}$")
+
+    def test_slow_query_log(self):
+        """It should log slow statements with their parameters and route"""
+        supplier = self._create_suppliers(1)[0]
+        threshold = app.config["DB_SLOW_QUERY_MS"]
+        app.config["DB_SLOW_QUERY_MS"] = 0.000001
+        try:
+            with self.assertLogs("flask.app", level="WARNING") as logs:
+                self.client.get(f"{BASE_URL}/{supplier.id}")
+        finally:
+            app.config["DB_SLOW_QUERY_MS"] = threshold
+        slow = [line for line in logs.output if "Slow query" in line]
+        self.assertEqual(len(slow), 1)
+        self.assertIn(f"GET {BASE_URL}/{supplier.id} (get_suppliers)", slow[0])
+        self.assertIn("SELECT", slow[0])
+        self.assertIn(f"parameters=({supplier.id},", slow[0])
+
+        with self.assertNoLogs("flask.app", level="WARNING"):
+            self.client.get(BASE_URL)
+
+    def test_list_suppliers_query_count(self):
+        """It should List Suppliers with the same number of queries for any page size"""
+        for supplier in self._create_suppliers(2):
+            self._create_items(supplier, 2)
+        db.session.expire_all()
+        with self._count_queries() as statements:
+            resp = self.client.get(BASE_URL)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(resp.get_json()), 2)
+        few_suppliers = len(statements)
+
+        for supplier in self._create_suppliers(8):
+            self._create_items(supplier, 2)
+        db.session.expire_all()
+        with self._count_queries() as statements:
+            resp = self.client.get(BASE_URL)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(resp.get_json()), 10)
+        self.assertEqual(len(statements), few_suppliers)
+
+    def test_get_supplier_query_count(self):
+        """It should Read a Supplier with the same number of queries for any number of items"""
+        supplier = self._create_suppliers(1)[0]
+        self._create_items(supplier, 1)
+        db.session.expire_all()
+        with self._count_queries() as statements:
+            resp = self.client.get(f"{BASE_URL}/{supplier.id}")
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(resp.get_json()["items"]), 1)
+        one_item = len(statements)
+
+        self._create_items(supplier, 9)
+        db.session.expire_all()
+        with self._count_queries() as statements:
+            resp = self.client.get(f"{BASE_URL}/{supplier.id}")
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(resp.get_json()["items"]), 10)
+        self.assertEqual(len(statements), one_item)
+
+    def test_lookup_suppliers_query_count(self):
+        """It should Read many Suppliers with one query for suppliers and one for items"""
+        suppliers = self._create_suppliers(10)
+        for supplier in suppliers:
+            self._create_items(supplier, 2)
+        db.session.expire_all()
+        ids = ",".join(str(supplier.id) for supplier in suppliers)
+        with self._count_queries() as statements:
+            resp = self.client.get(BASE_URL, query_string={"ids": ids})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(resp.get_json()), 10)
+        self.assertEqual(len(statements), 2)
+
+    def test_get_best_price_query_count(self):
+        """It should find the best price with a single query"""
+        supplier = self._create_suppliers(1)[0]
+        self._add_items(supplier, [("SKU0001", "Shirt", 10, "9.50")])
+        with self._count_queries() as statements:
+            resp = self.client.get("/items/best-price", query_string={"sku": "SKU0001", "qty": 10})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(statements), 1)
@@ -0,0 +1,135 @@
+"""
+Test cases for the single-flight calls
+"""
+import time
+import asyncio
+import threading
+from unittest import TestCase, IsolatedAsyncioTestCase
+from service.common.singleflight import SingleFlight
+
+THREADS = 8
+
+
+######################################################################
+#  T H R E A D   T E S T   C A S E S
+######################################################################
+class TestSingleFlight(TestCase):
+    """Test Cases for coalescing calls from threads"""
+
+    def setUp(self):
+        self.flights = SingleFlight()
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.runs = 0
+
+    def slow_call(self):
+        """Counts the run and blocks until the test releases it"""
+        self.runs += 1
+        self.started.set()
+        self.release.wait(5)
+        return {"id": 1}
+
+    def _run_threads(self, target, count=THREADS):
+        """Starts a leader and count - 1 followers and returns their results"""
+        results = [None] * count
+
+        def run(index):
+            try:
+                results[index] = self.flights.do("supplier:1", target)
+            except ValueError as error:
+                results[index] = error
+
+        threads = [threading.Thread(target=run, args=(0,))]
+        threads[0].start()
+        self.started.wait(5)
+        threads += [threading.Thread(target=run, args=(index,)) for index in range(1, count)]
+        for thread in threads[1:]:
+            thread.start()
+        # the followers are counted as soon as they join the call
+        deadline = time.time() + 5
+        while self.flights.coalesced < count - 1 and time.time() < deadline:
+            time.sleep(0.001)
+        self.release.set()
+        for thread in threads:
+            thread.join(5)
+        return results
+
+    def test_one_call_for_concurrent_callers(self):
+        """It should run one call and share its result"""
+        results = self._run_threads(self.slow_call)
+        self.assertEqual(self.runs, 1)
+        self.assertTrue(all(result is results[0] for result in results))
+        self.assertEqual(self.flights.stats(), {"calls": 1, "coalesced": THREADS - 1})
+
+    def test_shares_exceptions(self):
+        """It should raise the error of the call in every caller"""
+
+        def failing_call():
+            self.slow_call()
+            raise ValueError("database is down")
+
+        results = self._run_threads(failing_call)
+        self.assertEqual(self.runs, 1)
+        self.assertTrue(all(isinstance(result, ValueError) for result in results))
+        # the failed call is not remembered
+        self.assertEqual(self.flights.do("supplier:1", lambda: "again"), "again")
+
+    def test_sequential_calls(self):
+        """It should run calls that do not overlap every time"""
+        self.assertEqual(self.flights.do("a", lambda: 1), 1)
+        self.assertEqual(self.flights.do("a", lambda: 2), 2)
+        self.assertEqual(self.flights.stats(), {"calls": 2, "coalesced": 0})
+
+    def test_forget(self):
+        """It should start a new call for a key that was forgotten"""
+        leader = threading.Thread(target=self.flights.do, args=("supplier:1", self.slow_call))
+        leader.start()
+        self.started.wait(5)
+        self.flights.forget("supplier:1")
+        self.assertEqual(self.flights.do("supplier:1", lambda: "fresh"), "fresh")
+        self.release.set()
+        leader.join(5)
+        self.assertEqual(self.flights.coalesced, 0)
+
+    def test_listeners(self):
+        """It should tell the listeners about every coalesced caller"""
+        keys = []
+        self.flights.listeners.append(keys.append)
+        self._run_threads(self.slow_call, count=3)
+        self.assertEqual(keys, ["supplier:1", "supplier:1"])
+
+
+######################################################################
+#  A S Y N C   T E S T   C A S E S
+######################################################################
+class TestAsyncSingleFlight(IsolatedAsyncioTestCase):
+    """Test Cases for coalescing calls from tasks"""
+
+    async def test_one_call_for_concurrent_tasks(self):
+        """It should await one call and share its result"""
+        flights = SingleFlight()
+        runs = []
+
+        async def load():
+            runs.append(1)
+            await asyncio.sleep(0.01)
+            return {"id": 1}
+
+        results = await asyncio.gather(*(flights.ado("supplier:1", load) for _ in range(THREADS)))
+        self.assertEqual(len(runs), 1)
+        self.assertTrue(all(result is results[0] for result in results))
+        self.assertEqual(flights.stats(), {"calls": 1, "coalesced": THREADS - 1})
+
+    async def test_shares_exceptions(self):
+        """It should raise the error of the call in every task"""
+        flights = SingleFlight()
+
+        async def load():
+            await asyncio.sleep(0.01)
+            raise ValueError("database is down")
+
+        results = await asyncio.gather(
+            *(flights.ado("supplier:1", load) for _ in range(3)), return_exceptions=True
+        )
+        self.assertTrue(all(isinstance(result, ValueError) for result in results))
+        self.assertIsNone(await flights.ado("supplier:1", lambda: asyncio.sleep(0)))